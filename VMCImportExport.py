@@ -7,7 +7,11 @@
 
 import configparser                     # parsing config file
 import datetime
+import fnmatch
 import glob
+import gzip
+import hashlib
+import io
 import json
 import random
 import requests                         # need this for Get/Post/Delete
@@ -15,21 +19,37 @@ import os
 import re
 import time
 import sys
+import threading
 import boto3
 
 from pathlib import Path
 from prettytable import PrettyTable
-from zipfile import ZipFile
-
+from urllib.parse import urlsplit, urlencode, parse_qs
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import delta_export
+import discovery_cache
+import export_archive
+import history_store
+import json_stream
+import s3_stream
+import sync_diff
+import vmc_async
 import vmc_auth
+import vmc_http
+import worker_pool
 
 class VMCImportExport:
     """A class to handle importing and exporting portions of a VMC SDDC"""
 
     def __init__(self,configPath="./config_ini/config.ini", vmcConfigPath="./config_ini/vmc.ini", awsConfigPath="./config/aws.ini", vCenterConfigPath="./config_ini/vcenter.ini"):
         self.vmc_auth = None
+        self.http = None
+        self.io_engine = 'threads'
+        self.fanout_workers = 10
         self.proxy_url = None
         self.proxy_url_short = None
+        self._thread_state = threading.local()
         self.lastJSONResponse = None
         self.source_org_display_name = ""
         self.dest_org_display_name = ""
@@ -53,6 +73,11 @@ class VMCImportExport:
         self.export_folder = ""
         self.import_folder = ""
         self.sync_mode = False
+        self.sync_diff = False
+        self.sync_delete = False
+        self.sync_destinations = {}
+        self.sync_stages = []
+        self.sync_lock = threading.Lock()
         self.export_path = ""
         self.import_path = ""
         self.append_sddc_id_to_zip = False
@@ -60,12 +85,41 @@ class VMCImportExport:
         self.export_history = False
         self.export_purge_before_run = False
         self.export_purge_after_zip = False
+        self.export_direct_to_archive = False
+        self.export_zip_compresslevel = 6
+        self.export_archive = None
+        self.export_stream = None
+        self.import_archive = None
+        self.import_stream = None
+        self.incremental_export = False
+        self.incremental_index_filename = 'export_index.idx'
+        self.export_index = None
+        self.export_index_collections = {}
+        self.export_delta_files = {}
+        self.export_index_lock = threading.Lock()
+        self.history_store = False
+        self.history_store_folder = ""
+        self.history_store_max_snapshots = 100
+        self.export_workers = 1
+        self.bulk_export_mode = 'per_collection'
+        self.export_page_size = 1000
+        self.pagination_prefetch_depth = 2
+        self.export_format = 'pretty'
+        self.import_workers = 1
+        self.bulk_import_mode = 'per_object'
+        self.bulk_import_chunk_size = 500
+        self.import_streaming = False
         self.max_export_history_files = 10
         self.export_type = 'os'
         self.aws_s3_export_access_id = ""
         self.aws_s3_export_access_secret = ""
         self.aws_s3_export_bucket = ""
+        self.aws_s3_endpoint_url = ""
+        self.s3_multipart_part_size = 8 * 1024 * 1024
+        self.s3_multipart_workers = 4
         self.cgw_groups_import_error_dict = {}
+        self.cgw_networks_import_error_dict = {}
+        self.flex_segments_import_error_dict = {}
         self.cgw_groups_import_exclude_list = []
         self.cgw_import_exclude_list = []
         self.mgw_groups_import_exclude_list = []
@@ -83,6 +137,15 @@ class VMCImportExport:
         self.aws_dest_sddc_region = ""
         self.ConfigLoader()
 
+    @property
+    def lastJSONResponse(self):
+        """Last API error response, tracked per thread so that parallel sections report their own errors"""
+        return getattr(self._thread_state, 'lastJSONResponse', None)
+
+    @lastJSONResponse.setter
+    def lastJSONResponse(self, value):
+        self._thread_state.lastJSONResponse = value
+
     def ConfigLoader(self):
         """Load all configuration variables from config.ini"""
         config = configparser.ConfigParser()
@@ -101,7 +164,37 @@ class VMCImportExport:
         else:
             self.strProdURL               = vmcConfig.get("vmcConfig", "strProdURL")
             self.strCSPProdURL            = vmcConfig.get("vmcConfig", "strCSPProdURL")
-        self.vmc_auth = vmc_auth.VMCAuth(strCSPProdURL=self.strCSPProdURL)
+
+        # HTTP connection pooling - one keep-alive session per endpoint, shared by all API calls
+        self.http_pool_size           = self.loadConfigInt(config,"httpConfig","http_pool_size",10)
+        self.http_keep_alive          = self.loadConfigFlag(config,"httpConfig","http_keep_alive") is not False
+        # Retries for throttled (429/503) or failed calls - capped exponential backoff with jitter
+        self.retry_policy = vmc_http.RetryPolicy(
+            status_budgets=self.loadConfigStatusBudgets(config,"httpConfig","retry_status_budgets",{429: 5, 503: 5}),
+            connection_budget=self.loadConfigInt(config,"httpConfig","retry_connection_budget",3),
+            base_delay=self.loadConfigFloat(config,"httpConfig","retry_backoff_base",1.0),
+            max_delay=self.loadConfigFloat(config,"httpConfig","retry_backoff_max",30.0))
+        # Adaptive rate limit per endpoint class, in requests per second - 0 disables the limit for that class
+        rate_limiters = {}
+        for endpoint_class in ('csp', 'vmc', 'nsx'):
+            rate = self.loadConfigFloat(config,"httpConfig",f'rate_limit_{endpoint_class}',0)
+            if rate > 0:
+                rate_limiters[endpoint_class] = vmc_http.AdaptiveRateLimiter(rate,
+                    min_rate=self.loadConfigFloat(config,"httpConfig","rate_limit_min",1.0),
+                    max_rate=rate * self.loadConfigFloat(config,"httpConfig","rate_limit_max_factor",2.0),
+                    increase=self.loadConfigFloat(config,"httpConfig","rate_limit_increase",1.0),
+                    decrease=self.loadConfigFloat(config,"httpConfig","rate_limit_decrease",0.5))
+        # I/O engine for fan-out calls (one API call per policy, segment, session, ...) - threads or async
+        self.io_engine                = (self.loadConfigFilename(config,"httpConfig","io_engine") or "threads").lower()
+        self.fanout_workers           = self.loadConfigInt(config,"httpConfig","fanout_workers",10)
+        endpoint_classes = {urlsplit(self.strCSPProdURL).hostname: 'csp', urlsplit(self.strProdURL).hostname: 'vmc'}
+        self.http = vmc_http.VMCHttpClient(pool_size=self.http_pool_size, keep_alive=self.http_keep_alive, retry_policy=self.retry_policy,
+                                           rate_limiters=rate_limiters, endpoint_classes=endpoint_classes)
+        self.vmc_auth = vmc_auth.VMCAuth(strCSPProdURL=self.strCSPProdURL, http=self.http)
+        # Discovery calls (Tier-1s, linked VPCs, segments, SDDC details) are made once per run and shared
+        self.discovery_cache = discovery_cache.DiscoveryCache(
+            ttl=self.loadConfigFloat(config,"httpConfig","discovery_cache_ttl",0),
+            enabled=self.loadConfigFlag(config,"httpConfig","discovery_cache") is not False)
         self.source_refresh_token     = vmcConfig.get("vmcConfig", "source_refresh_token")
         self.source_org_id            = vmcConfig.get("vmcConfig", "source_org_id")
         self.source_sddc_id           = vmcConfig.get("vmcConfig", "source_sddc_id")
@@ -114,13 +207,36 @@ class VMCImportExport:
         self.export_path              = Path(self.export_folder)
         self.import_path              = Path(self.import_folder)
         self.sync_mode                = self.loadConfigFlag(config,"importConfig","sync_mode")
+        self.sync_diff                = self.loadConfigFlag(config,"importConfig","sync_diff") is True
+        self.sync_delete              = self.loadConfigFlag(config,"importConfig","sync_delete") is True
+        self.import_workers           = self.loadConfigInt(config,"importConfig","import_workers",1)
+        self.bulk_import_mode         = (self.loadConfigFilename(config,"importConfig","bulk_import_mode") or "per_object").lower()
+        self.bulk_import_chunk_size   = self.loadConfigInt(config,"importConfig","bulk_import_chunk_size",500)
+        self.import_streaming         = self.loadConfigFlag(config,"importConfig","import_streaming")
         self.export_history           = self.loadConfigFlag(config,"exportConfig","export_history")
         self.export_purge_before_run  = self.loadConfigFlag(config,"exportConfig","export_purge_before_run")
         self.export_purge_after_zip   = self.loadConfigFlag(config,"exportConfig","export_purge_after_zip")
+        self.export_direct_to_archive = self.loadConfigFlag(config,"exportConfig","export_direct_to_archive") is True
+        self.export_zip_compresslevel = self.loadConfigInt(config,"exportConfig","export_zip_compresslevel",6)
         self.append_sddc_id_to_zip    = self.loadConfigFlag(config,"exportConfig","append_sddc_id_to_zip")
+        self.incremental_export       = self.loadConfigFlag(config,"exportConfig","incremental_export") is True
+        self.incremental_index_filename = self.loadConfigFilename(config,"exportConfig","incremental_index_filename") or 'export_index.idx'
+        self.history_store            = self.loadConfigFlag(config,"exportConfig","history_store") is True
+        self.history_store_folder     = self.loadConfigFilename(config,"exportConfig","history_store_folder") or ""
+        self.history_store_max_snapshots = self.loadConfigInt(config,"exportConfig","history_store_max_snapshots",100)
 
         self.max_export_history_files = int(config.get("exportConfig", "max_export_history_files"))
+        self.export_workers           = self.loadConfigInt(config,"exportConfig","export_workers",1)
+        self.bulk_export_mode         = (self.loadConfigFilename(config,"exportConfig","bulk_export_mode") or "per_collection").lower()
+        self.export_page_size         = min(self.loadConfigInt(config,"exportConfig","export_page_size",1000), 1000)
+        self.pagination_prefetch_depth = self.loadConfigInt(config,"exportConfig","pagination_prefetch_depth",2)
+        self.export_format            = (self.loadConfigFilename(config,"exportConfig","export_format") or "pretty").lower()
+        if self.export_format not in ('pretty', 'compact', 'compact+gzip'):
+            print(f'Unknown export_format {self.export_format}, using pretty')
+            self.export_format = 'pretty'
         self.export_type          = self.loadConfigFilename(config,"exportConfig","export_type")
+        self.s3_multipart_part_size = self.loadConfigInt(config,"exportConfig","s3_multipart_part_size_mb",8) * 1024 * 1024
+        self.s3_multipart_workers = self.loadConfigInt(config,"exportConfig","s3_multipart_workers",4)
         self.import_mode_live_warning = self.loadConfigFlag(config,"importConfig","import_mode_live_warning")
         self.enable_ipv6 = self.loadConfigFlag(config, 'importConfig', 'enable_ipv6')
         self.cluster_rename = self.loadConfigFlag(config, 'importConfig', 'rename_clusters')
@@ -151,15 +267,18 @@ class VMCImportExport:
 
         # Services
         self.services_import          = self.loadConfigFlag(config,"importConfig","services_import")
+        self.services_import_workers  = self.loadConfigInt(config,"importConfig","services_import_workers",1)
 
         # Groups
         self.compute_groups_import            = self.loadConfigFlag(config,"importConfig","compute_groups_import")
+        self.compute_groups_import_workers    = self.loadConfigInt(config,"importConfig","compute_groups_import_workers",1)
         self.management_groups_import         = self.loadConfigFlag(config,"importConfig","management_groups_import")
 
         #CGW
         self.cgw_export               = self.loadConfigFlag(config,"exportConfig","cgw_export")
         self.cgw_export_filename      = self.loadConfigFilename(config,"exportConfig","cgw_export_filename")
         self.cgw_import               = self.loadConfigFlag(config,"importConfig","cgw_import")
+        self.cgw_import_workers       = self.loadConfigInt(config,"importConfig","cgw_import_workers",1)
         self.cgw_import_filename      = self.loadConfigFilename(config,"importConfig","cgw_import_filename")
         self.cgw_import_exclude_list  = self.loadConfigRegex(config,"importConfig","cgw_import_exclude_list",'|')
         self.cgw_groups_import_exclude_list = self.loadConfigRegex(config,"importConfig","cgw_groups_import_exclude_list",'|')
@@ -209,8 +328,8 @@ class VMCImportExport:
         self.network_export_filename     = self.loadConfigFilename(config,"exportConfig","network_export_filename")
         self.network_dhcp_static_binding_export = self.loadConfigFilename(config,"exportConfig","network_dhcp_static_binding_export")
         self.network_dhcp_static_binding_filename = self.loadConfigFilename(config,"exportConfig","network_dhcp_static_binding_filename")
-        self.CGWDHCPbindings = []
         self.network_import              = self.loadConfigFlag(config,"importConfig","network_import")
+        self.network_import_workers      = self.loadConfigInt(config,"importConfig","network_import_workers",1)
         self.network_import_filename     = self.loadConfigFilename(config,"importConfig","network_import_filename")
         self.network_dhcp_static_binding_import = self.loadConfigFlag(config,"importConfig","network_dhcp_static_binding_import")
         self.network_import_max_networks = int(config.get("importConfig", "network_import_max_networks"))
@@ -272,6 +391,7 @@ class VMCImportExport:
         self.aws_s3_export_access_id = self.loadConfigFilename(awsConfig,"awsConfig","aws_s3_export_access_id")
         self.aws_s3_export_access_secret = self.loadConfigFilename(awsConfig,"awsConfig","aws_s3_export_access_secret")
         self.aws_s3_export_bucket = self.loadConfigFilename(awsConfig,"awsConfig","aws_s3_export_bucket")
+        self.aws_s3_endpoint_url = self.loadConfigFilename(awsConfig,"awsConfig","aws_s3_endpoint_url") or ""
         self.aws_import_access_key_id = self.loadConfigFilename(awsConfig, 'awsConfig', 'aws_import_access_key_id')
         self.aws_import_secret_access_key = self.loadConfigFilename(awsConfig, 'awsConfig', 'aws_import_secret_access_key')
         self.aws_import_session_token = self.loadConfigFilename(awsConfig, 'awsConfig', 'aws_import_session_token')
@@ -281,6 +401,7 @@ class VMCImportExport:
         self.dfw_export_filename    = self.loadConfigFilename(config,"exportConfig","dfw_export_filename")
         self.dfw_detailed_export_filename = self.loadConfigFilename(config,"exportConfig","dfw_detailed_export_filename")
         self.dfw_import             = self.loadConfigFlag(config,"importConfig","dfw_import")
+        self.dfw_import_workers     = self.loadConfigInt(config,"importConfig","dfw_import_workers",1)
         self.dfw_import_filename    = self.loadConfigFilename(config,"importConfig","dfw_import_filename")
         self.dfw_detailed_import_filename = self.loadConfigFilename(config,"importConfig","dfw_detailed_import_filename")
 
@@ -378,7 +499,7 @@ class VMCImportExport:
 
     def purgeJSONfiles(self):
         """Removes the JSON export files before a new export"""
-        files = glob.glob(self.export_folder + '/*.json')
+        files = glob.glob(self.export_folder + '/*.json') + glob.glob(self.export_folder + '/*.json.gz')
         retval = True
         for filePath in files:
             try:
@@ -389,18 +510,182 @@ class VMCImportExport:
                 retval = False
         return retval
 
-    def zipJSONfiles(self):
-        """Creates a zipfile of exported JSON files"""
-        files = glob.glob(self.export_folder + '/*.json')
+    def newExportZipName(self) -> str:
+        """Sets export_zip_name to a new timestamped zipfile name and returns it"""
         curtime = datetime.datetime.now()
         #filename example: 2020-12-02_09-57-13_json-export.zip
         fname =  curtime.strftime("%Y-%m-%d_%H-%M-%S") + '_' + 'json-export.zip'
+        if self.export_index is not None:
+            #Incremental export, 2020-12-02_09-57-13_json-delta.zip
+            fname = fname.replace('json-export.zip', 'json-delta.zip')
         if self.append_sddc_id_to_zip is True:
             fname = self.source_sddc_id + "_" + fname
         self.export_zip_name = fname
+        return fname
+
+    def s3Client(self):
+        """Returns a boto3 S3 client for the export bucket"""
+        kwargs = {}
+        if len(self.aws_s3_endpoint_url) > 0:
+            # S3 compatible endpoint, such as a local test server
+            kwargs['endpoint_url'] = self.aws_s3_endpoint_url
+        #Blank access ID - running in Lambda mode, do not pass the key and secret, the Lambda role will grant access to the bucket
+        if len(self.aws_s3_export_access_id) > 0:
+            kwargs['aws_access_key_id'] = self.aws_s3_export_access_id
+            kwargs['aws_secret_access_key'] = self.aws_s3_export_access_secret
+        return boto3.client('s3', **kwargs)
+
+    def openExportArchive(self):
+        """Starts a zipfile that the export files are written into directly, instead of into export_folder
+
+        With export_type s3 the zipfile is streamed into a multipart upload to the S3 bucket as it is written, and
+        nothing is written to export_folder.
+        """
+        fname = self.newExportZipName()
+        try:
+            if self.export_type == 's3':
+                self.export_stream = s3_stream.S3MultipartWriter(self.s3Client(), self.aws_s3_export_bucket, fname,
+                                                                 self.s3_multipart_part_size, self.s3_multipart_workers)
+                self.export_archive = export_archive.ExportArchive(self.export_stream, self.export_zip_compresslevel)
+            else:
+                self.export_archive = export_archive.ExportArchive(self.export_folder + '/' + fname, self.export_zip_compresslevel)
+            return True
+        except Exception as e:
+            print('Error creating zipfile: ', str(e))
+            if self.export_stream is not None:
+                self.export_stream.abort()
+                self.export_stream = None
+            return False
+
+    def closeExportArchive(self):
+        """Finishes the zipfile started by openExportArchive, completing the S3 upload if there is one"""
+        try:
+            self.export_archive.close()
+            if self.export_stream is not None:
+                self.export_stream.close()
+            return True
+        except Exception as e:
+            print('Error writing zipfile: ', str(e))
+            if self.export_stream is not None:
+                self.export_stream.abort()
+            return False
+        finally:
+            self.export_archive = None
+            self.export_stream = None
+
+    def beginIncrementalExport(self):
+        """Loads the index of the previous export, so exportList only writes the objects changed since then
+
+        Without an index, or if it cannot be read, a full export is run and the index is created once it completes.
+        """
+        path = self.export_folder + '/' + self.incremental_index_filename
+        try:
+            self.export_index = delta_export.load_index(path)
+        except Exception as e:
+            print('Unable to read export index', path, ':', str(e))
+            self.export_index = None
+        if self.export_index is None:
+            print('No export index found, running a full export')
+        else:
+            print('Incremental export of the changes since', self.export_index['export'])
+
+    def recordExportRevisions(self, filename: str, revisions: dict, delta: dict = None):
+        """Records the revisions of a collection exported by exportList, and the delta manifest entry of its file"""
+        with self.export_index_lock:
+            self.export_index_collections[filename] = revisions
+            if delta is not None:
+                self.export_delta_files[filename] = delta
+
+    def finishIncrementalExport(self):
+        """Writes the delta manifest into a delta export, call before the export files are zipped"""
+        if self.export_index is None:
+            return True
+        manifest = {'previous_export': self.export_index['export'], 'files': self.export_delta_files}
+        try:
+            # Always plain JSON, whatever the export_format
+            if self.export_archive is not None:
+                outfile = self.export_archive.open(delta_export.MANIFEST_NAME)
+            else:
+                outfile = open(self.export_path / delta_export.MANIFEST_NAME, 'w')
+            with outfile:
+                json.dump(manifest, outfile, indent=4)
+            return True
+        except Exception as e:
+            print('Error writing delta manifest: ', str(e))
+            return False
+
+    def saveExportIndex(self):
+        """Saves the revisions of this export as the base of the next incremental export, call once it is zipped"""
+        collections = {}
+        if self.export_index is not None:
+            collections.update(self.export_index['collections'])
+        collections.update(self.export_index_collections)
+        try:
+            delta_export.save_index(self.export_folder + '/' + self.incremental_index_filename, self.export_zip_name, collections)
+            return True
+        except Exception as e:
+            print('Error saving export index: ', str(e))
+            return False
+
+    def applyExportDeltas(self, base_zip: str, delta_zips: list):
+        """Replays delta zipfiles on top of a full export zipfile, writing a new full export zipfile to export_folder"""
+        ZipPath = self.export_folder + '/' + self.newExportZipName()
+        try:
+            delta_export.apply_deltas(base_zip, delta_zips, ZipPath, self.export_zip_compresslevel, self.exportIndent())
+            return True
+        except Exception as e:
+            print('Error applying delta: ', str(e))
+            if os.path.exists(ZipPath):
+                os.remove(ZipPath)
+            return False
+
+    def historyStore(self) -> history_store.HistoryStore:
+        folder = self.history_store_folder
+        if len(folder) == 0:
+            folder = self.export_folder + '/history'
+        return history_store.HistoryStore(folder)
+
+    def storeExportSnapshot(self):
+        """Adds the export zipfile to the history store, then prunes snapshots beyond history_store_max_snapshots"""
+        try:
+            store = self.historyStore()
+            manifest = store.add_zip(self.export_folder + '/' + self.export_zip_name)
+            print('Stored snapshot', manifest['name'], 'with', len(manifest['files']), 'files in', store.root)
+            if self.history_store_max_snapshots != -1:
+                snapshots, blobs = store.prune(self.history_store_max_snapshots)
+                if snapshots > 0:
+                    print('Pruned', snapshots, 'snapshots and', blobs, 'objects no longer referenced')
+            return True
+        except Exception as e:
+            print('Error storing snapshot: ', str(e))
+            return False
+
+    def restoreExportSnapshot(self, name: str):
+        """Writes the files of a stored snapshot to import_folder, replacing the JSON files there. name can be latest"""
+        try:
+            store = self.historyStore()
+            snapshots = store.snapshots()
+            if name == 'latest' and len(snapshots) > 0:
+                name = snapshots[-1]
+            if name not in snapshots:
+                print('Snapshot', name, 'not found. Stored snapshots:', ', '.join(snapshots))
+                return False
+            for filePath in glob.glob(self.import_folder + '/*.json') + glob.glob(self.import_folder + '/*.json.gz'):
+                os.remove(filePath)
+            files = store.restore(name, self.import_folder)
+            print('Restored', len(files), 'files of snapshot', name, 'to', self.import_folder)
+            return True
+        except Exception as e:
+            print('Error restoring snapshot: ', str(e))
+            return False
+
+    def zipJSONfiles(self):
+        """Creates a zipfile of exported JSON files"""
+        files = glob.glob(self.export_folder + '/*.json') + glob.glob(self.export_folder + '/*.json.gz')
+        fname = self.newExportZipName()
         try:
             ZipPath = self.export_folder + '/' + fname
-            with ZipFile(ZipPath,'w') as zip:
+            with ZipFile(ZipPath,'w',compression=ZIP_DEFLATED,compresslevel=self.export_zip_compresslevel) as zip:
                 for file in files:
                     zip.write(file,os.path.basename(file))
             return True
@@ -423,6 +708,40 @@ class VMCImportExport:
             print('Zipfile extraction error: ', str(e))
             return False
 
+    def openImportArchive(self, sourceZipPath):
+        """Imports from the members of a zip archive directly, without extracting it
+
+        sourceZipPath can be an s3://bucket/key URL, the archive members are then read with ranged GETs instead of
+        downloading the whole object.
+        """
+        try:
+            if sourceZipPath.startswith('s3://'):
+                bucket, key = s3_stream.parse_s3_url(sourceZipPath)
+                self.import_stream = s3_stream.S3RangeReader(self.s3Client(), bucket, key)
+                self.import_archive = ZipFile(self.import_stream, mode='r')
+            else:
+                self.import_archive = ZipFile(sourceZipPath, mode='r')
+            return True
+        except Exception as e:
+            print('Zipfile open error: ', str(e))
+            self.closeImportArchive()
+            return False
+
+    def closeImportArchive(self):
+        if self.import_archive is not None:
+            self.import_archive.close()
+            self.import_archive = None
+        if self.import_stream is not None:
+            print(f'Read {self.import_stream.bytes_fetched} of {self.import_stream.size} bytes of the archive in {self.import_stream.requests} S3 range requests')
+            self.import_stream.close()
+            self.import_stream = None
+
+    def listImportFiles(self, pattern: str) -> list:
+        """Returns the import files matching a glob pattern, from the import archive when one is open"""
+        if self.import_archive is not None:
+            return [self.import_path / name for name in self.import_archive.namelist() if fnmatch.fnmatch(name, pattern)]
+        return glob.glob(self.import_folder + '/' + pattern)
+
     def purgeJSONzipfiles(self):
         """Clean up old zipfiles"""
         if self.max_export_history_files == -1:
@@ -454,8 +773,8 @@ class VMCImportExport:
         json_response = response.json()
         cgw_groups = json_response['results']
         fname = self.export_path / self.cgw_groups_filename
-        with open(fname, 'w') as outfile:
-            json.dump(cgw_groups, outfile,indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(cgw_groups, outfile, self.exportIndent())
         return True
 
 
@@ -472,14 +791,14 @@ class VMCImportExport:
         sddc_services = json_response['results']
         if OnlyUserDefinedServices is True:
             fname = self.export_path / self.services_filename
-            with open(fname, 'w+') as outfile:
+            with self.openExportFile(fname, 'w+') as outfile:
                 for service in sddc_services:
                     if service["_create_user"]!= "admin" and service["_create_user"]!="admin;admin" and service["_create_user"]!="system":
-                        json.dump(service, outfile,indent=4)
+                        json_stream.dump(service, outfile, self.exportIndent())
         else:
             fname = self.export_path / self.services_filename
-            with open(fname, 'w') as outfile:
-                json.dump(sddc_services, outfile,indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(sddc_services, outfile, self.exportIndent())
         return True
 
     def exportOnPremDFWRule(self):
@@ -501,10 +820,10 @@ class VMCImportExport:
             sddc_Detailed_DFWrules[cmap["id"]] = cmapDetails
         fname = self.export_path / self.dfw_export_filename
         fname_detailed = self.export_path / self.dfw_detailed_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(sddc_DFWrules, outfile,indent=4)
-        with open(fname_detailed, 'w') as outfile:
-            json.dump(sddc_Detailed_DFWrules, outfile,indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(sddc_DFWrules, outfile, self.exportIndent())
+        with self.openExportFile(fname_detailed, 'w') as outfile:
+            json_stream.dump(sddc_Detailed_DFWrules, outfile, self.exportIndent())
         return True
 
     def importOnPremServices(self):
@@ -512,7 +831,7 @@ class VMCImportExport:
         """Import all services from a JSON file"""
         fname = self.import_path / self.services_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 services = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
@@ -528,25 +847,16 @@ class VMCImportExport:
                     json_data["service_type"]=service["service_type"]
                     service_entries = []
                     for entry in service["service_entries"]:
-                        #print("-------------------------------------------------")
-                        #print("entry")
-                        modified_entry = {}
-                        for k in entry:
-                            #print("-------------------------------------------------")
-                            #print("sub_entry")
-                            #print(k)
-                            if k != "path"  and k != "relative_path" and k != "overridden" and k != "_create_time" and k != "_create_user" and k != "_last_modified_time" and k != "_last_modified_user" and k != "_system_owned" and k != "_protection" and k != "_revision":
-                                modified_entry[k] = entry[k]
-                        service_entries.append(modified_entry)
+                        service_entries.append(sync_diff.strip_system_fields(entry))
                     json_data["service_entries"]=service_entries
                     myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                     myURL = self.proxy_url + "/policy/api/v1/infra/services/" + service["id"]
                     #print(myURL)
                     #print(json_data)
                     if self.sync_mode is True:
-                        response = requests.patch(myURL, headers=myHeader, json=json_data)
+                        response = self.http.patch(myURL, headers=myHeader, json=json_data)
                     else:
-                        response = requests.put(myURL, headers=myHeader, json=json_data)
+                        response = self.http.put(myURL, headers=myHeader, json=json_data)
                     if response.status_code == 200:
                         result = "SUCCESS"
                         print('Added {}'.format(json_data['display_name']))
@@ -562,7 +872,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.cgw_groups_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 groups = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
@@ -599,9 +909,9 @@ class VMCImportExport:
                     payload["expression"]=group["expression"]
                     json_data = json.dumps(payload)
                     if self.sync_mode is True:
-                        creategrpresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                        creategrpresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                     else:
-                        creategrpresp = requests.put(myURL,headers=myHeader,data=json_data)
+                        creategrpresp = self.http.put(myURL,headers=myHeader,data=json_data)
                     print("CGW Group " + payload["display_name"] + " has been imported.")
                 else:
                         continue
@@ -617,13 +927,13 @@ class VMCImportExport:
         fname = self.import_path / self.dfw_import_filename
         fname_detailed = self.import_path / self.dfw_detailed_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 cmaps = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
             return False
         try:
-            with open(fname_detailed) as filehandle:
+            with self.openImportFile(fname_detailed) as filehandle:
                 cmapd = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname_detailed)
@@ -643,9 +953,9 @@ class VMCImportExport:
                     myURL = self.proxy_url_short + "/policy/api/v1/infra/domains/cgw/security-policies/" + cmap["id"]
                     json_data = json.dumps(payload)
                     if self.sync_mode is True:
-                        response = requests.patch(myURL,headers=myHeader,data=json_data)
+                        response = self.http.patch(myURL,headers=myHeader,data=json_data)
                     else:
-                        response = requests.put(myURL,headers=myHeader,data=json_data)
+                        response = self.http.put(myURL,headers=myHeader,data=json_data)
                     self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
 
                 payload = {}
@@ -673,9 +983,9 @@ class VMCImportExport:
                         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                         json_data = json.dumps(payload)
                         if self.sync_mode is True:
-                            response = requests.patch(myURL,headers=myHeader,data=json_data)
+                            response = self.http.patch(myURL,headers=myHeader,data=json_data)
                         else:
-                            response = requests.put(myURL,headers=myHeader,data=json_data)
+                            response = self.http.put(myURL,headers=myHeader,data=json_data)
                         if response.status_code == 200:
                             print("DFW rule " + commEnt["display_name"] + " has been imported.")
                         else:
@@ -688,129 +998,244 @@ class VMCImportExport:
     def exportSDDCCGWnetworks(self):
         """Exports the CGW network segments to a JSON file"""
         myURL = (self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/segments")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        cgw_networks = json_response['results']
+        # Only the IDs of segments with DHCP are kept, to look up DHCP static bindings once the segments are written
+        segment_ids = []
+        segment_count = 0
         fname = self.export_path / self.network_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(cgw_networks, outfile,indent=4)
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                for page in self.paginate(myURL):
+                    writer.extend(page)
+                    segment_count += len(page)
+                    segment_ids.extend(network['id'] for network in page if self.segmentHasDHCP(network))
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
 
         if self.network_dhcp_static_binding_export:
-            self.CGWDHCPbindings = []
-            for network in cgw_networks:
-                retval = self.getSDDCCGWDHCPBindings(network['id'])
+            print(f'{segment_count - len(segment_ids)} of {segment_count} segments have no DHCP configuration, skipping their DHCP static bindings')
+            self.exportSDDCCGWDHCPBindings(segment_ids)
+        return True
 
-            fname = self.export_path / self.network_dhcp_static_binding_filename
-            with open(fname, 'w') as outfile:
-                json.dump(self.CGWDHCPbindings, outfile, indent=4)
+    def segmentHasDHCP(self, segment: dict) -> bool:
+        """True if a segment has a DHCP configuration, segments without one cannot have DHCP static bindings"""
+        if segment.get('dhcp_config_path'):
+            return True
+        return any(subnet.get('dhcp_ranges') or subnet.get('dhcp_config') for subnet in segment.get('subnets', []))
+
+    def exportSDDCCGWDHCPBindings(self, segment_ids: list):
+        """Exports the DHCP static bindings of the CGW network segments to a JSON file"""
+        fname = self.export_path / self.network_dhcp_static_binding_filename
+        with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+            # One batch of calls per page of segments, so the responses of all segments are never held at once
+            for start in range(0, len(segment_ids), max(self.export_page_size, 1)):
+                batch = segment_ids[start:start + max(self.export_page_size, 1)]
+                urls = [self.proxy_url + f'/policy/api/v1/infra/tier-1s/cgw/segments/{segment_id}/dhcp-static-binding-configs' for segment_id in batch]
+                # The responses are written on this thread, in segment order
+                for segment_id, url, response in zip(batch, urls, self.invokeMany([('GET', url, None) for url in urls])):
+                    # lastJSONResponse only holds the last failure of the batch, each segment reports its own response
+                    if response is None:
+                        print(f'Unable to retrieve DHCP static bindings for segment {segment_id}: the API call did not return a response')
+                        continue
+                    if response.status_code != 200:
+                        self.error_handling(response)
+                        print(f'Unable to retrieve DHCP static bindings for segment {segment_id}: API Call Status {response.status_code}, text:{response.text}')
+                        continue
+                    json_response = response.json()
+                    bindings = json_response.get('results', [])
+                    if json_response.get('cursor'):
+                        # More than one page of bindings
+                        bindings = self.getAllResults(url)
+                        if bindings is None:
+                            print(f'Unable to retrieve DHCP static bindings for segment {segment_id}: {self.lastJSONResponse}')
+                            continue
+                    if len(bindings) > 0:
+                        writer.write(bindings)
         return True
-        
-    def getSDDCCGWDHCPBindings( self, segment_id: str):
-        """Appends any DHCP static bindings for segment_id to the class variable CGWDHCPbindings"""
-        myURL = (self.proxy_url + f'/policy/api/v1/infra/tier-1s/cgw/segments/{segment_id}/dhcp-static-binding-configs')
-        #print(myURL)
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
 
-        json_response = response.json()
-        #print(json_response)
-        if json_response['result_count'] > 0:
-            dhcp_static_bindings = json_response['results']
-            self.CGWDHCPbindings.append(dhcp_static_bindings)
-            #print(self.CGWDHCPbindings)
-        else:
-            return False
+    def getHierarchicalInfra(self, type_filter: str) -> dict:
+        """Retrieves the /infra tree containing only the resource types in type_filter, returns None on failure"""
+        myURL = self.proxy_url + f'/policy/api/v1/infra?type_filter={type_filter}'
+        response = self.invokeCSPGET(myURL)
+        if response is None:
+            return None
+        if response.status_code != 200:
+            self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
+            return None
+        return response.json()
+
+    def groupByParent(self, objects: list, resource_type_suffix: str) -> dict:
+        """Indexes (parent_path, object) pairs whose resource type ends with resource_type_suffix by parent path"""
+        by_parent = {}
+        for parent, obj in objects:
+            if obj['resource_type'].endswith(resource_type_suffix):
+                by_parent.setdefault(parent, []).append(obj)
+        return by_parent
+
+    def flattenHierarchicalInfra(self, node: dict, parent_path: str = '/infra') -> list:
+        """Walks a hierarchical /infra tree and returns (parent_path, object) for every object, without its children"""
+        objects = []
+        for child in node.get('children', []):
+            if child.get('resource_type') == 'ChildResourceReference':
+                objects.extend(self.flattenHierarchicalInfra(child, parent_path + '/' + child.get('id', '')))
+                continue
+            for value in child.values():
+                # A ChildService wraps a Service, a ChildGroup wraps a Group, etc.
+                if isinstance(value, dict) and 'resource_type' in value:
+                    obj = {k: v for k, v in value.items() if k != 'children'}
+                    objects.append((obj.get('parent_path', parent_path), obj))
+                    objects.extend(self.flattenHierarchicalInfra(value, obj.get('path', parent_path)))
+        return objects
+
+    def exportHierarchicalSnapshot(self):
+        """Exports services, groups, DFW, segments and Tier-1 gateways with a few hierarchical GETs of /infra
+
+        The objects are split into the same JSON files as the per-collection exports, so import works unchanged.
+        If a hierarchical call fails, the per-collection exports are used for the files it covers.
+        """
+        self.vmc_auth.check_access_token_expiration()
+        retval = True
+
+        def write(filename, data):
+            with self.openExportFile(self.export_path / filename, 'w') as outfile:
+                json_stream.dump(data, outfile, self.exportIndent())
 
+        # Services
+        if self.cgw_export is True or self.mgw_export is True or self.dfw_export is True:
+            tree = self.getHierarchicalInfra('Service')
+            if tree is None:
+                print(f'Hierarchical services export failed, exporting services per collection: {self.lastJSONResponse}')
+                retval = self.exportSDDCServices() is True and retval
+            else:
+                write(self.services_filename, [obj for parent, obj in self.flattenHierarchicalInfra(tree) if obj['resource_type'] == 'Service' and parent == '/infra'])
+
+        # Groups, security policies with their rules and Tier-1 gateway policies
+        if self.cgw_export is True or self.mgw_export is True or self.dfw_export is True or self.mcgw_fw_export is True:
+            tree = self.getHierarchicalInfra('Domain;Group;SecurityPolicy;GatewayPolicy;Rule')
+            if tree is None:
+                print(f'Hierarchical group and policy export failed, exporting per collection: {self.lastJSONResponse}')
+                if self.cgw_export is True:
+                    retval = self.exportSDDCCGWGroups() is True and retval
+                if self.mgw_export is True:
+                    retval = self.exportSDDCMGWGroups() is True and retval
+                if self.dfw_export is True:
+                    retval = self.exportSDDCDFWRule() is True and retval
+                if self.mcgw_fw_export is True:
+                    retval = self.export_mcgw_fw() is True and retval
+            else:
+                objects = self.flattenHierarchicalInfra(tree)
+                rules = self.groupByParent(objects, 'Rule')
+                if self.cgw_export is True:
+                    write(self.cgw_groups_filename, [obj for parent, obj in objects if obj['resource_type'] == 'Group' and parent == '/infra/domains/cgw'])
+                if self.mgw_export is True:
+                    write(self.mgw_groups_filename, [obj for parent, obj in objects if obj['resource_type'] == 'Group' and parent == '/infra/domains/mgw'])
+                if self.dfw_export is True:
+                    policies = [obj for parent, obj in objects if obj['resource_type'] == 'SecurityPolicy' and parent == '/infra/domains/cgw']
+                    details = {}
+                    for policy in policies:
+                        policy_rules = rules.get(policy['path'], [])
+                        details[policy['id']] = {'results': policy_rules, 'result_count': len(policy_rules)}
+                    write(self.dfw_export_filename, policies)
+                    write(self.dfw_detailed_export_filename, details)
+                if self.mcgw_fw_export is True:
+                    gateway_policies = {}
+                    for parent, obj in objects:
+                        if obj['resource_type'] == 'GatewayPolicy' and parent == '/infra/domains/cgw' and obj['id'] != 'default':
+                            obj['rules'] = rules.get(obj['path'], [])
+                            gateway_policies[obj['id']] = obj
+                    write(self.mcgw_fw_export_filename, gateway_policies)
+
+        # CGW segments and their DHCP static bindings, flexible segments and their discovery bindings, Tier-1 gateways
+        if self.network_export is True or self.flex_segment_export is True or self.mcgw_export is True:
+            tree = self.getHierarchicalInfra('Tier1;Segment;DhcpV4StaticBindingConfig;DhcpV6StaticBindingConfig;SegmentDiscoveryProfileBindingMap')
+            if tree is None:
+                print(f'Hierarchical segment and Tier-1 export failed, exporting per collection: {self.lastJSONResponse}')
+                if self.network_export is True:
+                    retval = self.exportSDDCCGWnetworks() is True and retval
+                if self.flex_segment_export is True:
+                    retval = self.export_flexible_segments() is True and retval
+                    retval = self.export_flexible_segment_disc_bindings() is True and retval
+                if self.mcgw_export is True:
+                    retval = self.export_mcgw_config() is True and retval
+            else:
+                objects = self.flattenHierarchicalInfra(tree)
+                if self.network_export is True:
+                    cgw_networks = [obj for parent, obj in objects if obj['resource_type'] == 'Segment' and parent == '/infra/tier-1s/cgw']
+                    write(self.network_export_filename, cgw_networks)
+                    if self.network_dhcp_static_binding_export:
+                        # Same layout as exportSDDCCGWDHCPBindings - one list of bindings per segment that has any
+                        static_bindings = self.groupByParent(objects, 'StaticBindingConfig')
+                        bindings = [static_bindings[network['path']] for network in cgw_networks if network['path'] in static_bindings]
+                        write(self.network_dhcp_static_binding_filename, bindings)
+                if self.flex_segment_export is True:
+                    flex_segments = [obj for parent, obj in objects if obj['resource_type'] == 'Segment' and parent == '/infra']
+                    binding_maps = self.groupByParent(objects, 'SegmentDiscoveryProfileBindingMap')
+                    disc_bindings = {segment['id']: binding_maps.get(segment['path'], []) for segment in flex_segments}
+                    write(self.flex_segment_export_filename, flex_segments)
+                    write(self.flex_segment_disc_prof_export_filename, disc_bindings)
+                if self.mcgw_export is True:
+                    tier1s = {}
+                    for parent, obj in objects:
+                        if obj['resource_type'] == 'Tier1' and obj['id'] not in ('cgw', 'mgw'):
+                            tier1s[obj['id']] = obj
+                    write(self.mcgw_export_filename, tier1s)
+
+        return retval
+        
     def export_flexible_segments(self):
         """Exports the flexible segments to a JSON file"""
         my_url = f'{self.proxy_url}/policy/api/v1/infra/segments'
-        response = self.invokeCSPGET(my_url)
-        json_response = response.json()
-        flex_segments = json_response['results']
-        fname = self.export_path / self.flex_segment_export_filename
-        with open (fname, 'w') as outfile:
-            json.dump(flex_segments, outfile, indent=4)
-        return True
+        return self.exportCachedList(my_url, self.flex_segment_export_filename)
 
     def export_flexible_segment_disc_bindings(self):
         """Exports the MAC and IP Discovery binding maps for each flexible segment to JSON"""
-        flex_seg_bind = {}
         flex_seg_url = f'{self.proxy_url}/policy/api/v1/infra/segments'
-        flex_seg_resp = self.invokeCSPGET(flex_seg_url)
-        flex_seg_json = flex_seg_resp.json()
-        flex_seg_json = flex_seg_json['results']
-        flex_seg_id = []
-        for f in flex_seg_json:
-            flex_seg_name = f['id']
-            flex_seg_id.append(flex_seg_name)
-
-        for x in flex_seg_id:
-            my_url = f'{self.proxy_url}/policy/api/v1/infra/segments/{x}/segment-discovery-profile-binding-maps'
-            response = self.invokeCSPGET(my_url)
-            json_response = response.json()
-            disc_bind_map = json_response['results']
-            flex_seg_bind[x] = disc_bind_map
-
+        segments = self.getCachedResults(flex_seg_url)
+        if segments is None:
+            return False
         fname = self.export_path / self.flex_segment_disc_prof_export_filename
-        with open (fname, 'w') as outfile:
-            json.dump(flex_seg_bind, outfile, indent=4)
+        # Fetched a page at a time, so only one page of binding maps is held in memory
+        page_size = max(self.export_page_size, 1)
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONObjectWriter(outfile, self.exportIndent()) as writer:
+                for start in range(0, len(segments), page_size):
+                    flex_seg_id = [f['id'] for f in segments[start:start + page_size]]
+                    calls = [('GET', f'{self.proxy_url}/policy/api/v1/infra/segments/{x}/segment-discovery-profile-binding-maps', None) for x in flex_seg_id]
+                    for x, response in zip(flex_seg_id, self.invokeMany(calls)):
+                        # lastJSONResponse only holds the last failure of the batch, the error is built from this segment's response
+                        if response is None:
+                            raise vmc_http.VMCAPIError(f'Unable to retrieve the discovery binding maps of segment {x}: the API call did not return a response')
+                        if response.status_code != 200:
+                            self.error_handling(response)
+                            raise vmc_http.VMCAPIError(f'Unable to retrieve the discovery binding maps of segment {x}: API Call Status {response.status_code}, text:{response.text}')
+                        writer.write(x, response.json()['results'])
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
         return True
         
     def exportSDDCMGWRule(self):
         """Exports the MGW firewall rules to a JSON file"""
         myURL = (self.proxy_url + "/policy/api/v1/infra/domains/mgw/gateway-policies/default/rules")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        sddc_MGWrules = json_response['results']
-        fname = self.export_path / self.mgw_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(sddc_MGWrules, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.mgw_export_filename)
 
     def exportSDDCCGWRule(self):
         """Exports the CGW firewall rules to a JSON file"""
         myURL = (self.proxy_url + "/policy/api/v1/infra/domains/cgw/gateway-policies/default/rules")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        sddc_CGWrules = json_response['results']
-        fname = self.export_path / self.cgw_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(sddc_CGWrules, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.cgw_export_filename)
 
     def exportSDDCMGWGroups(self):
         """Exports MGW firewall groups to a JSON file"""
         myURL = (self.proxy_url + "/policy/api/v1/infra/domains/mgw/groups")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        mgw_groups = json_response['results']
-        fname = self.export_path / self.mgw_groups_filename
-        with open(fname, 'w') as outfile:
-            json.dump(mgw_groups, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.mgw_groups_filename)
 
     def export_mcgw_config(self):
         """Exports Multi-T1 CGW configuration to a JSON file"""
-        my_url = f'{self.proxy_url}/policy/api/v1/search?query=resource_type:Tier1'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
+        tier1s = self.getTier1s()
+        if tier1s is None:
             return False
-        json_response = response.json()
-        #print(json.dumps(json_response, indent=2))
-        search_results = json_response['results']
         mcgw_list = []
-        for i in search_results:
+        for i in tier1s:
             if i['id'] == 'mgw':
                 pass
             elif i['id'] == 'cgw':
@@ -826,20 +1251,17 @@ class VMCImportExport:
             json_response = response.json()
             mcgw_json[x] = json_response
         fname = self.export_path / self.mcgw_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(mcgw_json, outfile, indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(mcgw_json, outfile, self.exportIndent())
         return True
 
     def export_mcgw_static_routes(self):
         """Exports any static routes configured on a multi-T1 CGW to a JSON file"""
-        my_url = f'{self.proxy_url}/policy/api/v1/search?query=resource_type:Tier1'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
+        tier1s = self.getTier1s()
+        if tier1s is None:
             return False
-        json_response = response.json()
-        search_results = json_response['results']
         mcgw_list = []
-        for i in search_results:
+        for i in tier1s:
             if i['id'] == 'mgw':
                 pass
             elif i['id'] == 'cgw':
@@ -855,18 +1277,16 @@ class VMCImportExport:
             json_response = response.json()
             mcgw_staticroutes_json[x] = json_response
         fname = self.export_path / self.mcgw_static_routes_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(mcgw_staticroutes_json, outfile, indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(mcgw_staticroutes_json, outfile, self.exportIndent())
         return True
 
     def export_mcgw_fw(self):
         """Exports all North/South firewall policies"""
         my_url = f'{self.proxy_url}/policy/api/v1/search?query=resource_type:GatewayPolicy'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
+        search_results = self.getAllResults(my_url)
+        if search_results is None:
             return False
-        json_response = response.json()
-        search_results = json_response['results']
         mcgw_policy_list = []
         for i in search_results:
             if i['id'] == 'default':
@@ -885,23 +1305,14 @@ class VMCImportExport:
             json_response = response.json()
             mcgw_fw_policy_json[x] = json_response
         fname = self.export_path / self.mcgw_fw_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(mcgw_fw_policy_json, outfile, indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(mcgw_fw_policy_json, outfile, self.exportIndent())
         return True
 
     def export_mpl(self):
         """Exports Connected VPC Managed Prefix List"""
         my_url = f'{self.proxy_url}/cloud-service/api/v1/infra/linked-vpcs'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
-            self.error_handling(response)
-            return False
-        json_response = response.json()
-        mpl_response = json_response['results']
-        fname = self.export_path / self.mpl_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(mpl_response, outfile, indent=4)
-        return True
+        return self.exportCachedList(my_url, self.mpl_export_filename)
 
     def export_advanced_firewall(self):
         """Exports NSX Advanced Firewall settings, profiles, policies and rules"""
@@ -952,8 +1363,8 @@ class VMCImportExport:
                         rule_set.append(retval[1])
                         print(f'NSX Advanced Firewall rules exported for policy {policy}.')
             fname = self.export_path / f'{self.nsx_adv_fw_rules_export_filename}'
-            with open(fname, 'w') as outfile:
-                json.dump(rule_set, outfile,indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(rule_set, outfile, self.exportIndent())
             return successval
 
     def export_nsx_adv_fw_settings(self):
@@ -963,8 +1374,8 @@ class VMCImportExport:
             return False
         json_response = response.json()
         fname = self.export_path / self.nsx_adv_fw_settings_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(json_response, outfile,indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(json_response, outfile, self.exportIndent())
         return True
 
     def export_nsx_adv_fw_exclusions(self):
@@ -976,37 +1387,30 @@ class VMCImportExport:
         if json_response['results']:
             nsxaf_sigs = json_response['results']
             fname = self.export_path / self.nsx_adv_fw_sigs_export_filename
-            with open(fname, 'w') as outfile:
-                json.dump(nsxaf_sigs, outfile,indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(nsxaf_sigs, outfile, self.exportIndent())
             return True
         else:
             return None
 
     def export_ids_profiles(self):
         my_url = f'{self.proxy_url_short}/policy/api/v1/infra/settings/firewall/security/intrusion-services/profiles'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        nsxaf_profiles = json_response['results']
-        fname = self.export_path / self.nsx_adv_fw_profiles_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(nsxaf_profiles, outfile,indent=4)
-        return True
+        return self.exportList(my_url, self.nsx_adv_fw_profiles_export_filename)
 
     def export_ids_policies(self):
         my_url = f'{self.proxy_url_short}/policy/api/v1/infra/domains/cgw/intrusion-service-policies'
-        response = self.invokeCSPGET(my_url)
-        json_response = response.json()
-        nsxaf_policies = json_response['results']
-        policy_count = json_response['result_count']
         fname = self.export_path / self.nsx_adv_fw_policies_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(nsxaf_policies, outfile,indent=4)
         policy_list=[]
-        for policy in nsxaf_policies:
-            policy_list.append(policy['id'])
-        return True, policy_count, policy_list
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                for nsxaf_policies in self.paginate(my_url):
+                    writer.extend(nsxaf_policies)
+                    for policy in nsxaf_policies:
+                        policy_list.append(policy['id'])
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False, 0, []
+        return True, len(policy_list), policy_list
 
     def export_ids_rules(self, ids_policy_name):
         my_url = f'{self.proxy_url_short}/policy/api/v1/infra/domains/cgw/intrusion-service-policies/{ids_policy_name}/rules'
@@ -1020,81 +1424,94 @@ class VMCImportExport:
         url = f'{self.proxy_url}/policy/api/v1/infra/context-profiles/custom-attributes/default'
         response = self.invokeVMCGET(url)
         if response is None or response.status_code != 200:
-            self.error_handling(response)
             return False
         else:
             json_response = response.json()
             fqdn_attributes = json_response['results'][0]['attributes'][0]
             fname = self.export_path / self.nsx_l7_fqdn_filename
-            with open(fname, 'w') as outfile:
-                json.dump(fqdn_attributes, outfile, indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(fqdn_attributes, outfile, self.exportIndent())
             return True
     
     def export_l7_cp(self):
         """Export NSX Layer 7 Context Profiles"""
         url = f'{self.proxy_url}/policy/api/v1/infra/context-profiles'
-        response = self.invokeVMCGET(url)
-        if response is None or response.status_code != 200:
-            self.error_handling(response)
-            return False
-        else:
-            json_response = response.json()
-            l7_cp = json_response['results']
-            fname = self.export_path / self.nsx_l7_context_profile_filename
-            with open(fname, 'w') as outfile:
-                json.dump(l7_cp, outfile, indent=4)
-            return True
+        return self.exportList(url, self.nsx_l7_context_profile_filename)
 
     def export_ral(self):
         """Exports the SDDCs Route Aggregation List(s)"""
         my_url = f'{self.proxy_url}/cloud-service/api/v1/infra/external/route/aggregations'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        ral_results = json_response['results']
-        fname = self.export_path / self.ral_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(ral_results, outfile, indent=4)
-        return True
+        return self.exportList(my_url, self.ral_export_filename)
 
     def export_route_config(self):
         """Exports the SDDC route configuration"""
         my_url = f'{self.proxy_url}/cloud-service/api/v1/infra/external/route/configs'
-        response = self.invokeCSPGET(my_url)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        route_config = json_response['results']
-        fname = self.export_path / self.route_config_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(route_config, outfile, indent=4)
-        return True
+        return self.exportList(my_url, self.route_config_export_filename)
 
     def exportSDDCDFWRule(self):
-        """Exports the DFW firewall rules to a JSON file"""
+        """Exports the DFW firewall rules to a JSON file
+
+        The first page of rules of every security policy in a page of policies is retrieved in one invokeMany batch,
+        the cursor is only followed for the policies that have more rules. The policies whose rules took longest to
+        retrieve are listed in a timing table once the export completes.
+        """
         myURL = (self.proxy_url + "/policy/api/v1/infra/domains/cgw/security-policies")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        sddc_DFWrules = json_response['results']
-        sddc_Detailed_DFWrules = {}
-        for cmap in sddc_DFWrules:
-            myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/security-policies/" + cmap["id"] + "/rules"
-            response = self.invokeVMCGET(myURL)
-            if response is None or response.status_code != 200:
-                return False
-            cmapDetails = response.json()
-            sddc_Detailed_DFWrules[cmap["id"]] = cmapDetails
         fname = self.export_path / self.dfw_export_filename
         fname_detailed = self.export_path / self.dfw_detailed_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(sddc_DFWrules, outfile,indent=4)
-        with open(fname_detailed, 'w') as outfile:
-            json.dump(sddc_Detailed_DFWrules, outfile,indent=4)
+        rules_query = f'?page_size={self.export_page_size}' if self.export_page_size > 0 else ''
+
+        timings = []
+        policy_count = 0
+        start = time.monotonic()
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer, \
+                 self.openExportFile(fname_detailed, 'w') as detailed_outfile, json_stream.JSONObjectWriter(detailed_outfile, self.exportIndent()) as detailed_writer:
+                for sddc_DFWrules in self.paginate(myURL, self.pagination_prefetch_depth):
+                    writer.extend(sddc_DFWrules)
+                    if len(sddc_DFWrules) == 0:
+                        continue
+                    call_times = []
+                    responses = self.invokeMany([('GET', f'{myURL}/{cmap["id"]}/rules{rules_query}', None) for cmap in sddc_DFWrules], call_times)
+                    first_pages = []
+                    for cmap, response in zip(sddc_DFWrules, responses):
+                        if response is None or response.status_code != 200:
+                            if response is not None:
+                                self.error_handling(response)
+                                self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
+                            print(f'Unable to retrieve the rules of DFW policy {cmap["id"]}')
+                            return False
+                        first_pages.append(response.json())
+
+                    for cmap, json_response, elapsed in zip(sddc_DFWrules, first_pages, call_times):
+                        rules = json_response.get('results', [])
+                        pages = 1
+                        if json_response.get('cursor') and len(rules) > 0:
+                            # More rules than fit on one page
+                            policy_start = time.monotonic()
+                            for page in self.fetchPages(f'{myURL}/{cmap["id"]}/rules{rules_query}', json_response['cursor']):
+                                rules.extend(page)
+                                pages += 1
+                            elapsed += time.monotonic() - policy_start
+                        timings.append((cmap["id"], cmap.get("display_name", ""), len(rules), pages, elapsed))
+                        detailed_writer.write(cmap["id"], {"results": rules, "result_count": len(rules)})
+                    policy_count += len(sddc_DFWrules)
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
+        print(f'Retrieved the rules of {policy_count} DFW policies in {time.monotonic() - start:.1f}s')
+        if len(timings) > 0:
+            print(self.dfwTimingTable(timings))
         return True
 
+    def dfwTimingTable(self, timings: list, rows: int = 10) -> PrettyTable:
+        """Lists the DFW policies whose rules took longest to retrieve, from (id, display_name, rules, pages, seconds)"""
+        table = PrettyTable(['Policy ID', 'Display Name', 'Rules', 'Pages', 'Time (s)'])
+        table.align['Policy ID'] = 'l'
+        table.align['Display Name'] = 'l'
+        for policy_id, display_name, rules, pages, elapsed in sorted(timings, key=lambda t: t[4], reverse=True)[:rows]:
+            table.add_row([policy_id, display_name, rules, pages, f'{elapsed:.2f}'])
+        return table
+
     def importSDDCDFWRule(self):
         """Import all DFW Rules from a JSON file"""
 
@@ -1102,19 +1519,22 @@ class VMCImportExport:
         fname = self.import_path / self.dfw_import_filename
         fname_detailed = self.import_path / self.dfw_detailed_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 cmaps = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
             return False
         try:
-            with open(fname_detailed) as filehandle:
-                cmapd = json.load(filehandle)
+            # dfw_details.json holds every rule, it is the file that is read incrementally with import_streaming
+            cmapd = self.loadImportItems(fname_detailed)
         except:
             print('Import failed - unable to open',fname_detailed)
             return False
+        policy_by_id = {cmap["id"]: cmap for cmap in cmaps}
+        # (policy, rules) in the order of the details file, which is the export order of the policies
+        policies_with_rules = ((policy_by_id[policy_id], details["results"]) for policy_id, details in cmapd if policy_id in policy_by_id)
 
-        for cmap in cmaps:
+        def policy_payload(cmap):
             payload = {}
             payload["resource_type"] = cmap["resource_type"]
             payload["id"] = cmap["id"]
@@ -1122,52 +1542,96 @@ class VMCImportExport:
             payload["category"] = cmap["category"]
             payload["sequence_number"] = cmap["sequence_number"]
             payload["stateful"] = cmap["stateful"]
+            return payload
+
+        def import_policy(cmap):
+            payload = policy_payload(cmap)
             if self.import_mode == 'live':
-                myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                 myURL = self.proxy_url_short + "/policy/api/v1/infra/domains/cgw/security-policies/" + cmap["id"]
-                json_data = json.dumps(payload)
-                if self.sync_mode is True:
-                    response = requests.patch(myURL,headers=myHeader,data=json_data)
-                else:
-                    response = requests.put(myURL,headers=myHeader,data=json_data)
-                self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
+                response = self.importObject(myURL, payload)
+                if response is None or response.status_code != 200:
+                    print(f'DFW policy {cmap["display_name"]} import error: {self.lastJSONResponse}')
+                    return False
+            return True
 
+        def dfw_rule_payload(commEnt):
             payload = {}
-            cmap_id = cmap["id"]
-            commEnts = cmapd[cmap_id]["results"]
-            for commEnt in commEnts:
-                payload["id"] = commEnt["id"]
-                payload["display_name"] = commEnt["display_name"]
-                payload["resource_type"] = commEnt["resource_type"]
-                payload["source_groups"] = commEnt["source_groups"]
-                payload["destination_groups"] = commEnt["destination_groups"]
-                if "scope" in commEnt:
-                    payload["scope"] = commEnt["scope"]
-                if 'profiles' in commEnt:
-                    payload['profiles'] = commEnt['profiles']
-                payload["action"] = commEnt["action"]
-                payload["services"] = commEnt["services"]
-                payload["sequence_number"] = commEnt["sequence_number"]
-                payload["logged"] = commEnt["logged"]
-                payload["disabled"] = commEnt["disabled"]
-                if self.import_mode == 'live':
-                    myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/security-policies/" + cmap["id"] + "/rules/" + commEnt["id"]
-                    myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
-                    json_data = json.dumps(payload)
-                    if self.sync_mode is True:
-                        response = requests.patch(myURL,headers=myHeader,data=json_data)
-                    else:
-                        response = requests.put(myURL,headers=myHeader,data=json_data)
-                    if response.status_code == 200:
-                        print("DFW rule " + commEnt["display_name"] + " has been imported.")
-                    else:
-                        self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
-                        print(f'API Call Status {response.status_code}, text:{response.text}')
-                        if len(self.cgw_groups_import_error_dict) > 0:
-                            self.check_compute_group_errors(response.text)
+            payload["id"] = commEnt["id"]
+            payload["display_name"] = commEnt["display_name"]
+            payload["resource_type"] = commEnt["resource_type"]
+            payload["source_groups"] = commEnt["source_groups"]
+            payload["destination_groups"] = commEnt["destination_groups"]
+            if "scope" in commEnt:
+                payload["scope"] = commEnt["scope"]
+            if 'profiles' in commEnt:
+                payload['profiles'] = commEnt['profiles']
+            payload["action"] = commEnt["action"]
+            payload["services"] = commEnt["services"]
+            payload["sequence_number"] = commEnt["sequence_number"]
+            payload["logged"] = commEnt["logged"]
+            payload["disabled"] = commEnt["disabled"]
+            return payload
+
+        def import_rule(policy_rule):
+            cmap, commEnt = policy_rule
+            payload = dfw_rule_payload(commEnt)
+            if self.import_mode == 'live':
+                myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/security-policies/" + cmap["id"] + "/rules/" + commEnt["id"]
+                response = self.importObject(myURL, payload)
+                if response is not None and response.status_code == 200:
+                    print("DFW rule " + commEnt["display_name"] + " has been imported.")
                 else:
-                    print("TEST MODE - DFW rule " + commEnt["display_name"] + " would have been imported.")
-        return True
+                    print(self.lastJSONResponse)
+                    if response is not None and len(self.cgw_groups_import_error_dict) > 0:
+                        self.check_compute_group_errors(response.text)
+                    return False
+            else:
+                print("TEST MODE - DFW rule " + commEnt["display_name"] + " would have been imported.")
+            return True
+
+        policy_path = lambda cmap: "/infra/domains/cgw/security-policies/" + cmap["id"]
+        rule_path = lambda cmap, commEnt: policy_path(cmap) + "/rules/" + commEnt["id"]
+        # One hierarchical GET returns the destination policies and rules
+        policies_stage = self.syncStage("DFW policies", "/infra/domains/cgw/security-policies/", "SecurityPolicy", type_filter="Domain;SecurityPolicy;Rule")
+        rules_stage = self.syncStage("DFW rules", "/infra/domains/cgw/security-policies/", "Rule", type_filter="Domain;SecurityPolicy;Rule")
+
+        if self.bulk_import_mode == 'hierarchical' and self.import_mode == 'live':
+            # Each security policy is sent together with its rules, the hierarchical API creates the policy first
+            def import_policy_and_rules(policy_with_rules):
+                cmap, policy_rules = policy_with_rules
+                results = [import_policy(cmap)] + [import_rule((cmap, commEnt)) for commEnt in policy_rules]
+                return all(results)
+
+            def policies_tree(chunk):
+                policies = []
+                for cmap, policy_rules in chunk:
+                    policy = policy_payload(cmap)
+                    policy["children"] = [{"resource_type": "ChildRule", "Rule": dfw_rule_payload(commEnt)} for commEnt in policy_rules]
+                    policies.append({"resource_type": "ChildSecurityPolicy", "SecurityPolicy": policy})
+                domain = {"resource_type": "ChildResourceReference", "id": "cgw", "target_type": "Domain", "children": policies}
+                return {"resource_type": "Infra", "children": [domain]}
+
+            def changed_policies_with_rules():
+                # Only the changed rules are sent, with their policy whether it changed or not
+                for cmap in cmaps:
+                    policies_stage.keep(policy_path(cmap))
+                for cmap, policy_rules in policies_with_rules:
+                    policy_changed = policies_stage.changed(policy_path(cmap), policy_payload, cmap)
+                    changed_rules = [commEnt for commEnt in policy_rules if rules_stage.changed(rule_path(cmap, commEnt), dfw_rule_payload, commEnt)]
+                    if policy_changed or len(changed_rules) > 0:
+                        yield cmap, changed_rules
+                policies_stage.finish()
+                rules_stage.finish()
+
+            return self.importObjectList("DFW policies", changed_policies_with_rules(), import_policy_and_rules, self.dfw_import_workers, policies_tree,
+                                         weight=lambda policy_with_rules: 1 + len(policy_with_rules[1]))
+
+        # Every policy has to exist before its rules are imported, so import all policies first and then all rules
+        policies_imported = all([retval for retval in worker_pool.bounded_map(import_policy, policies_stage.filter(cmaps, policy_path, policy_payload), self.dfw_import_workers)])
+        policy_rules = ((cmap, commEnt) for cmap, rules in policies_with_rules for commEnt in rules)
+        policy_rules = rules_stage.filter(policy_rules, lambda policy_rule: rule_path(*policy_rule), lambda policy_rule: dfw_rule_payload(policy_rule[1]))
+        rules_imported = all([retval for retval in worker_pool.bounded_map(import_rule, policy_rules, self.dfw_import_workers)])
+        return policies_imported and rules_imported
 
     def check_compute_group_errors(self, response_text: str):
         #  We start with a response_text input of: "Following dependent objects, used in path=[/infra/domains/cgw/security-policies/Security-demo/rules/within_backend], does not exist path=[/infra/domains/cgw/groups/Security-backend,/infra/domains/cgw/groups/Security-backend]."
@@ -1196,13 +1660,9 @@ class VMCImportExport:
         """Exports SDDC Service Access config to a JSON file"""
 
         # First, retrieve the linked VPC ID
-        myURL = (self.proxy_url + '/cloud-service/api/v1/infra/linked-vpcs')
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
+        linked_vpcs = self.getLinkedVPCs()
+        if linked_vpcs is None:
             return False
-
-        json_response = response.json()
-        linked_vpcs = json_response["results"]
         num_vpcs = len(linked_vpcs)
         if num_vpcs != 1:
             print('Unexpected linked VPC count: ',num_vpcs)
@@ -1210,8 +1670,8 @@ class VMCImportExport:
         else:
             linked_vpc = linked_vpcs[0]
             fname = self.export_path / self.service_access_filename
-            with open(fname, 'w+') as outfile:
-                json.dump(linked_vpc,outfile,indent=4)
+            with self.openExportFile(fname, 'w+') as outfile:
+                json_stream.dump(linked_vpc, outfile, self.exportIndent())
 
             # Use the linked VPC ID to discover connected services
             myURL = (self.proxy_url + '/cloud-service/api/v1/infra/linked-vpcs/' + linked_vpc['linked_vpc_id'] + '/connected-services')
@@ -1223,8 +1683,8 @@ class VMCImportExport:
             connected_services = json_response['results']
             for svc in connected_services:
                 fname = self.export_path / (svc['name'] + '-' + self.service_access_filename)
-                with open(fname, 'w+') as outfile:
-                    json.dump(svc,outfile,indent=4)
+                with self.openExportFile(fname, 'w+') as outfile:
+                    json_stream.dump(svc, outfile, self.exportIndent())
         return True
 
     def exportSDDCServices(self,OnlyUserDefinedServices=False):
@@ -1232,48 +1692,21 @@ class VMCImportExport:
         Args: bool OnlyUserDefinedServices, default True, if you want to ignore predefined system services
         """
 
-        debug_mode = False
-        debug_page_size = 20
-
         myURL = (self.proxy_url + "/policy/api/v1/infra/services")
-        if debug_mode:
-            myURL += f'?page_size={debug_page_size}'
-            print(f'DEBUG, page size set to {debug_page_size}, calling {myURL}')
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-        json_response = response.json()
-        sddc_services = json_response['results']
-        result_count = json_response['result_count']
-        if debug_mode:
-            print(f'Result count: {result_count}')
-
-        # After grabbing an intial set of results, check for presence of a cursor
-        while "cursor" in json_response:
-            #print(json_response)
-            result_count -= debug_page_size
-            myURL = self.proxy_url + "/policy/api/v1/infra/services?cursor=" + json_response['cursor']
-            if debug_mode:
-                print(f'{result_count} records to go.')
-                myURL += f'&page_size={debug_page_size}'
-                print(f'DEBUG, page size set to {debug_page_size}, calling {myURL}')
-            response = self.invokeVMCGET(myURL)
-            if response is None or response.status_code != 200:
-                return False
-            json_response = response.json()
-            sddc_services.extend(json_response['results'])
-
         if OnlyUserDefinedServices is True:
             fname = self.export_path / self.services_filename
-            with open(fname, 'w+') as outfile:
-                for service in sddc_services:
-                    if service["_create_user"]!= "admin" and service["_create_user"]!="admin;admin" and service["_create_user"]!="system":
-                        json.dump(service, outfile,indent=4)
+            try:
+                with self.openExportFile(fname, 'w+') as outfile:
+                    for sddc_services in self.paginate(myURL, self.pagination_prefetch_depth):
+                        for service in sddc_services:
+                            if service["_create_user"]!= "admin" and service["_create_user"]!="admin;admin" and service["_create_user"]!="system":
+                                json_stream.dump(service, outfile, self.exportIndent())
+            except vmc_http.VMCAPIError as e:
+                self.lastJSONResponse = str(e)
+                return False
+            return True
         else:
-            fname = self.export_path / self.services_filename
-            with open(fname, 'w') as outfile:
-                json.dump(sddc_services, outfile,indent=4)
-        return True
+            return self.exportList(myURL, self.services_filename, self.pagination_prefetch_depth)
 
     def exportVPN(self):
         successval = True
@@ -1331,42 +1764,15 @@ class VMCImportExport:
 
     def exportVPNDPDProfiles(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/ipsec-vpn-dpd-profiles")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        dpd_profiles = json_response['results']
-        fname = self.export_path / self.vpn_dpd_filename
-        with open(fname, 'w') as outfile:
-            json.dump(dpd_profiles, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.vpn_dpd_filename)
 
     def exportVPNIKEProfiles(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/ipsec-vpn-ike-profiles")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        ike_profiles = json_response['results']
-        fname = self.export_path / self.vpn_ike_filename
-        with open(fname, 'w') as outfile:
-            json.dump(ike_profiles, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.vpn_ike_filename)
 
     def exportVPNTunnelProfiles(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/ipsec-vpn-tunnel-profiles")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        tunnel_profiles = json_response['results']
-        fname = self.export_path / self.vpn_tunnel_filename
-        with open(fname, 'w') as outfile:
-            json.dump(tunnel_profiles, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.vpn_tunnel_filename)
 
     def exportVPNLocalBGP(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/bgp")
@@ -1377,163 +1783,128 @@ class VMCImportExport:
         json_response = response.json()
         #local_bgp = json_response
         fname = self.export_path / self.vpn_local_bgp_filename
-        with open(fname, 'w') as outfile:
-            json.dump(json_response, outfile,indent=4)
+        with self.openExportFile(fname, 'w') as outfile:
+            json_stream.dump(json_response, outfile, self.exportIndent())
         return True
 
     def exportVPNBGPNeighbors(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/bgp/neighbors")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        bgp_neighbors = json_response['results']
-        fname = self.export_path / self.vpn_bgp_filename
-        with open(fname, 'w') as outfile:
-            json.dump(bgp_neighbors, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.vpn_bgp_filename)
 
 
     def export_tier1_vpn(self):
         """Exports the Tier-1 VPN Services"""
-        t1_url = f'{self.proxy_url}/policy/api/v1/infra/tier-1s'
-        t1_response = self.invokeVMCGET(t1_url)
-        if t1_response.status_code != 200:
-            self.error_handling(t1_response)
+        t1_results = self.getTier1s()
+        if t1_results is None:
             return False
-        t1_json = t1_response.json()
         t1_lst = []
-        for t in t1_json['results']:
+        for t in t1_results:
             if t['_create_user'] != 'admin':
                 t1_lst.append(t['id'])
         if self.vpn_export is False:
-            self.exportVPNIKEProfiles()
-            self.exportVPNTunnelProfiles()
-            self.exportVPNDPDProfiles()
-            self.exportVPNBGPNeighbors()
-            self.exportVPNLocalBGP()
-        t1_vpn_service_dict = {}
-        t1_vpn_le_dict = {}
-        t1_vpn_dict = {}
-        for t in t1_lst:
-            t1_vpn_service_url = f'{self.proxy_url}/policy/api/v1/infra/tier-1s/{t}/ipsec-vpn-services'
-            t1_vpn_service_response = self.invokeVMCGET(t1_vpn_service_url)
-            if t1_vpn_service_response.status_code == 200:
-                t1_vpn_service_json = t1_vpn_service_response.json()
-                t1_vpn_service = t1_vpn_service_json['results']
-                if t1_vpn_service:
-                    t1_vpn_service_dict[t] = t1_vpn_service
-                    t1_vpn_service_id = t1_vpn_service[0]['id']
-
-                    t1_vpn_le_url = f'{self.proxy_url}/policy/api/v1/infra/tier-1s/{t}/ipsec-vpn-services/{t1_vpn_service_id}/local-endpoints'
-                    t1_vpn_le_response = self.invokeVMCGET(t1_vpn_le_url)
-                    if t1_vpn_le_response.status_code == 200:
-                        t1_vpn_le_json = t1_vpn_le_response.json()
-                        t1_vpn_le = t1_vpn_le_json['results']
-                        if t1_vpn_le:
-                            t1_vpn_le_dict[t1_vpn_service_id] = t1_vpn_le
-                        else:
-                            pass
-                    else:
-                        self.error_handling(t1_vpn_le_response)
-                        return False
+            profile_exports = [self.exportVPNIKEProfiles, self.exportVPNTunnelProfiles, self.exportVPNDPDProfiles,
+                               self.exportVPNBGPNeighbors, self.exportVPNLocalBGP]
+            for _ in worker_pool.bounded_map(lambda export: export(), profile_exports, self.fanout_workers):
+                pass
+        policy_url = f'{self.proxy_url}/policy/api/v1'
 
-                    t1_vpn_url = f'{self.proxy_url}/policy/api/v1/infra/tier-1s/{t}/ipsec-vpn-services/{t1_vpn_service_id}/sessions'
-                    t1_vpn_response = self.invokeCSPGET(t1_vpn_url)
-                    if t1_vpn_response.status_code == 200:
-                        t1_vpn_json = t1_vpn_response.json()
-                        t1_vpn_json = t1_vpn_json['results']
-                        if t1_vpn_json:
-                            for v in t1_vpn_json:
-                                if self.sddc_info_hide_sensitive_data is True:
-                                    t1_vpn_dict[t1_vpn_service_id] = v
-                                else:
-                                    t1_vpn_id = v['id']
-                                    t1_vpn_sen_url = f'{self.proxy_url}/policy/api/v1/infra/tier-1s/{t}/ipsec-vpn-services/{t1_vpn_service_id}/sessions/{t1_vpn_id}?action=show_sensitive_data'
-                                    t1_vpn_sen_response = self.invokeCSPGET(t1_vpn_sen_url)
-                                    if t1_vpn_sen_response.status_code == 200:
-                                        t1_vpn_sen_json = t1_vpn_sen_response.json()
-                                        t1_vpn_dict[t1_vpn_service_id] = t1_vpn_sen_json
-                                    else:
-                                        self.error_handling(t1_vpn_sen_response)
-                                        return False
-                        else:
-                            pass
-                    else:
-                        self.error_handling(t1_vpn_response)
-                        return False
-                else:
-                    pass
-            else:
-                self.error_handling(t1_vpn_service_response)
-                return False
+        # The tree is crawled one level at a time, with the calls of a level for every Tier-1 in flight at once:
+        # the VPN services of all Tier-1s, then the local endpoints and sessions of all services, then the
+        # sensitive data of all sessions. Service IDs are not unique across Tier-1s, services are keyed by path.
+        services = self.getManyResults([f'{policy_url}/infra/tier-1s/{t}/ipsec-vpn-services' for t in t1_lst])
+        if services is None:
+            return False
+        t1_vpn_service_dict = {t: t1_vpn_service for t, t1_vpn_service in zip(t1_lst, services) if t1_vpn_service}
+        service_paths = [svc['path'] for t1_vpn_service in services for svc in t1_vpn_service]
+
+        results = self.getManyResults([f'{policy_url}{path}/local-endpoints' for path in service_paths] +
+                                      [f'{policy_url}{path}/sessions' for path in service_paths])
+        if results is None:
+            return False
+        t1_vpn_le_dict = {path: le for path, le in zip(service_paths, results[:len(service_paths)]) if le}
+        t1_vpn_dict = {path: sessions for path, sessions in zip(service_paths, results[len(service_paths):]) if sessions}
+
+        if self.sddc_info_hide_sensitive_data is not True:
+            # Sensitive data such as the PSK is only returned when each session is requested individually
+            sessions = [(path, i, session) for path, service_sessions in t1_vpn_dict.items() for i, session in enumerate(service_sessions)]
+            calls = [('GET', f'{policy_url}{session["path"]}?action=show_sensitive_data', None) for _, _, session in sessions]
+            for (path, i, _), t1_vpn_sen_response in zip(sessions, self.invokeMany(calls)):
+                if t1_vpn_sen_response is None or t1_vpn_sen_response.status_code != 200:
+                    if t1_vpn_sen_response is not None:
+                        self.error_handling(t1_vpn_sen_response)
+                    return False
+                t1_vpn_dict[path][i] = t1_vpn_sen_response.json()
 
         if t1_vpn_service_dict:
             fname = self.export_path / self.tier1_vpn_service_filename
-            with open(fname, 'w') as outfile:
-                json.dump(t1_vpn_service_dict, outfile, indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(t1_vpn_service_dict, outfile, self.exportIndent())
 
         if t1_vpn_le_dict:
             lname = self.export_path / self.tier1_vpn_le_filename
-            with open(lname, 'w') as lefile:
-                json.dump(t1_vpn_le_dict, lefile, indent=4)
+            with self.openExportFile(lname, 'w') as lefile:
+                json_stream.dump(t1_vpn_le_dict, lefile, self.exportIndent())
 
         if t1_vpn_dict:
             vname = f'{self.export_path}/{self.tier1_vpn_export_filename}'
-            with open(vname, 'w') as outfile:
-                json.dump(t1_vpn_dict, outfile, indent=4)
+            with self.openExportFile(vname, 'w') as outfile:
+                json_stream.dump(t1_vpn_dict, outfile, self.exportIndent())
 
         return True
 
 
-    def getVPNl3sensitivedata(self,l3vpnid):
-        """ Retrieve sensitive data such as IPSEC preshared keys from an L3VPN configuration"""
-        myHeader = {'csp-auth-token': self.vmc_auth.access_token}
-        myURL = (self.proxy_url_short + f'/policy/api/v1/infra/tier-0s/vmc/locale-services/default/ipsec-vpn-services/default/sessions/{l3vpnid}?action=show_sensitive_data')
-        try:
-            response = requests.get(myURL, headers=myHeader)
-            if response.status_code != 200:
-                self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
-                return ""
+    def getVPNl3sensitivedata(self, l3vpnids: list) -> tuple:
+        """Retrieve sensitive data such as IPSEC preshared keys for many L3VPN sessions concurrently
+
+        Returns ({session id: session with sensitive data}, {session id: error}), a session that could not be
+        retrieved is only in the second dict, with the status and text of its own response.
+        """
+        base_url = self.proxy_url_short + '/policy/api/v1/infra/tier-0s/vmc/locale-services/default/ipsec-vpn-services/default/sessions'
+        calls = [('GET', f'{base_url}/{l3vpnid}?action=show_sensitive_data', None) for l3vpnid in l3vpnids]
+        sensitive = {}
+        errors = {}
+        for l3vpnid, response in zip(l3vpnids, self.invokeMany(calls)):
+            if response is None:
+                errors[l3vpnid] = 'the API call did not return a response'
+            elif response.status_code != 200:
+                errors[l3vpnid] = f'API Call Status {response.status_code}, text:{response.text}'
             else:
-                sensitive_l3vpn = json.loads(response.text)
-                return sensitive_l3vpn
-        except:
-            self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
-            return ""
+                sensitive[l3vpnid] = response.json()
+        return sensitive, errors
 
     def exportVPNl2config(self):
         myURL = (self.proxy_url_short + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/l2vpn-services/default/sessions")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        vpn_l2_config = json_response['results']
-        fname = self.export_path / self.vpn_l2_filename
-        with open(fname, 'w') as outfile:
-            json.dump(vpn_l2_config, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.vpn_l2_filename)
 
     def exportVPNl3config(self):
-        myURL = (self.proxy_url_short + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/ipsec-vpn-services/default/sessions")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        vpn_l3_config = json_response['results']
-        i = 0
-        for l3vpn in vpn_l3_config:
-            sensitive_l3vpn = self.getVPNl3sensitivedata(l3vpn['id'])
-            if sensitive_l3vpn["psk"]:
-                vpn_l3_config[i]["psk"] = sensitive_l3vpn["psk"]
-            i += 1
+        """Exports the L3VPN sessions with their preshared keys
 
+        A session whose PSK cannot be retrieved is still written, without psk, and the section fails with the error
+        of each such session.
+        """
+        myURL = (self.proxy_url_short + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/ipsec-vpn-services/default/sessions")
         fname = self.export_path / self.vpn_l3_filename
-        with open(fname, 'w') as outfile:
-            json.dump(vpn_l3_config, outfile,indent=4)
+        total = 0
+        failed = {}
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                for vpn_l3_config in self.paginate(myURL):
+                    # The PSKs of a whole page are retrieved at once
+                    sensitive, errors = self.getVPNl3sensitivedata([l3vpn['id'] for l3vpn in vpn_l3_config])
+                    failed.update(errors)
+                    for l3vpn in vpn_l3_config:
+                        total += 1
+                        if l3vpn['id'] in sensitive and sensitive[l3vpn['id']].get("psk"):
+                            l3vpn["psk"] = sensitive[l3vpn['id']]["psk"]
+                    writer.extend(vpn_l3_config)
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
+        if failed:
+            # The sessions are exported without their PSK, they cannot be imported as is
+            session_errors = "; ".join([f'{l3vpnid}: {error}' for l3vpnid, error in failed.items()])
+            self.lastJSONResponse = f'PSK could not be retrieved for {len(failed)} of {total} L3VPN sessions, they were exported without psk - {session_errors}'
+            return False
         return True
 
     def importCGWNetworks(self):
@@ -1541,67 +1912,73 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.network_import_filename
         try:
-            with open(fname) as filehandle:
-                networks = json.load(filehandle)
+            networks = self.loadImportList(fname)
         except:
             print('Import failed - unable to open',fname)
-            return
-        importResults = {}
-        irKey = 0
-        for n in networks:
-            skip_network = False
-            for e in self.network_import_exclude_list:
-                m = re.match(e,n["display_name"])
-                if m:
-                    print(n["display_name"],'skipped - matches exclusion regex', e)
-                    skip_network = True
-                    break
-            if skip_network is True:
-                continue
-            result = ""
-            resultNote = ""
+            return False
+
+        def network_payload(n):
             json_data = {}
             json_data["id"] = n['id']
             json_data["type"] = n['type']
             json_data["display_name"] = n['display_name']
-
             if "subnets" in n:
                 json_data["subnets"] = n['subnets']
-            else:
-                result = "FAIL"
-                resultNote += "No subnets found."
             if "advanced_config" in n:
                 json_data["advanced_config"] = n["advanced_config"]
             if 'tags' in n:
                 json_data['tags'] = n['tags']
-            
+            return json_data
+
+        def import_network(n):
+            result = ""
+            resultNote = ""
+            json_data = network_payload(n)
+            if "subnets" not in n:
+                result = "FAIL"
+                resultNote += "No subnets found."
+
             if self.import_mode == "live":
-                myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                 myURL = (self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/segments/" + n['id'])
-                if self.sync_mode is True:
-                    response = requests.patch(myURL, headers=myHeader, json=json_data)
-                else:
-                    response = requests.put(myURL, headers=myHeader, json=json_data)
-
-                if response.status_code == 200:
+                response = self.importObject(myURL, json_data)
+                if response is not None and response.status_code == 200:
                     result = "SUCCESS"
                     print('Segment {} has been imported.'.format(n['display_name']))
                 else:
                     result = "FAIL"
-                    resultNote += f'API Call Status {response.status_code}, text:{response.text}'
+                    resultNote += f'{self.lastJSONResponse}'
             else:
                 result = "TEST"
                 resultNote += "Test mode, no changes made"
-            current_result = {'id':n['id'],'display_name':n['display_name'],'result':result,'result_note':resultNote}
-            importResults[irKey] = current_result
-            irKey +=1
-            if self.network_import_max_networks > 0 and (irKey) >= self.network_import_max_networks:
-                print(f'Maximum network import value of {self.network_import_max_networks} reached, no further imports will be attempted.')
-                break
+            return {'id':n['id'],'display_name':n['display_name'],'result':result,'result_note':resultNote}
+
+        stage = self.syncStage("CGW networks", "/infra/tier-1s/cgw/segments/", "Segment", self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/segments")
+
+        def import_networks():
+            count = 0
+            for n in stage.filter(networks, lambda n: "/infra/tier-1s/cgw/segments/" + n['id'], network_payload):
+                skip_network = False
+                for e in self.network_import_exclude_list:
+                    m = re.match(e,n["display_name"])
+                    if m:
+                        print(n["display_name"],'skipped - matches exclusion regex', e)
+                        skip_network = True
+                        break
+                if skip_network is True:
+                    continue
+                # Apply the network cap before the segment is submitted to the worker pool
+                if self.network_import_max_networks > 0 and count >= self.network_import_max_networks:
+                    print(f'Maximum network import value of {self.network_import_max_networks} reached, no further imports will be attempted.')
+                    return
+                count += 1
+                yield n
 
+        self.cgw_networks_import_error_dict = {}
         table = PrettyTable(['Display Name', 'Result', 'Result Note', 'Segment ID'])
-        for i in importResults:
-            table.add_row([importResults[i]['display_name'],importResults[i]['result'],importResults[i]['result_note'],importResults[i]['id']])
+        for r in worker_pool.bounded_map(import_network, import_networks(), self.network_import_workers):
+            table.add_row([r['display_name'],r['result'],r['result_note'],r['id']])
+            if r['result'] == "FAIL":
+                self.cgw_networks_import_error_dict[r['id']] = {"display_name": r['display_name'], "error_message": r['result_note']}
         return (table)
     
     def import_flex_segments(self):
@@ -1609,11 +1986,11 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.flex_segment_import_filename
         try:
-            with open (fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 flex_segments = json.load(filehandle)
         except:
-            print(f'Import failed - unable to open {filehandle}')
-            return
+            print(f'Import failed - unable to open {fname}')
+            return False
         import_results = {}
         irKey = 0
         for f in flex_segments:
@@ -1644,9 +2021,9 @@ class VMCImportExport:
                     my_header = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token}
                     my_url = f'{self.proxy_url}/policy/api/v1{uri_path}'
                     if self.sync_mode is True:
-                        response = requests.patch(my_url, headers = my_header, json = json_data)
+                        response = self.http.patch(my_url, headers = my_header, json = json_data)
                     else:
-                        response = requests.put(my_url, headers = my_header, json = json_data)
+                        response = self.http.put(my_url, headers = my_header, json = json_data)
                     if response.status_code == 200:
                         result = "SUCCESS"
                         print(f'Segment {f["display_name"]} has been imported')
@@ -1659,9 +2036,12 @@ class VMCImportExport:
                 current_result = {'id':f['id'], 'display_name':f['display_name'], 'result':result, 'result_note':result_note}
                 import_results[irKey] = current_result
                 irKey += 1
+        self.flex_segments_import_error_dict = {}
         table = PrettyTable(['Display Name', 'Result', 'Result Note', 'Segment ID'])
         for i in import_results:
             table.add_row([import_results[i]['display_name'], import_results[i]['result'], import_results[i]['result_note'], import_results[i]['id']])
+            if import_results[i]['result'] == "FAIL":
+                self.flex_segments_import_error_dict[import_results[i]['id']] = {"display_name": import_results[i]['display_name'], "error_message": import_results[i]['result_note']}
         return table
 
     def import_flex_seg_disc_binding_map(self):
@@ -1669,11 +2049,12 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.flex_segment_disc_prof_export_filename
         try:
-            with open (fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 binding_maps = json.load(filehandle)
         except:
-            print(f"Import failed - unable to open {filehandle}")
-            return
+            print(f"Import failed - unable to open {fname}")
+            return False
+        success = True
         for b in binding_maps.values():
             if b:
                 json_data = {}
@@ -1688,27 +2069,31 @@ class VMCImportExport:
                     my_header = {"Content-Type": "application/json", "Accept": "application/json",
                                  'csp-auth-token': self.vmc_auth.access_token}
                     my_url = f'{self.proxy_url}/policy/api/v1{uri_path}'
-                    response = requests.put(my_url, headers = my_header, json = json_data)
+                    response = self.http.put(my_url, headers = my_header, json = json_data)
                     if response.status_code == 200:
                         print(f'Discovery binding map has been updated for segment {b[0]["parent_path"]}')
                     else:
                         self.error_handling(response)
+                        success = False
                 else:
                     print(f'TEST MODE - Discovery binding map for segment {b[0]["parent_path"]} would have been imported')
             else:
                 pass
+        return success
 
     def importCGWDHCPStaticBindings(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.network_dhcp_static_binding_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 bindings = json.load(filehandle)
         except:
             print('Import failed - unable to open', fname)
-            return
+            return False
 
-        for binding in bindings[0]:
+        success = True
+        # One list of bindings per segment
+        for binding in (b for segment_bindings in bindings for b in segment_bindings):
             payload = {}
             for x in binding:
                 # Strip out underscore keys - these are system generated and cannot be imported
@@ -1719,17 +2104,19 @@ class VMCImportExport:
                 myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                 myURL = self.proxy_url + "/policy/api/v1" +  binding['path']
                 if self.sync_mode is True:
-                    response = requests.patch(myURL, headers=myHeader, json=payload)
+                    response = self.http.patch(myURL, headers=myHeader, json=payload)
                 else:
-                    response = requests.put(myURL, headers=myHeader, json=payload)
+                    response = self.http.put(myURL, headers=myHeader, json=payload)
                 if response.status_code == 200:
                     result = "SUCCESS"
                     print(f'Added {payload["display_name"]}')
                 else:
                     result = "FAIL"
+                    success = False
                     print( f'API Call Status {response.status_code}, text:{response.text}')
             else:
                 print(f'TEST MODE: Would have added binding {payload["display_name"]}')
+        return success
 
 
     def importSDDCServices(self):
@@ -1737,51 +2124,54 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.services_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 services = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
-            return
-        for service in services:
+            return False
+
+        def service_payload(service):
             json_data = {}
-            if service["_create_user"]!= "admin" and service["_create_user"]!="admin;admin" and service["_create_user"]!="system":
-                if self.import_mode == "live":
-                    json_data["id"] = service["id"]
-                    json_data["resource_type"]=service["resource_type"]
-                    json_data["display_name"]=service["display_name"]
-                    json_data["service_type"]=service["service_type"]
-                    if 'tags' in service:
-                        json_data['tags'] = service['tags']
-                    
-                    service_entries = []
-                    for entry in service["service_entries"]:
-                        #print("-------------------------------------------------")
-                        #print("entry")
-                        modified_entry = {}
-                        for k in entry:
-                            #print("-------------------------------------------------")
-                            #print("sub_entry")
-                            #print(k)
-                            if k != "path"  and k != "relative_path" and k != "overridden" and k != "_create_time" and k != "_create_user" and k != "_last_modified_time" and k != "_last_modified_user" and k != "_system_owned" and k != "_protection" and k != "_revision":
-                                modified_entry[k] = entry[k]
-                        service_entries.append(modified_entry)
-                    json_data["service_entries"]=service_entries
-                    myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
-                    myURL = self.proxy_url + "/policy/api/v1/infra/services/" + service["id"]
-                    #print(myURL)
-                    #print(json_data)
-                    if self.sync_mode is True:
-                        response = requests.patch(myURL, headers=myHeader, json=json_data)
-                    else:
-                        response = requests.put(myURL, headers=myHeader, json=json_data)
-                    if response.status_code == 200:
-                        result = "SUCCESS"
-                        print('Added {}'.format(json_data['display_name']))
-                    else:
-                        result = "FAIL"
-                        print( f'API Call Status {response.status_code}, text:{response.text}')
+            json_data["id"] = service["id"]
+            json_data["resource_type"]=service["resource_type"]
+            json_data["display_name"]=service["display_name"]
+            json_data["service_type"]=service["service_type"]
+            if 'tags' in service:
+                json_data['tags'] = service['tags']
+
+            service_entries = []
+            for entry in service["service_entries"]:
+                service_entries.append(sync_diff.strip_system_fields(entry))
+            json_data["service_entries"]=service_entries
+            return json_data
+
+        def import_service(service):
+            if self.import_mode == "live":
+                json_data = service_payload(service)
+                myURL = self.proxy_url + "/policy/api/v1/infra/services/" + service["id"]
+                response = self.importObject(myURL, json_data)
+                if response is not None and response.status_code == 200:
+                    print('Added {}'.format(json_data['display_name']))
                 else:
-                    print("TEST MODE - Service",service["display_name"],"would have been imported.")
+                    print(self.lastJSONResponse)
+                    return False
+            else:
+                print("TEST MODE - Service",service["display_name"],"would have been imported.")
+            return True
+
+        def services_tree(chunk):
+            return {"resource_type": "Infra", "children": [{"resource_type": "ChildService", "Service": service_payload(service)} for service in chunk]}
+
+        stage = self.syncStage("Services", "/infra/services/", "Service", self.proxy_url + "/policy/api/v1/infra/services")
+        services = stage.filter(services, lambda s: "/infra/services/" + s["id"], service_payload)
+        services = [s for s in services if s["_create_user"]!= "admin" and s["_create_user"]!="admin;admin" and s["_create_user"]!="system"]
+        # Nested service entries reference other services, import the referenced services first
+        waves = worker_pool.dependency_waves(services, lambda s: "/infra/services/" + s["id"], lambda s: re.findall(r'/infra/services/[^"/]+', json.dumps(s["service_entries"])))
+        success = True
+        for wave in waves:
+            if self.importObjectList("services", wave, import_service, self.services_import_workers, services_tree) is False:
+                success = False
+        return success
 
 
     def import_mcgw(self):
@@ -1789,11 +2179,12 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mcgw_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 mcgws = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
+        success = True
         for mcgw in mcgws.values():
             json_data = {}
             json_data['id'] = mcgw['id']
@@ -1808,17 +2199,19 @@ class VMCImportExport:
                 my_header = {"Content-Type": "application/json", "Accept": "application/json", "csp-auth-token": self.vmc_auth.access_token}
                 my_url = self.proxy_url + '/policy/api/v1/infra/tier-1s/' + mcgw['id']
                 if self.sync_mode is True:
-                    response = requests.patch(my_url, headers=my_header, json=json_data)
+                    response = self.http.patch(my_url, headers=my_header, json=json_data)
                 else:
-                    response = requests.put(my_url, headers=my_header, json=json_data)
+                    response = self.http.put(my_url, headers=my_header, json=json_data)
                 if response.status_code == 200:
                     result = "SUCCESS"
                     print('Added {}'.format(json_data['display_name']))
                 else:
                     result = "FAIL"
+                    success = False
                     self.error_handling(response)
             else:
                 print(f'TEST MODE - {mcgw["id"]} would have been imported')
+        return success
 
 
     def import_mcgw_static_routes(self):
@@ -1826,12 +2219,13 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mcgw_static_route_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 routes = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
         
+        success = True
         for route in routes.values():
             for r in route['results']:
                 
@@ -1847,17 +2241,19 @@ class VMCImportExport:
                                     "csp-auth-token": self.vmc_auth.access_token}
                     my_url = f'{self.proxy_url}/policy/api/v1{path}'
                     if self.sync_mode is True:
-                        response = requests.patch(my_url, headers=my_header, json=json_data)
+                        response = self.http.patch(my_url, headers=my_header, json=json_data)
                     else:
-                        response = requests.put(my_url, headers=my_header, json=json_data)
+                        response = self.http.put(my_url, headers=my_header, json=json_data)
                     if response.status_code == 200:
                         result = "SUCCESS"
                         print('Added {}'.format(json_data['display_name']))
                     else:
                         result = "FAIL"
+                        success = False
                         self.error_handling(response)
                 else:
                     print(f"TEST MODE - Tier 1 Gateway static routes for {r['id']} would have been imported.")
+        return success
 
 
     def import_mcgw_fw(self):
@@ -1865,12 +2261,13 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mcgw_fw_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 rules = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
         
+        success = True
         for policy in rules.values():
             # print(json.dumps(policy, indent=2))
             # import and create the top level firewall policy
@@ -1884,14 +2281,15 @@ class VMCImportExport:
                 my_header = {"Content-Type": "application/json", "Accept": "application/json", "csp-auth-token": self.vmc_auth.access_token}
                 my_url = f'{self.proxy_url}/policy/api/v1{path}'
                 if self.sync_mode is True:
-                    response = requests.patch(my_url, headers=my_header, json=json_policy_data)
+                    response = self.http.patch(my_url, headers=my_header, json=json_policy_data)
                 else:
-                    response = requests.put(my_url, headers=my_header, json=json_policy_data)
+                    response = self.http.put(my_url, headers=my_header, json=json_policy_data)
                 if response.status_code == 200:
                     result = "SUCCESS"
                     print(f'Added {json_policy_data["id"]} firewall policy')
                 else:
                     result = "FAIL"
+                    success = False
                     self.error_handling(response)
                 json_rule_data = {}
                 rules = policy['rules']
@@ -1914,17 +2312,19 @@ class VMCImportExport:
                                     "csp-auth-token": self.vmc_auth.access_token}
                     my_url = f'{self.proxy_url}/policy/api/v1{path}'
                     if self.sync_mode is True:
-                        response = requests.patch(my_url, headers=my_header, json=json_rule_data)
+                        response = self.http.patch(my_url, headers=my_header, json=json_rule_data)
                     else:
-                        response = requests.put(my_url, headers=my_header, json=json_rule_data)
+                        response = self.http.put(my_url, headers=my_header, json=json_rule_data)
                     if response.status_code == 200:
                         result = "SUCCESS"
                         print(f'Added {json_rule_data["display_name"]} firewall rule')
                     else:
                         result = "FAIL"
+                        success = False
                         self.error_handling(response)
             else:
                 print(f"TEST MODE - Tier 1 Gateway {policy['id']} firewall policy and rules would have been imported.")
+        return success
 
 
     def import_mpl(self):
@@ -1932,19 +2332,20 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mpl_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 mpl = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
         
+        success = True
         for m in mpl:
             if m['linked_vpc_managed_prefix_list_info']['managed_prefix_list_mode'] == 'ENABLED':
                 vpc_id = m['linked_vpc_id']
                 if self.import_mode == 'live':
                     my_header = {"Content-Type": "application/json", "Accept": "application/json", "csp-auth-token": self.vmc_auth.access_token}
                     my_url = f'{self.proxy_url}/cloud-service/api/v1/linked-vpcs/{vpc_id}?action=enable_managed_prefix_list_mode'
-                    response = requests.post(my_url, headers=my_header)
+                    response = self.http.post(my_url, headers=my_header)
                     if response.status_code == 200:
                         result = "SUCCESS"
                         print('Enabling Managed Prefix List Mode.')
@@ -1974,12 +2375,14 @@ class VMCImportExport:
                     else:
                         self.error_handling(response)
                         result = "FAIL"
+                        success = False
                 else:
                     print("TEST MODE - Connected VPC Managed Prefix List mode would have been enabled")
                     result = "FAIL"
             else:
                 print(f'Source SDDC did not have Managed Prefix List enabled...skipping')
                 pass
+        return success
 
 
     def aws_ram_accept(self, vpc_id):
@@ -1987,14 +2390,14 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         my_header = {"Content-Type": "application/json", "Accept": "application/json", "csp-auth-token": self.vmc_auth.access_token}
         my_url = f'{self.proxy_url}/cloud-service/api/v1/linked-vpcs/{vpc_id}'
-        response = requests.get(my_url, headers=my_header)
+        response = self.http.get(my_url, headers=my_header)
         json_response = response.json()
         mpl_info = json_response['linked_vpc_managed_prefix_list_info']
         mpl_status = mpl_info.get('aws_resource_share_info')
         
         #wait for resource share to be created
         while mpl_status == None:
-            response = requests.get(my_url, headers=my_header)
+            response = self.http.get(my_url, headers=my_header)
             json_response = response.json()
             mpl_info = json_response['linked_vpc_managed_prefix_list_info']
             mpl_status = mpl_info.get('aws_resource_share_info')
@@ -2064,11 +2467,12 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.ral_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                ral = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
+        success = True
         for r in ral:
             json_data = {}
             json_data['display_name'] = r['display_name']
@@ -2083,15 +2487,17 @@ class VMCImportExport:
             if self.import_mode == 'live':
                 my_header = {"Content-Type": "application/json", "Accept": "application/json", "csp-auth-token": self.vmc_auth.access_token}
                 my_url = f'{self.proxy_url}/cloud-service/api/v1{path}'
-                response = requests.put(my_url, headers=my_header, json=json_data)
+                response = self.http.put(my_url, headers=my_header, json=json_data)
                 if response.status_code == 200:
                     result = "SUCCESS"
                     print(f'Added {json_data["display_name"]} route aggregation list')
                 else:
                     result = "FAIL"
+                    success = False
                     self.error_handling(response)
             else:
                 print(f'TEST Mode - Route Aggregation lists {json_data["id"]} would have been imported')
+        return success
 
 
     def import_route_config(self):
@@ -2099,11 +2505,12 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.route_config_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 config = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
-            return
+            return False
+        success = True
         for r in config:
             json_data = {}
             json_data['display_name'] = r['display_name']
@@ -2115,15 +2522,17 @@ class VMCImportExport:
                 my_header = {"Content-Type": "application/json", "Accept": "application/json",
                                 "csp-auth-token": self.vmc_auth.access_token}
                 my_url = f'{self.proxy_url}/cloud-service/api/v1/infra/external/route/configs/{r["id"]}'
-                response = requests.put(my_url, headers=my_header, json=json_data)
+                response = self.http.put(my_url, headers=my_header, json=json_data)
                 if response.status_code == 200:
                     result = "SUCCESS"
                     print(f'Added {json_data["display_name"]} route configuration')
                 else:
                     result = "FAIL"
+                    success = False
                     self.error_handling(response)
             else:
                 print(f'TEST Mode - Route configuration {json_data["id"]} would have been imported')
+        return success
     
 
     def rename_sddc_clusters(self):
@@ -2131,7 +2540,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.sddc_info_filename
         try:
-            with open (fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 config = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
@@ -2153,8 +2562,9 @@ class VMCImportExport:
                     json_data = {'cluster_name': cluster_name_list[counter]}
                     headers = {'Content-Type': 'application/json', 'Accept':'application/json', 'csp-auth-token': self.vmc_auth.access_token}
                     url = f'{self.strProdURL}/api/inventory/{self.dest_org_id}/vmc-aws/clusters/{cluster_id}:rename-cluster'
-                    response = requests.post(url, headers=headers, json=json_data)
+                    response = self.http.post(url, headers=headers, json=json_data)
                     if response.status_code == 202:
+                        self.discovery_cache.invalidate(self.sddcURL(self.dest_org_id, self.dest_sddc_id))
                         print(f'Cluster-{counter} renamed to {cluster_name_list[counter]}')
                     else:
                         self.error_handling(response)
@@ -2183,37 +2593,44 @@ class VMCImportExport:
 
         self.convertedServiceRolePayload['serviceRoles'] = servicedefs
         return True
-
-    def syncRolesToDestinationUsers(self):
-        """ Uses the payload built by convertServiceRolePayload to update user accounts"""
-        for email in self.RoleSyncDestUserEmails:
-            print(f'Looking up destination user {email}')
-            retval = self.searchOrgUser(self.dest_org_id,email)
-            if retval is False:
-                print('API error searching for ' + str(email))
-            else:
-                if len(self.user_search_results_json['results']) > 0:
-                    dest_user_json = self.user_search_results_json['results'][0]
-                    userId = dest_user_json['user']['userId']
-                    print(f'userId for {email} = {userId}')
-                    dest_user_roles = dest_user_json['serviceRoles']
-                    myURL =  self.strCSPProdURL + '/csp/gateway/am/api/v3/users/' + userId + '/orgs/' + self.dest_org_id + "/roles"
-                    if self.import_mode == "live":
-                        response = self.invokeVMCPATCH(myURL,json.dumps(self.convertedServiceRolePayload))
-                        if response.status_code == 200:
-                            print (f'Role sync success: {self.RoleSyncSourceUserEmail}->{email}')
-                        else:
-                            self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
-                            print(f'API error: {self.lastJSONResponse}')
-                    else:
-                        print(f'TEST MODE - would have synced {self.RoleSyncSourceUserEmail}->{email}')
+
+    def syncRolesToDestinationUsers(self):
+        """ Uses the payload built by convertServiceRolePayload to update user accounts"""
+        # Look up all destination users at once, then update their roles at once
+        emails = list(self.RoleSyncDestUserEmails)
+        print(f'Looking up destination users {", ".join(emails)}')
+        calls = [('GET', self.strCSPProdURL + "/csp/gateway/am/api/orgs/" + self.dest_org_id + "/users/search?userSearchTerm=" + email, None) for email in emails]
+        role_updates = []
+        for email, response in zip(emails, self.invokeMany(calls)):
+            if response is None or response.status_code != 200:
+                print('API error searching for ' + str(email))
+                continue
+            search_results = response.json()
+            if len(search_results['results']) > 0:
+                dest_user_json = search_results['results'][0]
+                userId = dest_user_json['user']['userId']
+                print(f'userId for {email} = {userId}')
+                myURL =  self.strCSPProdURL + '/csp/gateway/am/api/v3/users/' + userId + '/orgs/' + self.dest_org_id + "/roles"
+                if self.import_mode == "live":
+                    role_updates.append((email, myURL))
                 else:
-                    print('Could not find user with email ' + email)
+                    print(f'TEST MODE - would have synced {self.RoleSyncSourceUserEmail}->{email}')
+            else:
+                print('Could not find user with email ' + email)
+
+        calls = [('PATCH', myURL, json.dumps(self.convertedServiceRolePayload)) for email, myURL in role_updates]
+        for (email, myURL), response in zip(role_updates, self.invokeMany(calls)):
+            if response is None:
+                print(f'API error syncing {email}: {self.lastJSONResponse}')
+            elif response.status_code == 200:
+                print (f'Role sync success: {self.RoleSyncSourceUserEmail}->{email}')
+            else:
+                print(f'API error syncing {email}: API Call Status {response.status_code}, text:{response.text}')
 
     def invokeCSPGET(self,url: str) -> requests.Response:
         self.vmc_auth.check_access_token_expiration()
         try:
-            response = requests.get(url,headers= {"Authorization":"Bearer " + self.vmc_auth.access_token})
+            response = self.http.get(url,headers= {"Authorization":"Bearer " + self.vmc_auth.access_token})
             if response.status_code != 200:
                 self.error_handling(response)
             return response
@@ -2221,16 +2638,226 @@ class VMCImportExport:
                 self.lastJSONResponse = e
                 return None
 
+    def paginate(self, url: str, prefetch: int = 0):
+        """Yields the results of a list API call one page at a time, following the cursor until the last page
+
+        page_size is only sent to the NSX Policy API, the cloud-service API pages with its own defaults.
+        With prefetch > 0, up to that many pages are fetched on a background thread while the caller processes
+        the current one. Raises vmc_http.VMCAPIError if a page cannot be retrieved.
+        """
+        return worker_pool.prefetch(self.fetchPages(url), prefetch)
+
+    def fetchPages(self, url: str, cursor: str = None):
+        """Generator behind paginate, fetches the next page only when the previous one has been consumed
+
+        With a cursor, starts at the page after the one that returned the cursor.
+        """
+        params = {}
+        split_url = urlsplit(url)
+        if '/policy/api/' in split_url.path and self.export_page_size > 0 and 'page_size' not in parse_qs(split_url.query):
+            params['page_size'] = self.export_page_size
+        if cursor:
+            params['cursor'] = cursor
+        while True:
+            self.vmc_auth.check_access_token_expiration()
+            # Any query the caller passed, such as a search query, is kept as is
+            page_url = url
+            if len(params) > 0:
+                page_url += ('&' if '?' in url else '?') + urlencode(params)
+            try:
+                response = self.http.get(page_url, headers={'csp-auth-token': self.vmc_auth.access_token})
+            except Exception as e:
+                self.lastJSONResponse = e
+                raise vmc_http.VMCAPIError(f'{page_url}: {e}') from e
+            if response.status_code != 200:
+                self.error_handling(response)
+                self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
+                raise vmc_http.VMCAPIError(self.lastJSONResponse)
+            json_response = response.json()
+            results = json_response.get('results', [])
+            yield results
+            # An empty page with a cursor would loop forever
+            if not json_response.get('cursor') or len(results) == 0:
+                break
+            params['cursor'] = json_response['cursor']
+
+    def exportList(self, url: str, filename: str, prefetch: int = 0) -> bool:
+        """Writes every page of a list API call to a JSON file as it arrives, so only one page is held in memory"""
+        if self.incremental_export is True:
+            return self.exportListIncremental(url, filename, prefetch)
+        fname = self.export_path / filename
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                for page in self.paginate(url, prefetch):
+                    writer.extend(page)
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
+        return True
+
+    def exportListIncremental(self, url: str, filename: str, prefetch: int = 0) -> bool:
+        """exportList for incremental_export
+
+        If the previous export recorded the revisions of the collection, only the path and _revision of each object
+        are listed, and only the objects that are new or have a new _revision are retrieved and written to the file.
+        The delta manifest records the paths of all objects, so the file can be merged with the previous export.
+        Collections that were not in the previous export, and lists of objects without a path and _revision, are
+        exported in full.
+        """
+        previous = None
+        if self.export_index is not None and '/policy/api/v1/' in url:
+            previous = self.export_index['collections'].get(filename)
+        fname = self.export_path / filename
+        try:
+            listing = None
+            if previous is not None:
+                listing = self.listRevisions(url, prefetch)
+            if listing is None:
+                revisions = {}
+                with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                    for page in self.paginate(url, prefetch):
+                        writer.extend(page)
+                        page_revisions = delta_export.revisions(page)
+                        if revisions is not None and page_revisions is not None:
+                            revisions.update(page_revisions)
+                        else:
+                            revisions = None
+                if revisions is not None:
+                    self.recordExportRevisions(filename, revisions)
+                return True
+
+            changed = [path for path, revision in listing.items() if previous.get(path) != revision]
+            objects = self.getChangedObjects(url, changed, prefetch)
+            if objects is None:
+                return False
+            for path in changed:
+                if path in objects:
+                    listing[path] = objects[path]['_revision']
+                else:
+                    # Deleted after it was listed
+                    del listing[path]
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                writer.extend(objects[path] for path in changed if path in objects)
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
+        deleted = [path for path in previous if path not in listing]
+        self.recordExportRevisions(filename, listing, {'paths': list(listing), 'deleted': deleted})
+        print(f'{filename}: {len(objects)} changed and {len(deleted)} deleted of {len(listing)} objects')
+        return True
+
+    def listRevisions(self, url: str, prefetch: int = 0) -> dict:
+        """Returns {path: _revision} of the objects of a list API call, or None if an object has no path or _revision"""
+        url += ('&' if '?' in url else '?') + 'included_fields=path,_revision'
+        listing = {}
+        for page in self.paginate(url, prefetch):
+            page_revisions = delta_export.revisions(page)
+            if page_revisions is None:
+                return None
+            listing.update(page_revisions)
+        return listing
+
+    def getChangedObjects(self, url: str, paths: list, prefetch: int = 0) -> dict:
+        """Returns {path: object} of the objects in paths, or None if one could not be retrieved
+
+        Objects deleted since they were listed are left out.
+        """
+        if len(paths) == 0:
+            return {}
+        if len(paths) > self.export_page_size:
+            # Fewer calls to page through the whole collection than to get each object
+            wanted = set(paths)
+            return {obj['path']: obj for page in self.paginate(url, prefetch) for obj in page if obj.get('path') in wanted}
+        policy_url = url[:url.index('/policy/api/v1/')] + '/policy/api/v1'
+        objects = {}
+        responses = self.invokeMany([('GET', policy_url + path, None) for path in paths])
+        for path, response in zip(paths, responses):
+            if response is None:
+                return None
+            if response.status_code == 404:
+                continue
+            if response.status_code != 200:
+                return None
+            objects[path] = response.json()
+        return objects
+
+    def exportCachedList(self, url: str, filename: str) -> bool:
+        """exportList for collections that other sections read as well, the collection is retrieved once per run"""
+        if self.incremental_export is True:
+            return self.exportList(url, filename)
+        results = self.getCachedResults(url)
+        if results is None:
+            return False
+        fname = self.export_path / filename
+        with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+            writer.extend(results)
+        return True
+
+    def getAllResults(self, url: str, prefetch: int = 0) -> list:
+        """Returns the results of every page of a list API call, or None if a page could not be retrieved"""
+        results = []
+        try:
+            for page in self.paginate(url, prefetch):
+                results.extend(page)
+        except vmc_http.VMCAPIError as e:
+            # Set here as well, with prefetch the page was requested on another thread
+            self.lastJSONResponse = str(e)
+            return None
+        return results
+
+    def discoveryKey(self, url: str) -> tuple:
+        """Returns the discovery cache key for a URL - the endpoint, the URL and the refresh token it is read with"""
+        identity = hashlib.sha256((self.vmc_auth.activeRefreshToken or '').encode('utf-8')).hexdigest()
+        return (self.http.endpoint(url), url, identity)
+
+    def getManyResults(self, urls: list) -> list:
+        """Returns the results of several list API calls made concurrently, in the order of urls, or None if one failed
+
+        A collection with more than one page is paged through with getAllResults.
+        """
+        results = []
+        for url, response in zip(urls, self.invokeMany([('GET', url, None) for url in urls])):
+            if response is None or response.status_code != 200:
+                if response is not None:
+                    self.error_handling(response)
+                return None
+            json_response = response.json()
+            if json_response.get('cursor'):
+                results.append(self.getAllResults(url))
+                if results[-1] is None:
+                    return None
+            else:
+                results.append(json_response.get('results', []))
+        return results
+
+    def getCachedResults(self, url: str) -> list:
+        """getAllResults, made once per run for each URL and auth identity and shared by every caller
+
+        Returns None if a page could not be retrieved. The list is shared and must not be modified.
+        """
+        return self.discovery_cache.get(self.discoveryKey(url), lambda: self.getAllResults(url))
+
+    def getTier1s(self) -> list:
+        """Returns every Tier-1 gateway of the SDDC, or None if they could not be retrieved"""
+        return self.getCachedResults(f'{self.proxy_url}/policy/api/v1/infra/tier-1s')
+
+    def getLinkedVPCs(self) -> list:
+        """Returns the linked VPCs of the SDDC, or None if they could not be retrieved"""
+        return self.getCachedResults(f'{self.proxy_url}/cloud-service/api/v1/infra/linked-vpcs')
+
     def invokeVMCGET(self,url: str) -> requests.Response:
-        """Invokes a VMC On AWS GET request"""
+        """Invokes a VMC On AWS GET request, returns None if the request could not be made"""
         self.vmc_auth.check_access_token_expiration()
         myHeader = {'csp-auth-token': self.vmc_auth.access_token}
-        response = requests.get(url, headers=myHeader)
-        if response.status_code == requests.codes.ok:
+        try:
+            response = self.http.get(url, headers=myHeader)
+            if response.status_code != requests.codes.ok:
+                self.error_handling(response)
+                self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
             return response
-        else:
-            self.error_handling(response)
-            sys.exit(1)
+        except Exception as e:
+            self.lastJSONResponse = e
+            return None
 
 
     def invokeVMCPUT(self, url: str,json_data: str) -> requests.Response:
@@ -2238,7 +2865,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
         try:
-            response = requests.put(url,headers=myHeader,data=json_data)
+            response = self.http.put(url,headers=myHeader,data=json_data)
             if response.status_code != 200:
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
             return response
@@ -2251,7 +2878,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
         try:
-            response = requests.patch(url,headers=myHeader,data=json_data)
+            response = self.http.patch(url,headers=myHeader,data=json_data)
             if response.status_code != 200:
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
             return response
@@ -2259,10 +2886,216 @@ class VMCImportExport:
             self.lastJSONResponse = e
             return None
 
+    def exportIndent(self) -> int:
+        """JSON indent for export files - 4 for the pretty export_format, None for compact"""
+        return 4 if self.export_format == 'pretty' else None
+
+    def openExportFile(self, fname, mode: str = 'w'):
+        """Opens an export file for writing, as fname.gz when export_format is compact+gzip
+
+        While an export archive is open, the file is written into the archive instead. Archive members are already
+        deflated, so they are not gzipped as well.
+        """
+        if self.export_archive is not None:
+            return self.export_archive.open(Path(fname).name)
+        if self.export_format == 'compact+gzip':
+            return gzip.open(str(fname) + '.gz', mode.replace('+', '') + 't')
+        return open(fname, mode)
+
+    def openImportFile(self, fname):
+        """Opens an import file written in any export_format - fname, or fname.gz if only the gzipped file exists
+
+        While an import archive is open the file is read from the archive member with the same name. Files that are
+        not in the archive, such as public_ip_old_new.json which is written during the import, are read from disk.
+        """
+        if self.import_archive is not None:
+            name = Path(fname).name
+            members = self.import_archive.namelist()
+            if name in members and name.endswith('.gz'):
+                return gzip.open(self.import_archive.open(name), 'rt')
+            if name in members:
+                return io.TextIOWrapper(self.import_archive.open(name), encoding='utf-8')
+            if name + '.gz' in members:
+                return gzip.open(self.import_archive.open(name + '.gz'), 'rt')
+        if str(fname).endswith('.gz'):
+            return gzip.open(fname, 'rt')
+        if os.path.exists(fname) is False and os.path.exists(str(fname) + '.gz'):
+            return gzip.open(str(fname) + '.gz', 'rt')
+        return open(fname)
+
+    def loadImportList(self, fname):
+        """Returns the list in an import file, or an iterator over it when import_streaming is enabled"""
+        return json_stream.load(self.openImportFile(fname), self.import_streaming)
+
+    def loadImportItems(self, fname):
+        """Returns the (key, value) pairs of the dict in an import file, read incrementally when import_streaming is enabled"""
+        return json_stream.load_items(self.openImportFile(fname), self.import_streaming)
+
+    def syncDestination(self, collection_url: str = None, type_filter: str = None) -> dict:
+        """Returns {path: object} of the destination objects in a collection, or of a hierarchical GET of /infra
+
+        Retrieved once per import and shared by the stages that use the same objects. Returns None if the objects
+        could not be retrieved.
+        """
+        key = collection_url or type_filter
+        with self.sync_lock:
+            if key in self.sync_destinations:
+                return self.sync_destinations[key]
+        if collection_url is not None:
+            objects = self.getAllResults(collection_url)
+        else:
+            tree = self.getHierarchicalInfra(type_filter)
+            objects = None if tree is None else [obj for _, obj in self.flattenHierarchicalInfra(tree)]
+        destination = None
+        if objects is None:
+            print(f'Unable to retrieve the destination objects to compare with, every object will be sent: {self.lastJSONResponse}')
+        else:
+            destination = {obj['path']: obj for obj in objects if 'path' in obj}
+        with self.sync_lock:
+            self.sync_destinations[key] = destination
+        return destination
+
+    def syncStage(self, label: str, prefix: str, resource_type: str, collection_url: str = None, type_filter: str = None) -> sync_diff.SyncStage:
+        """Returns the SyncStage an importer passes its objects through, it passes every object when sync_diff and
+        sync_delete are disabled"""
+        destination = None
+        if self.sync_diff is True or self.sync_delete is True:
+            destination = self.syncDestination(collection_url, type_filter)
+        stage = sync_diff.SyncStage(label, destination, prefix, resource_type, self.sync_diff)
+        with self.sync_lock:
+            self.sync_stages.append(stage)
+        return stage
+
+    def syncDeleteStale(self):
+        """Deletes the destination objects that are not in the import files, for sync_delete
+
+        Only stages that read their whole import file are considered. Deeper paths are deleted first - rules before
+        their policies and before the groups and services they reference. Objects still referenced by another
+        object fail to delete and are retried after the others.
+        """
+        paths = [path for stage in self.sync_stages for path in stage.stale()]
+        if len(paths) == 0:
+            print('Sync: no destination objects to delete.')
+            return True
+        if self.import_mode != 'live':
+            for path in paths:
+                print('TEST MODE - Sync would have deleted', path)
+            return True
+
+        remaining = paths
+        for _ in range(3):
+            failed = []
+            for depth in sorted({path.count('/') for path in remaining}, reverse=True):
+                level = [path for path in remaining if path.count('/') == depth]
+                responses = self.invokeMany([('DELETE', self.proxy_url + '/policy/api/v1' + path, None) for path in level])
+                for path, response in zip(level, responses):
+                    if response is not None and response.status_code == 200:
+                        print('Sync: deleted', path)
+                    else:
+                        failed.append(path)
+            if len(failed) == 0 or len(failed) == len(remaining):
+                remaining = failed
+                break
+            remaining = failed
+        for path in remaining:
+            print('Sync: unable to delete', path)
+        return len(remaining) == 0
+
+    def importObject(self, url: str, payload: dict) -> requests.Response:
+        """Creates or updates a policy object - PUT by default, PATCH when sync_mode is enabled"""
+        json_data = json.dumps(payload)
+        if self.sync_mode is True:
+            return self.invokeVMCPATCH(url, json_data)
+        return self.invokeVMCPUT(url, json_data)
+
+    def importObjectList(self, label: str, objects: list, import_one, workers: int, infra_tree=None, weight=None) -> bool:
+        """Imports a list of objects with import_one on a bounded worker pool, returns False if an object failed
+
+        import_one(obj) returns False when the object could not be imported.
+
+        When bulk_import_mode is hierarchical, infra_tree(chunk) builds an Infra tree for a chunk of objects and each
+        chunk is sent as one hierarchical PATCH of /infra. A rejected chunk is imported again one object at a time,
+        so the errors are reported against the individual objects. weight(obj) is the number of policy objects an
+        item expands to, e.g. a security policy and its rules, and is used to size the chunks.
+        """
+        if infra_tree is None or self.bulk_import_mode != 'hierarchical' or self.import_mode != 'live':
+            results = worker_pool.bounded_map(import_one, objects, workers)
+            return all([retval is not False for retval in results])
+
+        def import_chunk(chunk):
+            response = self.invokeVMCPATCH(self.proxy_url + '/policy/api/v1/infra', json.dumps(infra_tree(chunk)))
+            if response is not None and response.status_code == 200:
+                print(f'{len(chunk)} {label} imported with a hierarchical PATCH.')
+                return True
+            print(f'Hierarchical import of {len(chunk)} {label} failed, importing them one at a time. {self.lastJSONResponse}')
+            return all([import_one(obj) is not False for obj in chunk])
+
+        def chunks():
+            # Built lazily, so streamed objects are sent while the rest of the import file is still being read
+            chunk = []
+            chunk_weight = 0
+            for obj in objects:
+                w = weight(obj) if weight is not None else 1
+                if len(chunk) > 0 and chunk_weight + w > self.bulk_import_chunk_size:
+                    yield chunk
+                    chunk = []
+                    chunk_weight = 0
+                chunk.append(obj)
+                chunk_weight += w
+            if len(chunk) > 0:
+                yield chunk
+
+        return all([retval for retval in worker_pool.bounded_map(import_chunk, chunks(), workers)])
+
+    def invokeMany(self, calls: list, elapsed: list = None) -> list:
+        """Invokes many VMC on AWS API calls concurrently
+
+        calls is a list of (method, url, json_data) tuples, json_data is None for a GET. The calls run on the async
+        engine when io_engine is async, otherwise on a pool of threads; either way at most fanout_workers are in
+        flight. Returns the responses in the order of calls, None for a call that raised an exception.
+        If elapsed is a list, it is filled with the seconds each call took, retries included, in the order of calls.
+        """
+        self.vmc_auth.check_access_token_expiration()
+        myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
+        http_calls = []
+        for method, url, json_data in calls:
+            kwargs = {'headers': myHeader}
+            if json_data is not None:
+                kwargs['data'] = json_data
+            http_calls.append((method, url, kwargs))
+
+        if self.io_engine == 'async':
+            results = vmc_async.AsyncVMCClient(self.http, concurrency=self.fanout_workers).run_many(http_calls, elapsed)
+        else:
+            call_times = [0.0] * len(http_calls)
+            def invoke(indexed_call):
+                index, (method, url, kwargs) = indexed_call
+                start = time.monotonic()
+                try:
+                    return self.http.request(method, url, **kwargs)
+                except Exception as e:
+                    return e
+                finally:
+                    call_times[index] = time.monotonic() - start
+            results = list(worker_pool.bounded_map(invoke, enumerate(http_calls), self.fanout_workers))
+            if elapsed is not None:
+                elapsed.extend(call_times)
+
+        responses = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.lastJSONResponse = result
+                responses.append(None)
+            else:
+                if result.status_code != 200:
+                    self.lastJSONResponse = f'API Call Status {result.status_code}, text:{result.text}'
+                responses.append(result)
+        return responses
+
     def invokeNSXTGET(self,url: str) -> requests.Response:
         myHeader = {"Content-Type": "application/json","Accept": "application/json"}
         try:
-            response = requests.get(url,headers=myHeader, auth=(self.srcNSXmgrUsername ,self.srcNSXmgrPassword), verify=self.srcNSXmgrSSLVerify)
+            response = self.http.get(url,headers=myHeader, auth=(self.srcNSXmgrUsername ,self.srcNSXmgrPassword), verify=self.srcNSXmgrSSLVerify)
             if response.status_code != 200:
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
             return response
@@ -2276,7 +3109,7 @@ class VMCImportExport:
         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
         myURL = self.proxy_url + '/policy/api/v1/search/aggregate?page_size=100'
         json_data = {"primary":{"resource_type":"VirtualMachine","filters":[{"field_names":"!tags.tag","value":"nsx_policy_internal"},{"field_names":"!display_name","value":"(\"NSX-Edge-0\" OR \"NSX-Edge-1\" OR \"NSX-Manager-0\" OR \"NSX-Manager-1\" OR \"NSX-Manager-2\" OR \"vcenter\")"}]},"related":[{"resource_type":"TransportNode OR HostNode","join_condition":"id:source.target_id","alias":"TransportNode"},{"resource_type":"VirtualNetworkInterface","join_condition":"owner_vm_id:external_id","alias":"VirtualNetworkInterface"},{"resource_type":"HostNode","join_condition":"id:host_id","alias":"HostNode","size":0},{"resource_type":"DiscoveredNode","join_condition":"external_id:$2.discovered_node_id","alias":"DiscoveredNode","size":0},{"resource_type":"ComputeManager","join_condition":"id:$3.origin_id","alias":"ComputeManager"}],"data_source":"ALL"}
-        response = requests.post(myURL, headers=myHeader, data=json.dumps(json_data))
+        response = self.http.post(myURL, headers=myHeader, data=json.dumps(json_data))
         if response.status_code != 200:
             self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
             return None
@@ -2321,7 +3154,7 @@ class VMCImportExport:
         }
 
         if self.import_mode == "live":
-            group_resp = requests.put(myURL,headers=myHeader,data=json.dumps(json_data))
+            group_resp = self.http.put(myURL,headers=myHeader,data=json.dumps(json_data))
             if group_resp.status_code == 200:
                 print(f'Group {group_name} has been created')
             else:
@@ -2336,20 +3169,9 @@ class VMCImportExport:
         """ Just what it sounds like - delete every single CGW group. Use with caution"""
         self.vmc_auth.check_access_token_expiration()
         myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups"
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
+        cgw_groups = self.getAllResults(myURL)
+        if cgw_groups is None:
             return False
-        json_response = response.json()
-        cgw_groups = json_response['results']
-
-        # After grabbing an intial set of results, check for presence of a cursor
-        while "cursor" in json_response:
-            myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups?cursor=" + json_response['cursor']
-            response = self.invokeVMCGET(myURL)
-            if response is None or response.status_code != 200:
-                return False
-            json_response = response.json()
-            cgw_groups.extend(json_response['results'])
 
         for grp in cgw_groups:
             retval = self.deleteSDDCCGWGroup(grp['id'])
@@ -2362,7 +3184,7 @@ class VMCImportExport:
 
         #json_data = {"display_name":group_name, "id":group_name }
         if self.import_mode == "live":
-            group_resp = requests.delete(myURL,headers=myHeader)
+            group_resp = self.http.delete(myURL,headers=myHeader)
             if group_resp.status_code == 200:
                 print(f'Group {group_name} has been deleted')
             else:
@@ -2375,42 +3197,8 @@ class VMCImportExport:
             """Exports the CGW groups to a JSON file"""
 
             self.vmc_auth.check_access_token_expiration()
-            debug_mode = False
-            debug_page_size = 20
-
             myURL = (self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups")
-
-            if debug_mode:
-                myURL += f'?page_size={debug_page_size}'
-                print(f'DEBUG, page size set to {debug_page_size}, calling {myURL}')
-            response = self.invokeVMCGET(myURL)
-            if response is None or response.status_code != 200:
-                return False
-            json_response = response.json()
-            cgw_groups = json_response['results']
-            result_count = json_response['result_count']
-            if debug_mode:
-                print(f'Result count: {result_count}')
-
-            # After grabbing an intial set of results, check for presence of a cursor
-            while "cursor" in json_response:
-                result_count -= debug_page_size
-                myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups?cursor=" + json_response['cursor']
-                if debug_mode:
-                    print(f'{result_count} records to go.')
-                    myURL += f'&page_size={debug_page_size}'
-                    print(f'DEBUG, page size set to {debug_page_size}, calling {myURL}')
-                response = self.invokeVMCGET(myURL)
-                if response is None or response.status_code != 200:
-                    return False
-                json_response = response.json()
-                cgw_groups.extend(json_response['results'])
-
-            fname = self.export_path / self.cgw_groups_filename
-            with open(fname, 'w') as outfile:
-                json.dump(cgw_groups, outfile,indent=4)
-
-            return True
+            return self.exportList(myURL, self.cgw_groups_filename, self.pagination_prefetch_depth)
 
     def import_advanced_firewall(self):
         """Imports NSX Advanced Firewall settings, profiles, policies and rules"""
@@ -2421,11 +3209,11 @@ class VMCImportExport:
                 retval = self.enable_advanced_firewall_dest()
                 if retval is False:
                     print("ERROR - Failed to enable NSX Advanced Firewall - unable to import")
-                    return
+                    return False
                 print("NSX advanced firewall has been enabled.")
             else:
                 print("ERROR - Unable to import advanced firewall config - the advanced firewall add-on is disabled in the destination SDDC. You can try to automatically enable the feature with the `nsx_adv_fw_allow_enable` flag in config.ini")
-                return
+                return False
 
         # wait 5 seconds before proceeding or you will get an error; service needs time to activate on NSX manager.
         time.sleep(5)
@@ -2437,15 +3225,18 @@ class VMCImportExport:
         #   "resource_type": "IdsSettings" - used to set NSX AF values
         #   "path": "/infra/settings/firewall/security/intrusion-services"
 
+        successval = True
         # Enable auto update
         retval = self.enable_nsx_ids_auto_update()
         if retval is False:
+            successval = False
             print('NSX Advanced Firewall autoupdate failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall autoupdate configured successfully.')
         # Update signatures
         retval = self.nsx_ids_update_signatures()
         if retval is False:
+            successval = False
             print('Automatic update of NSX Advanced Firewall signatures failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall signature update initiated.')
@@ -2453,6 +3244,7 @@ class VMCImportExport:
         # Enable all clusters
         retval = self.enable_nsx_ids_all_clusters()
         if retval is False:
+            successval = False
             print('NSX Advanced Firewall cluster enable failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall clusters enabled successfully.')
@@ -2461,6 +3253,7 @@ class VMCImportExport:
         # skip the import of system-created profile(s)
         retval = self.patch_ips_profile()
         if retval is False:
+            successval = False
             print('NSX Advanced Firewall profile import failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall profiles imported.')
@@ -2468,6 +3261,7 @@ class VMCImportExport:
         # Import NSX AF IDS policies
         retval = self.put_ids_policy()
         if retval is False:
+            successval = False
             print('NSX Advanced Firewall policy import failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall policies imported.')
@@ -2475,9 +3269,11 @@ class VMCImportExport:
         # Import NSX AF IDS rules
         retval = self.put_ids_rule()
         if retval is False:
+            successval = False
             print('NSX Advanced Firewall rule import failed: ', self.lastJSONResponse)
         else:
             print('NSX Advanced Firewall rules imported.')
+        return successval
 
     def enable_advanced_firewall_dest(self) -> bool:
         """Enable the NSX advanced firewall in the destination SDDC"""
@@ -2485,7 +3281,7 @@ class VMCImportExport:
         myURL = (self.strProdURL  + f'/vmc/skynet/api/orgs/{self.dest_org_id}/sddcs/{self.dest_sddc_id}/nsx-advanced-addon?enable=true')
         myHeader = {"Authorization":"Bearer " + self.vmc_auth.access_token}
         if self.import_mode == "live":
-            response = requests.post(myURL,headers=myHeader)
+            response = self.http.post(myURL,headers=myHeader)
             if response is None or (response.status_code != 200 and response.status_code != 201 and response.status_code != 202):
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
                 print(f'API Call Status {response.status_code}, text:{response.text}')
@@ -2506,7 +3302,7 @@ class VMCImportExport:
             "oversubscription": "DROPPED"
             }
         if self.import_mode == "live":
-            response = requests.patch(myURL, headers=myHeader, json=json_data)
+            response = self.http.patch(myURL, headers=myHeader, json=json_data)
             status = response.status_code
             if status == 202:
                 return response
@@ -2520,7 +3316,7 @@ class VMCImportExport:
         myHeader = {"Authorization":"Bearer " + self.vmc_auth.access_token}
         myURL = f"{self.proxy_url_short}/policy/api/v1/infra/settings/firewall/security/intrusion-services/signatures?action=update_signatures"
         if self.import_mode == "live":
-            response = requests.post(myURL, headers=myHeader)
+            response = self.http.post(myURL, headers=myHeader)
             status = response.status_code
             if status == 202:
                 return response
@@ -2562,7 +3358,7 @@ class VMCImportExport:
     def get_nsx_ids_cluster_enabled(self):
         myURL = f"{self.proxy_url_short}/policy/api/v1/infra/settings/firewall/security/intrusion-services/cluster-configs"
         myHeader = {"Authorization":"Bearer " + self.vmc_auth.access_token}
-        response = requests.get(myURL, headers=myHeader)
+        response = self.http.get(myURL, headers=myHeader)
         if response.status_code == 200:
             json_response = response.json()
             return json_response
@@ -2575,7 +3371,7 @@ class VMCImportExport:
     def enable_nsx_ids_cluster(self, targetID, json_data):
         myURL = f"{self.proxy_url_short}/policy/api/v1/infra/settings/firewall/security/intrusion-services/cluster-configs/{targetID}"
         myHeader = {"Authorization":"Bearer " + self.vmc_auth.access_token}
-        response = requests.patch(myURL, headers=myHeader, json=json_data)
+        response = self.http.patch(myURL, headers=myHeader, json=json_data)
         if response.status_code == 200:
             return response
         else:
@@ -2588,7 +3384,7 @@ class VMCImportExport:
         # self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.nsx_adv_fw_profiles_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 profiles = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
@@ -2610,9 +3406,9 @@ class VMCImportExport:
                         #'Path' key is grabbed the exported JSON                        
                         my_url = f'{self.proxy_url}/policy/api/v1{profile["path"]}'
                         if self.sync_mode is True:
-                            response = requests.patch(my_url, headers=myHeader, json=json_data)
+                            response = self.http.patch(my_url, headers=myHeader, json=json_data)
                         else:
-                            response = requests.put(my_url, headers=myHeader, json=json_data)
+                            response = self.http.put(my_url, headers=myHeader, json=json_data)
                         if response.status_code == 200:
                             result = "SUCCESS"
                             print('Added {}'.format(json_data['display_name']))
@@ -2625,7 +3421,7 @@ class VMCImportExport:
     def put_ids_policy(self):
         fname = self.import_path / self.nsx_adv_fw_policies_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 policies = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
@@ -2647,9 +3443,9 @@ class VMCImportExport:
                         #'Path' key is grabbed the exported JSON
                         my_url = f'{self.proxy_url}/policy/api/v1{pol["path"]}'
                         if self.sync_mode is True:
-                            response = requests.patch(my_url, headers=myHeader, json=json_data)
+                            response = self.http.patch(my_url, headers=myHeader, json=json_data)
                         else:
-                            response = requests.put(my_url, headers=myHeader, json=json_data)
+                            response = self.http.put(my_url, headers=myHeader, json=json_data)
                         if response.status_code == 200:
                             result = "SUCCESS"
                             print('Added {}'.format(json_data['display_name']))
@@ -2662,7 +3458,7 @@ class VMCImportExport:
     def put_ids_rule(self):
         fname = self.import_path / self.nsx_adv_fw_rules_import_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 rules = json.load(filehandle)
         except:
             print(f'Import failed - unable to open {fname}')
@@ -2682,9 +3478,9 @@ class VMCImportExport:
                         #'Path' key is grabbed the exported JSON
                         my_url = f'{self.proxy_url_short}/policy/api/v1{rule["path"]}'
                         if self.sync_mode is True:
-                            response = requests.patch(my_url, headers=myHeader, json=json_data)
+                            response = self.http.patch(my_url, headers=myHeader, json=json_data)
                         else:
-                            response = requests.put(my_url, headers=myHeader, json=json_data)
+                            response = self.http.put(my_url, headers=myHeader, json=json_data)
                         if response.status_code == 200:
                             result = "SUCCESS"
                             print('Added {}'.format(json_data['display_name']))
@@ -2701,58 +3497,70 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.cgw_import_filename
         try:
-            with open(fname) as filehandle:
-                cgwrules = json.load(filehandle)
+            cgwrules = self.loadImportList(fname)
         except:
             print('Import failed - unable to open',fname)
             return False
 
-        payload = {}
-        for rule in cgwrules:
-            skip_rule = False
-            for e in self.cgw_import_exclude_list:
-                m = re.match(e,rule["display_name"])
-                if m:
-                    print(rule["display_name"],'skipped - matches exclusion regex', e)
-                    skip_rule = True
-                    break
-            if skip_rule is True:
-                continue
+        def rule_payload(rule):
+            payload = {}
+            payload["id"]=rule["id"]
+            if rule.get("tags"):
+                payload["tags"] = rule["tags"]
+            if rule.get("description"):
+                payload["description"] = rule["description"]
+            payload["source_groups"] = rule["source_groups"]
+            payload["resource_type"]=rule["resource_type"]
+            payload["display_name"]=rule["display_name"]
+            payload["scope"]=rule["scope"]
+            payload["action"]=rule["action"]
+            payload["services"]=rule["services"]
+            payload["destination_groups"]=rule["destination_groups"]
+            # Rules are imported in parallel, the sequence number keeps them in the exported order
+            if "sequence_number" in rule:
+                payload["sequence_number"]=rule["sequence_number"]
+            return payload
+
+        def import_rule(rule):
+            payload = rule_payload(rule)
+            if self.import_mode == "live":
+                myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/gateway-policies/default/rules/" + rule["id"]
+                createfwruleresp = self.importObject(myURL, payload)
+                if createfwruleresp is not None and createfwruleresp.status_code == 200:
+                    print("Firewall Rule " + payload["display_name"] + " has been imported.")
+                else:
+                    print(self.lastJSONResponse)
+                    if createfwruleresp is not None and len(self.cgw_groups_import_error_dict) > 0:
+                        self.check_compute_group_errors(createfwruleresp.text)
+                    return False
+            else:
+                print("TEST MODE - Firewall Rule " + payload["display_name"] + " would have been imported." )
+            return True
 
-            if rule["_create_user"]!= "admin" and rule["_create_user"]!="admin;admin" and rule["_create_user"]!="system":
-                payload["id"]=rule["id"]
-                if rule.get("tags"):
-                    payload["tags"] = rule["tags"]
-                if rule.get("description"):
-                    payload["description"] = rule["description"]
-                payload["source_groups"] = rule["source_groups"]
-                payload["resource_type"]=rule["resource_type"]
-                payload["display_name"]=rule["display_name"]
-                payload["scope"]=rule["scope"]
-                payload["action"]=rule["action"]
-                payload["services"]=rule["services"]
-                payload["destination_groups"]=rule["destination_groups"]
-                if self.import_mode == "live":
-                    json_data = json.dumps(payload)
-                    myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
-                    myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/gateway-policies/default/rules/" + rule["id"]
-                    json_data = json.dumps(payload)
-                    if self.sync_mode is True:
-                        createfwruleresp = requests.patch(myURL,headers=myHeader,data=json_data)
-                    else:
-                        createfwruleresp = requests.put(myURL,headers=myHeader,data=json_data)
+        stage = self.syncStage("CGW rules", "/infra/domains/cgw/gateway-policies/default/rules/", "Rule",
+                               self.proxy_url + "/policy/api/v1/infra/domains/cgw/gateway-policies/default/rules")
+
+        def rules():
+            for rule in stage.filter(cgwrules, lambda r: "/infra/domains/cgw/gateway-policies/default/rules/" + r["id"], rule_payload):
+                skip_rule = False
+                for e in self.cgw_import_exclude_list:
+                    m = re.match(e,rule["display_name"])
+                    if m:
+                        print(rule["display_name"],'skipped - matches exclusion regex', e)
+                        skip_rule = True
+                        break
+                if skip_rule is True:
+                    continue
+                if rule["_create_user"]!= "admin" and rule["_create_user"]!="admin;admin" and rule["_create_user"]!="system":
+                    yield rule
 
-                    if  createfwruleresp.status_code == 200:
-                        print("Firewall Rule " + payload["display_name"] + " has been imported.")
-                    else:
-                        self.lastJSONResponse = f'API Call Status {createfwruleresp.status_code}, text:{createfwruleresp.text}'
-                        print(f'API Call Status {createfwruleresp.status_code}, text:{createfwruleresp.text}')
-                        if len(self.cgw_groups_import_error_dict) > 0:
-                            self.check_compute_group_errors(createfwruleresp.text)  
-                else:
-                    print("TEST MODE - Firewall Rule " + payload["display_name"] + " would have been imported." )
-                payload = {}
-        return True
+        def rules_tree(chunk):
+            gateway_policy = {"resource_type": "ChildResourceReference", "id": "default", "target_type": "GatewayPolicy",
+                              "children": [{"resource_type": "ChildRule", "Rule": rule_payload(rule)} for rule in chunk]}
+            domain = {"resource_type": "ChildResourceReference", "id": "cgw", "target_type": "Domain", "children": [gateway_policy]}
+            return {"resource_type": "Infra", "children": [domain]}
+
+        return self.importObjectList("CGW rules", rules(), import_rule, self.cgw_import_workers, rules_tree)
 
 
     def importSDDCCGWGroup(self):
@@ -2760,15 +3568,43 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.cgw_groups_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 groups = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
             return False
 
-        payload = {}
-        for group in groups:
-            skip_vm_expression = False
+        def group_payload(group):
+            payload = {}
+            payload["id"]=group["id"]
+            payload["resource_type"]=group["resource_type"]
+            payload["display_name"]=group["display_name"]
+            if 'tags' in group:
+                payload['tags'] = group['tags']
+            if "expression" in group:
+                payload["expression"]=group["expression"]
+            return payload
+
+        def import_group(group):
+            payload = group_payload(group)
+            if self.import_mode == "live":
+                myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups/" + group["id"]
+                creategrpresp = self.importObject(myURL, payload)
+                if creategrpresp is not None and creategrpresp.status_code == 200:
+                    print("CGW Group " + payload["display_name"] + " has been imported.")
+                else:
+                    msg = f'CGW Group {payload["display_name"]} import error: {self.lastJSONResponse}'
+                    print(msg)
+                    path = "/infra/domains/cgw/groups/" + group["id"]
+                    self.cgw_groups_import_error_dict[path] = { "display_name": payload["display_name"] , "error_message": msg }
+                    return False
+            else:
+                print("TEST MODE - CGW Group " + payload["display_name"] + " would have been imported.")
+            return True
+
+        stage = self.syncStage("CGW groups", "/infra/domains/cgw/groups/", "Group", self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups")
+        import_groups = []
+        for group in stage.filter(groups, lambda g: "/infra/domains/cgw/groups/" + g["id"], group_payload):
             skip_group = False
             for e in self.cgw_groups_import_exclude_list:
                 m = re.match(e,group["display_name"])
@@ -2779,41 +3615,36 @@ class VMCImportExport:
             if skip_group is True:
                 continue
             if group["_create_user"]!= "admin" and group["_create_user"]!="admin;admin":
-                payload["id"]=group["id"]
-                payload["resource_type"]=group["resource_type"]
-                payload["display_name"]=group["display_name"]
-                if 'tags' in group:
-                    payload['tags'] = group['tags']
-
                 if self.import_mode == "live":
-                    myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
-                    myURL = self.proxy_url + "/policy/api/v1/infra/domains/cgw/groups/" + group["id"]
-                    if "expression" in group:
-                        group_expression = group["expression"]
-                        for item in group_expression:
-                            if item["resource_type"] == "ExternalIDExpression":
-                                skip_vm_expression = True
-                                msg = f'CGW Group {group["display_name"]} cannot be imported as it relies on VM external ID.'
-                                print(msg)
-                                path = "/infra/domains/cgw/groups/" + group["id"]
-                                self.cgw_groups_import_error_dict[path] = { "display_name": payload["display_name"] , "error_message": msg }
-                                break
-                    else:
+                    if "expression" not in group:
                         continue
-                    if skip_vm_expression == False:
-                        payload["expression"]=group["expression"]
-                        json_data = json.dumps(payload)
-                        if self.sync_mode is True:
-                            creategrpresp = requests.patch(myURL,headers=myHeader,data=json_data)
-                        else:
-                            creategrpresp = requests.put(myURL,headers=myHeader,data=json_data)
-                        print("CGW Group " + payload["display_name"] + " has been imported.")
-                    else:
+                    skip_vm_expression = False
+                    for item in group["expression"]:
+                        if item["resource_type"] == "ExternalIDExpression":
+                            skip_vm_expression = True
+                            msg = f'CGW Group {group["display_name"]} cannot be imported as it relies on VM external ID.'
+                            print(msg)
+                            path = "/infra/domains/cgw/groups/" + group["id"]
+                            self.cgw_groups_import_error_dict[path] = { "display_name": group["display_name"] , "error_message": msg }
+                            break
+                    if skip_vm_expression is True:
                         continue
-                else:
-                        print("TEST MODE - CGW Group " + payload["display_name"] + " would have been imported.")
-                payload = {}
-        return True
+                import_groups.append(group)
+
+        # Groups can contain other groups through path expressions, import the member groups first
+        waves = worker_pool.dependency_waves(import_groups, lambda g: "/infra/domains/cgw/groups/" + g["id"], lambda g: re.findall(r'/infra/domains/cgw/groups/[^"/,]+', json.dumps(g.get("expression", []))))
+        def groups_tree(chunk):
+            domain = {"resource_type": "ChildResourceReference", "id": "cgw", "target_type": "Domain",
+                      "children": [{"resource_type": "ChildGroup", "Group": group_payload(group)} for group in chunk]}
+            return {"resource_type": "Infra", "children": [domain]}
+
+        # Groups that rely on VM external IDs are reported in cgw_groups_import_error_dict, they cannot be imported
+        # by design and do not fail the stage
+        success = True
+        for wave in waves:
+            if self.importObjectList("CGW groups", wave, import_group, self.compute_groups_import_workers, groups_tree) is False:
+                success = False
+        return success
 
     def importServiceAccess(self):
         """Imports SDDC Service Access config from a JSON file"""
@@ -2823,7 +3654,7 @@ class VMCImportExport:
         myHeader = {'csp-auth-token': self.vmc_auth.access_token}
         myURL = (self.proxy_url + '/cloud-service/api/v1/infra/linked-vpcs')
         try:
-            response = requests.get(myURL,headers=myHeader)
+            response = self.http.get(myURL,headers=myHeader)
             if response.status_code != 200:
                 self.lastJSONResponse  = f'API Call Status {response.status_code}, text:{response.text}'
                 return False
@@ -2843,10 +3674,11 @@ class VMCImportExport:
         linked_vpc_id = linked_vpc['linked_vpc_id']
 
         # Looking for *-service_access.json
-        files = glob.glob(self.import_folder + '/*-' + self.service_access_filename)
+        files = self.listImportFiles('*-' + self.service_access_filename) + self.listImportFiles('*-' + self.service_access_filename + '.gz')
+        success = True
         for f in files:
             payload = {}
-            with open(f) as filehandle:
+            with self.openImportFile(f) as filehandle:
                 svcaccess = json.load(filehandle)
                 payload['name'] = svcaccess['name']
                 payload['enabled'] = svcaccess['enabled']
@@ -2855,23 +3687,24 @@ class VMCImportExport:
                     myURL = (self.proxy_url + '/cloud-service/api/v1/infra/linked-vpcs/' + linked_vpc_id + '/connected-services/' + payload['name'])
                     json_data = json.dumps(payload)
                     if self.sync_mode is True:
-                        svcresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                        svcresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                     else:
-                        svcresp = requests.put(myURL,headers=myHeader,data=json_data)
+                        svcresp = self.http.put(myURL,headers=myHeader,data=json_data)
                     if svcresp.status_code == 200:
                         print("Service Access " + payload["name"] + " has been imported.")
                     else:
                         print(f'API Call Status {svcresp.status_code}, text:{svcresp.text}')
                         print(json_data)
+                        success = False
                 else:
                     print("TEST MODE - Service Access " + payload['name']  + " would have been importeed.")
 
-        return True
+        return success
 
     def importVPNLocalBGP(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_local_bgp_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             local_bgp = json.load(filehandle)
             payload = {}
             payload["local_as_num"] = local_bgp ["local_as_num"]
@@ -2880,7 +3713,7 @@ class VMCImportExport:
                 myURL = self.proxy_url + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/bgp"
                 json_data = json.dumps(payload)
                 # Always using PATCH here because this BGP object always exists in any SDDC
-                bgppresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                bgppresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                 if bgppresp.status_code == 200:
                     print("Local BGP config  has been imported.")
                 else:
@@ -2892,7 +3725,7 @@ class VMCImportExport:
     def importVPNBGPNeighbors(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_bgp_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             bgpdata = json.load(filehandle)
             payload = {}
             for bgpentry in bgpdata:
@@ -2923,9 +3756,9 @@ class VMCImportExport:
                             myURL = self.proxy_url + "/policy/api/v1/infra/tier-0s/vmc/locale-services/default/bgp/neighbors/" + bgpentry["id"]
                             json_data = json.dumps(payload)
                             if self.sync_mode is True:
-                                bgppresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                                bgppresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                             else:
-                                bgppresp = requests.put(myURL,headers=myHeader,data=json_data)
+                                bgppresp = self.http.put(myURL,headers=myHeader,data=json_data)
                             if bgppresp.status_code == 200:
                                 print("BGP neighbor " + payload["display_name"] + " has been imported.")
                             else:
@@ -2937,7 +3770,7 @@ class VMCImportExport:
     def importVPNTunnelProfiles(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_tunnel_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             tunps = json.load(filehandle)
             payload = {}
             for tunp in tunps:
@@ -2956,9 +3789,9 @@ class VMCImportExport:
                         myURL = self.proxy_url + "/policy/api/v1/infra/ipsec-vpn-tunnel-profiles/" + tunp["id"]
                         json_data = json.dumps(payload)
                         if self.sync_mode is True:
-                            tunpresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                            tunpresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                         else:
-                            tunpresp = requests.put(myURL,headers=myHeader,data=json_data)
+                            tunpresp = self.http.put(myURL,headers=myHeader,data=json_data)
                         if tunpresp.status_code == 200:
                             print("Tunnel Profile " + payload["display_name"] + " has been imported.")
                         else:
@@ -2969,7 +3802,7 @@ class VMCImportExport:
     def importVPNDPDProfiles(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_dpd_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             dpdps = json.load(filehandle)
             payload = {}
             for dpdp in dpdps:
@@ -2987,9 +3820,9 @@ class VMCImportExport:
                         my_url = f"{self.proxy_url}/policy/api/v1{profile_url}"
                         json_data = json.dumps(payload)
                         if self.sync_mode is True:
-                            response = requests.patch(my_url, headers=my_header, data=json_data)
+                            response = self.http.patch(my_url, headers=my_header, data=json_data)
                         else:
-                            response = requests.put(my_url, headers=my_header, data=json_data)
+                            response = self.http.put(my_url, headers=my_header, data=json_data)
                         if response.status_code == 200:
                             print(f"DPD Profile {payload['display_name']} has been imported")
                         else:
@@ -3001,7 +3834,7 @@ class VMCImportExport:
     def importVPNl2config(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_l2_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             l2vpns = json.load(filehandle)
             payload = {}
             for l2vpn in l2vpns:
@@ -3024,9 +3857,9 @@ class VMCImportExport:
                         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                         myURL = self.proxy_url + f'/policy/api/v1/infra/tier-0s/vmc/locale-services/default/l2vpn-services/default/sessions/{payload["id"]}'
                         if self.sync_mode is True:
-                            l2vpnresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                            l2vpnresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                         else:
-                            l2vpnresp = requests.put(myURL,headers=myHeader,data=json_data)
+                            l2vpnresp = self.http.put(myURL,headers=myHeader,data=json_data)
                         if l2vpnresp.status_code == 200:
                             print("L2VPN " + payload["id"] + " has been imported.")
                         else:
@@ -3039,7 +3872,7 @@ class VMCImportExport:
     def importVPNl3config(self):
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_l3_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             l3vpns = json.load(filehandle)
             payload = {}
             for l3vpn in l3vpns:
@@ -3127,9 +3960,9 @@ class VMCImportExport:
                         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                         myURL = self.proxy_url + f'/policy/api/v1/infra/tier-0s/vmc/locale-services/default/ipsec-vpn-services/default/sessions/{payload["id"]}'
                         if self.sync_mode is True:
-                            l3vpnresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                            l3vpnresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                         else:
-                            l3vpnresp = requests.put(myURL,headers=myHeader,data=json_data)
+                            l3vpnresp = self.http.put(myURL,headers=myHeader,data=json_data)
                         if l3vpnresp.status_code == 200:
                             print("L3VPN " + payload["id"] + " has been imported.")
                         else:
@@ -3141,7 +3974,7 @@ class VMCImportExport:
         """Import all"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.vpn_ike_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             ikeps = json.load(filehandle)
             payload = {}
             for ikep in ikeps:
@@ -3161,9 +3994,9 @@ class VMCImportExport:
                         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token }
                         myURL = self.proxy_url + "/policy/api/v1/infra/ipsec-vpn-ike-profiles/" + ikep["id"]
                         if self.sync_mode is True:
-                            createikepresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                            createikepresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                         else:
-                            createikepresp = requests.put(myURL,headers=myHeader,data=json_data)
+                            createikepresp = self.http.put(myURL,headers=myHeader,data=json_data)
                         if createikepresp.status_code == 200:
                             print("IKE Profile " + payload["display_name"] + " has been imported.")
                         else:
@@ -3176,12 +4009,12 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mgw_import_filename
         try:
-            with open(fname) as filehandle:
-                mgwrules = json.load(filehandle)
+            mgwrules = self.loadImportList(fname)
         except:
             print('Import failed - unable to open',fname)
             return False
 
+        success = True
         payload = {}
         for rule in mgwrules:
             skip_rule = False
@@ -3213,26 +4046,31 @@ class VMCImportExport:
                     myURL = self.proxy_url + "/policy/api/v1/infra/domains/mgw/gateway-policies/default/rules/" + rule["id"]
                     json_data = json.dumps(payload)
                     if self.sync_mode is True:
-                        createfwruleresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                        createfwruleresp = self.http.patch(myURL,headers=myHeader,data=json_data)
                     else:
-                        createfwruleresp = requests.put(myURL,headers=myHeader,data=json_data)
-                    print("Firewall Rule " + payload["display_name"] + " has been imported.")
+                        createfwruleresp = self.http.put(myURL,headers=myHeader,data=json_data)
+                    if createfwruleresp.status_code == 200:
+                        print("Firewall Rule " + payload["display_name"] + " has been imported.")
+                    else:
+                        print(f'Firewall Rule {payload["display_name"]} import error: API Call Status {createfwruleresp.status_code}, text:{createfwruleresp.text}')
+                        success = False
                 else:
                     print("TEST MODE - Firewall Rule " + payload["display_name"] + " would have been imported.")
                 payload = {}
-        return True
+        return success
 
     def importSDDCMGWGroup(self):
         """Import all MGW groups from a JSON file"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.mgw_groups_filename
         try:
-            with open(fname) as filehandle:
+            with self.openImportFile(fname) as filehandle:
                 groups = json.load(filehandle)
         except:
             print('Import failed - unable to open',fname)
             return False
 
+        success = True
         payload = {}
         for group in groups:
             skip_group = False
@@ -3258,41 +4096,37 @@ class VMCImportExport:
                     myURL = self.proxy_url + "/policy/api/v1/infra/domains/mgw/groups/" + group["id"]
                     json_data = json.dumps(payload)
                     if self.sync_mode is True:
-                        creategrpresp = requests.patch(myURL,headers=myHeader,data=json_data)
+                        creategrpresp = self.http.patch(myURL,headers=myHeader,data=json_data)
+                    else:
+                        creategrpresp = self.http.put(myURL,headers=myHeader,data=json_data)
+                    if creategrpresp.status_code == 200:
+                        print("MGW Group " + payload["display_name"] + " has been imported.")
                     else:
-                        creategrpresp = requests.put(myURL,headers=myHeader,data=json_data)
-                    print("MGW Group " + payload["display_name"] + " has been imported.")
+                        print(f'MGW Group {payload["display_name"]} import error: API Call Status {creategrpresp.status_code}, text:{creategrpresp.text}')
+                        success = False
                 else:
                     print("TEST MODE - MGW Group " + payload["display_name"] + " would have been imported.")
                 payload = {}
-        return True
+        return success
 
     def exportSDDCNat(self):
         """Exports the NAT rules to a JSON file"""
         self.vmc_auth.check_access_token_expiration()
         myURL = (self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/nat/USER/nat-rules")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        nat_results = json_response['results']
-        fname = self.export_path / self.nat_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(nat_results, outfile,indent=4)
-        return True
+        return self.exportList(myURL, self.nat_export_filename)
 
     def importSDDCNats(self):
         """Imports SDDC NAT from a JSON file"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.nat_import_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             nat = json.load(filehandle)
 
         fname = self.import_path / self.public_ip_old_new_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             public_ip_old_new = json.load(filehandle)
 
+        success = True
         for n in nat:
             json_data = {}
             json_data["id"] = n['id']
@@ -3312,9 +4146,13 @@ class VMCImportExport:
                     new_ip_name_dash = json_data["translated_network"].replace(".","-")
                     myURL = (self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/nat/USER/nat-rules/" + (n['display_name']).replace(" ", "-") + "-" + new_ip_name_dash)
                     myHeader = {'csp-auth-token': self.vmc_auth.access_token}
-                    response = requests.put(myURL, headers=myHeader, json=json_data)
+                    response = self.http.put(myURL, headers=myHeader, json=json_data)
                     json_response_status_code = response.status_code
-                    print("NAT Rule " + n['display_name'] + " has been imported.")
+                    if json_response_status_code == 200:
+                        print("NAT Rule " + n['display_name'] + " has been imported.")
+                    else:
+                        self.error_handling(response)
+                        success = False
                 elif action == "DNAT":
                     old_ip = n["destination_network"]
                     json_data["destination_network"] = public_ip_old_new[old_ip]
@@ -3324,27 +4162,30 @@ class VMCImportExport:
                     new_ip_name_dash = json_data["destination_network"].replace(".","-")
                     myURL = (self.proxy_url + "/policy/api/v1/infra/tier-1s/cgw/nat/USER/nat-rules/" + (n['display_name']).replace(" ", "-") + "-" + new_ip_name_dash)
                     myHeader = {'csp-auth-token': self.vmc_auth.access_token}
-                    response = requests.put(myURL, headers=myHeader, json=json_data)
+                    response = self.http.put(myURL, headers=myHeader, json=json_data)
                     json_response_status_code = response.status_code
-                    print("NAT Rule " + n['display_name'] + " has been imported.")
+                    if json_response_status_code == 200:
+                        print("NAT Rule " + n['display_name'] + " has been imported.")
+                    else:
+                        self.error_handling(response)
+                        success = False
                 else:
                     print("unknown NAT rule type.")
             else:
                 print("TEST MODE - NAT Rule " + n['display_name'] + " would have been imported.")
+        return success
 
     def exportSDDCListPublicIP(self):
         """Exports the Public IPs to a JSON file"""
         myURL = (self.proxy_url + "/cloud-service/api/v1/infra/public-ips")
-        response = self.invokeVMCGET(myURL)
-        if response is None or response.status_code != 200:
-            return False
-
-        json_response = response.json()
-        sddc_public_ips = json_response['results']
-        sddc_dict = [{d['ip']:d['display_name']} for d in sddc_public_ips]
         fname = self.export_path / self.public_export_filename
-        with open(fname, 'w') as outfile:
-            json.dump(sddc_dict, outfile,indent=4)
+        try:
+            with self.openExportFile(fname, 'w') as outfile, json_stream.JSONArrayWriter(outfile, self.exportIndent()) as writer:
+                for sddc_public_ips in self.paginate(myURL):
+                    writer.extend({d['ip']:d['display_name']} for d in sddc_public_ips)
+        except vmc_http.VMCAPIError as e:
+            self.lastJSONResponse = str(e)
+            return False
         return True
 
     def importSDDCPublicIPs(self):
@@ -3353,8 +4194,9 @@ class VMCImportExport:
         myHeader = {"Content-Type": "application/json","Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token}
         proxy_url_short = (self.proxy_url).rstrip("sks-nsxt-manager")
         aDict = {}
+        success = True
         fname = self.import_path / self.public_import_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             public_ip_list = json.load(filehandle)
             for n in public_ip_list:
                 public_name = list(n.values())[0]
@@ -3366,10 +4208,10 @@ class VMCImportExport:
                 "display_name" : public_name
                 }
                 if self.import_mode == "live":
-                    public_ip_response = requests.put(myURL, headers=myHeader, json=public_ip_request_data)
+                    public_ip_response = self.http.put(myURL, headers=myHeader, json=public_ip_request_data)
                     myHeader = {'csp-auth-token': self.vmc_auth.access_token}
                     myURL = (self.proxy_url + "/cloud-service/api/v1/infra/public-ips/" + public_name)
-                    response = requests.get(myURL, headers=myHeader)
+                    response = self.http.get(myURL, headers=myHeader)
                     json_response = response.json()
                     if "ip" in json_response:
                         new_ip =json_response['ip']
@@ -3379,20 +4221,21 @@ class VMCImportExport:
                     else:
                         print("Error: no IP found in JSON:", json_response)
                         new_ip = list(n.keys())[0]
+                        success = False
                 else:
                     old_ip =list(n.keys())[0]
                     aDict[old_ip] = old_ip
                     print("TEST MODE - Previous IP " + old_ip + " would have been remapped.")
             fname = self.export_path / self.public_ip_old_new_filename
-            with open(fname, 'w') as outfile:
-                json.dump(aDict, outfile,indent=4)
-            return aDict
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(aDict, outfile, self.exportIndent())
+            return success
 
     def enable_sddc_ipv6(self):
         """Enable IPv6 on destination SDDC if enalbed on source SDDC"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.sddc_info_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             source_sddc_info = json.load(filehandle)
         if self.import_mode == 'live':
             dest_sddc_json = self.loadSDDCData(self.dest_org_id, self.dest_sddc_id)
@@ -3412,8 +4255,9 @@ class VMCImportExport:
                             "type": "AwsEnableIpv6Config"
                         }
                     }
-                    response = requests.post(my_url, json=json_body, headers=my_header)
+                    response = self.http.post(my_url, json=json_body, headers=my_header)
                     if response.status_code == 201:
+                        self.discovery_cache.invalidate(self.sddcURL(self.dest_org_id, self.dest_sddc_id))
                         print(f"Enabling IPv6 on SDDC, please wait...")
                         time.sleep(180)
                         return True
@@ -3431,7 +4275,7 @@ class VMCImportExport:
         """Import FQDN attributes for L7 Context Profiles"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.nsx_l7_fqdn_import_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             fqdn_import = json.load(filehandle)
         json_data = {}
         json_data['key'] = fqdn_import['key']
@@ -3440,7 +4284,7 @@ class VMCImportExport:
         if self.import_mode == 'live':
             url = f'{self.proxy_url}/policy/api/v1/infra/context-profiles/custom-attributes/default'
             headers = {"Content-Type": "application/json", "Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token}
-            response = requests.patch(url, headers=headers, json=json_data)
+            response = self.http.patch(url, headers=headers, json=json_data)
             if response.status_code != 200:
                 self.error_handling(response)
                 return False
@@ -3448,14 +4292,16 @@ class VMCImportExport:
                 print('Custom FQDN attributes imported')
         else:
             print('TEST Mode - FQDN attributes would have been imported')
+        return True
     
 
     def import_l7_cp(self):
         """Import NSX layer 7 context profiles for DFW"""
         self.vmc_auth.check_access_token_expiration()
         fname = self.import_path / self.nsx_l7_context_profile_import_filename
-        with open(fname) as filehandle:
+        with self.openImportFile(fname) as filehandle:
             l7_cp = json.load(filehandle)
+        success = True
         for c in l7_cp:
             if c['_create_user'] == 'system':
                 pass
@@ -3474,16 +4320,18 @@ class VMCImportExport:
                     url = f'{self.proxy_url}/policy/api/v1{url_path}'
                     headers = {"Content-Type": "application/json", "Accept": "application/json", 'csp-auth-token': self.vmc_auth.access_token}
                     if self.sync_mode is True:
-                        response = requests.patch(url, headers=headers, json=json_data)
+                        response = self.http.patch(url, headers=headers, json=json_data)
                     else:
-                        response = requests.put(url, headers=headers, json=json_data)
+                        response = self.http.put(url, headers=headers, json=json_data)
                     if response.status_code != 200:
                         self.error_handling(response)
                         print(f'Error importing context profile {c["display_name"]}')
+                        success = False
                     else:
                         print(f'Context Profile {c["display_name"]} successfully imported')
                 else:
                     print(f'TEST Mode - L7 Context Profile {c["display_name"]} would have been imported')
+        return success
 
 
     def importVPN(self):
@@ -3552,7 +4400,7 @@ class VMCImportExport:
     #     self.activeRefreshToken = myRefreshToken
     #     params = {'api_token': myRefreshToken}
     #     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    #     response = requests.post(f'{self.strCSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
+    #     response = self.http.post(f'{self.strCSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
     #     jsonResponse = response.json()
     #     #print(jsonResponse)
     #     try:
@@ -3578,7 +4426,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         myHeader = {'csp-auth-token': self.vmc_auth.access_token}
         myURL = f'{self.strProdURL}/vmc/api/orgs/{org_id}/sddcs/{sddc_id}'
-        response = requests.get(myURL, headers=myHeader)
+        response = self.http.get(myURL, headers=myHeader)
         json_response = response.json()
         try:
             self.proxy_url = json_response['resource_config']['nsx_api_public_endpoint_url']
@@ -3594,7 +4442,7 @@ class VMCImportExport:
         self.vmc_auth.check_access_token_expiration()
         my_header = {'csp-auth-token': self.vmc_auth.access_token}
         my_url = f'{self.proxy_url}/policy/api/v1/infra'
-        response = requests.get(my_url, headers=my_header)
+        response = self.http.get(my_url, headers=my_header)
         if response.status_code == requests.codes.ok:
             return True
         else:
@@ -3614,6 +4462,31 @@ class VMCImportExport:
 
         return None
 
+    def loadConfigInt(self,config,section,key,default):
+        """Load an integer from the config file, returning default if it is missing or invalid"""
+        try:
+            return int(config.get(section,key))
+        except:
+            return default
+
+    def loadConfigFloat(self,config,section,key,default):
+        """Load a float from the config file, returning default if it is missing or invalid"""
+        try:
+            return float(config.get(section,key))
+        except:
+            return default
+
+    def loadConfigStatusBudgets(self,config,section,key,default):
+        """Load a comma-delimited list of status:retries pairs, e.g. 429:5,503:5, returning default if it is missing or invalid"""
+        try:
+            budgets = {}
+            for pair in config.get(section,key).split(','):
+                status, retries = pair.split(':')
+                budgets[int(status)] = int(retries)
+            return budgets
+        except:
+            return default
+
     def loadConfigRegex(self,config,section,key,delim):
         """Loads delimited regular expressions from a config file"""
         try:
@@ -3706,7 +4579,7 @@ class VMCImportExport:
         myHeader = {'csp-auth-token': self.vmc_auth.access_token}
         myURL = self.strProdURL + "/vmc/api/orgs/" + orgID
         try:
-            response = requests.get(myURL,headers=myHeader)
+            response = self.http.get(myURL,headers=myHeader)
             jsonResponse = response.json()
         except:
             jsonResponse = ""
@@ -3763,25 +4636,33 @@ class VMCImportExport:
                     if "key_material" in json_data["resource_config"]["agent"]["key_pair"]:
                         json_data["resource_config"]["agent"]["key_pair"].pop("key_material")
         try:
-            with open(fname, 'w') as outfile:
-                json.dump(json_data, outfile,indent=4)
+            with self.openExportFile(fname, 'w') as outfile:
+                json_stream.dump(json_data, outfile, self.exportIndent())
                 return True
         except:
             return False
 
+    def sddcURL(self, orgID, sddcID) -> str:
+        return self.strProdURL + "/vmc/api/orgs/" + orgID + "/sddcs/" + sddcID
+
     def loadSDDCData(self,orgID,sddcID):
-        """Download the JSON for an SDDC object"""
-        self.vmc_auth.check_access_token_expiration()
-        myHeader = {'csp-auth-token': self.vmc_auth.access_token}
-        myURL = self.strProdURL + "/vmc/api/orgs/" + orgID + "/sddcs/" + sddcID
-        try:
-            response = requests.get(myURL,headers=myHeader)
-            if response.status_code == 200:
-                jsonResponse = response.json()
-            else:
-                jsonResponse = ""
+        """Download the JSON for an SDDC object, once per run - returns "" on failure"""
+        myURL = self.sddcURL(orgID, sddcID)
+
+        def load():
+            self.vmc_auth.check_access_token_expiration()
+            myHeader = {'csp-auth-token': self.vmc_auth.access_token}
+            try:
+                response = self.http.get(myURL,headers=myHeader)
+                if response.status_code == 200:
+                    return response.json()
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
-        except:
+            except:
+                pass
+            return None
+
+        jsonResponse = self.discovery_cache.get(self.discoveryKey(myURL), load)
+        if jsonResponse is None:
             jsonResponse = ""
         return jsonResponse
 
@@ -0,0 +1,127 @@
+# Incremental (delta) exports for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import json_stream
+
+# Written into every delta zipfile, lists the files that only contain the objects changed since the previous export
+MANIFEST_NAME = 'delta_manifest.json'
+
+def load_index(path: str) -> dict:
+    """Returns the export index written by save_index, or None if there is none"""
+    if os.path.exists(path) is False:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_index(path: str, export_name: str, collections: dict) -> None:
+    """Saves the revisions of the exported objects, {filename: {path: _revision}}, for the next incremental export"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'export': export_name, 'collections': collections}, f)
+    # Replace the previous index in one step, an interrupted save leaves the old index intact
+    os.replace(temp_path, path)
+
+def revisions(objects: list) -> dict:
+    """Returns {path: _revision} for a list of NSX objects, or None if an object has no path or _revision"""
+    result = {}
+    for obj in objects:
+        if 'path' not in obj or '_revision' not in obj:
+            return None
+        result[obj['path']] = obj['_revision']
+    return result
+
+def logical_name(member: str) -> str:
+    """The export filename a zip member was written from, without the .gz of export_format compact+gzip"""
+    return member[:-3] if member.endswith('.gz') else member
+
+def read_member(archive: ZipFile, member: str):
+    with archive.open(member) as raw:
+        if member.endswith('.gz'):
+            with gzip.open(raw, 'rt') as f:
+                return json.load(f)
+        return json.load(io.TextIOWrapper(raw, encoding='utf-8'))
+
+def write_member(archive: ZipFile, member: str, value, indent: int = 4) -> None:
+    """Writes a zip member the way the export wrote it - with the export_format indent, gzipped if it ends in .gz"""
+    data = json_stream.dumps(value, indent).encode('utf-8')
+    if member.endswith('.gz'):
+        data = gzip.compress(data)
+    archive.writestr(member, data)
+
+def apply_delta(base: ZipFile, delta: ZipFile, out: ZipFile, indent: int = 4) -> None:
+    """Writes the export that results from applying one delta zipfile on top of the previous export
+
+    Merged files are written with indent, the exportIndent of the export_format.
+    """
+    manifest = json.loads(delta.read(MANIFEST_NAME))
+    base_members = {logical_name(m): m for m in base.namelist() if m != MANIFEST_NAME}
+    delta_members = {logical_name(m): m for m in delta.namelist() if m != MANIFEST_NAME}
+
+    for name, member in delta_members.items():
+        entry = manifest['files'].get(name)
+        if entry is None:
+            # Exported in full
+            with delta.open(member) as src, out.open(member, 'w') as dst:
+                shutil.copyfileobj(src, dst)
+            continue
+        changed = {obj['path']: obj for obj in read_member(delta, member)}
+        unchanged = {}
+        if name in base_members:
+            unchanged = {obj['path']: obj for obj in read_member(base, base_members[name])}
+        missing = [path for path in entry['paths'] if path not in changed and path not in unchanged]
+        if len(missing) > 0:
+            raise ValueError(f'{name}: {len(missing)} unchanged objects are not in the previous export, e.g. {missing[0]}')
+        # In the order the objects were listed in when the delta was exported
+        write_member(out, member, [changed[path] if path in changed else unchanged[path] for path in entry['paths']], indent)
+
+    for name, member in base_members.items():
+        if name not in delta_members:
+            with base.open(member) as src, out.open(member, 'w') as dst:
+                shutil.copyfileobj(src, dst)
+
+def apply_deltas(base_path: str, delta_paths: list, out_path: str, compresslevel: int = 6, indent: int = 4) -> None:
+    """Replays delta zipfiles, oldest first, on top of a full export zipfile and writes the result to out_path
+
+    Each delta must have been exported right after the zipfile before it in the chain, raises ValueError if not.
+    The temporary zipfiles between the links of the chain are removed, whether or not the chain applies.
+    """
+    previous = base_path
+    temp_paths = []
+    try:
+        for i, delta_path in enumerate(delta_paths):
+            if i == len(delta_paths) - 1:
+                target = out_path
+            else:
+                fd, target = tempfile.mkstemp(suffix='.zip', dir=os.path.dirname(out_path) or '.')
+                os.close(fd)
+                temp_paths.append(target)
+            with ZipFile(previous) as base, ZipFile(delta_path) as delta:
+                if MANIFEST_NAME in base.namelist():
+                    raise ValueError(f'{base_path} is a delta export, deltas are applied to a full export')
+                if MANIFEST_NAME not in delta.namelist():
+                    raise ValueError(f'{delta_path} is not a delta export')
+                expected = json.loads(delta.read(MANIFEST_NAME))['previous_export']
+                applied_to = os.path.basename(base_path if i == 0 else delta_paths[i - 1])
+                if expected != applied_to:
+                    raise ValueError(f'{delta_path} must be applied to {expected}, not {applied_to}')
+                with ZipFile(target, 'w', compression=ZIP_DEFLATED, compresslevel=compresslevel) as out:
+                    apply_delta(base, delta, out, indent)
+            if previous != base_path:
+                os.remove(previous)
+            previous = target
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,73 @@
+# Per-run memoization of discovery API calls for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import threading
+import time
+from concurrent.futures import Future
+
+class DiscoveryCache:
+    """Memoizes the results of discovery calls - Tier-1 lists, linked VPCs, SDDC details - for one run
+
+    Keys are (endpoint, URL, auth identity) tuples. A result is kept for ttl seconds, or for the whole run if ttl is
+    0. Loads are single-flight: when several threads ask for a key that is not cached, one of them calls the loader
+    and the others wait for its result. A loader returns None on failure, and None is never cached, so a failed
+    call is retried by the next caller. Results are shared by every caller and must not be modified.
+    """
+
+    def __init__(self, ttl: float = 0, enabled: bool = True):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.entries = {}
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple, load):
+        """Returns the cached result for key, calling load() if there is none"""
+        if self.enabled is False:
+            return load()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                if self.ttl <= 0 or time.monotonic() - loaded_at < self.ttl:
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+        if owner is False:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            if value is not None:
+                self.entries[key] = (value, time.monotonic())
+        future.set_result(value)
+        return value
+
+    def invalidate(self, url: str) -> None:
+        """Forgets the results for a URL, for every endpoint and identity - call after changing the object"""
+        with self.lock:
+            for key in [k for k in self.entries if k[1] == url]:
+                del self.entries[key]
+
+    def summary(self) -> str:
+        return f'Discovery cache: {self.hits} hits, {self.misses} calls'
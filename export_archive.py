@@ -0,0 +1,104 @@
+# Direct-to-zip export sink for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import io
+import shutil
+import tempfile
+import threading
+from zipfile import ZipFile, ZIP_DEFLATED
+
+class ArchiveMember(io.TextIOWrapper):
+    """A text file that is written into a zip archive member, returned by ExportArchive.open"""
+
+    def __init__(self, archive, name: str, raw, spooled: bool):
+        super().__init__(raw, encoding='utf-8')
+        self.archive = archive
+        self.name_in_archive = name
+        self.spooled = spooled
+        self.committed = False
+
+    def close(self) -> None:
+        if self.closed or self.committed:
+            return
+        self.committed = True
+        if self.spooled is False:
+            # Written straight into the member, which holds the archive lock until it is closed
+            try:
+                super().close()
+            finally:
+                self.archive.release()
+            return
+        self.flush()
+        self.buffer.seek(0)
+        self.archive.commit(self)
+
+    def discard(self) -> None:
+        super().close()
+
+class ExportArchive:
+    """Zip archive that export files are written into directly, compressed with ZIP_DEFLATED
+
+    A zip archive can only have one member open for writing. Export sections run in parallel, so the first
+    section to open a file writes straight into the archive, and files opened while another one is being written
+    are spooled to a temporary file - in memory up to spool_size bytes. A spooled file is copied into the archive
+    when it is closed, or as soon as the archive is free if another file is still being written at that time, so
+    closing a file never waits for another section.
+    """
+
+    def __init__(self, path, compresslevel: int = 6, spool_size: int = 16 * 1024 * 1024):
+        self.path = path
+        self.spool_size = spool_size
+        self.lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending = []
+        self.zipfile = ZipFile(path, 'w', compression=ZIP_DEFLATED, compresslevel=compresslevel)
+
+    def open(self, name: str) -> ArchiveMember:
+        """Opens the member name for writing as a text file"""
+        if self.lock.acquire(blocking=False):
+            try:
+                raw = self.zipfile.open(name, 'w')
+            except:
+                self.release()
+                raise
+            return ArchiveMember(self, name, raw, spooled=False)
+        return ArchiveMember(self, name, tempfile.SpooledTemporaryFile(max_size=self.spool_size, mode='w+b'), spooled=True)
+
+    def commit(self, member: ArchiveMember) -> None:
+        """Queues a closed spooled member and copies it into the archive if no other member is being written"""
+        with self.pending_lock:
+            self.pending.append(member)
+        if self.lock.acquire(blocking=False):
+            self.release()
+
+    def release(self) -> None:
+        """Copies the queued spooled members into the archive and releases the archive lock"""
+        while True:
+            self.write_pending()
+            self.lock.release()
+            # A member queued after write_pending but before the release could not take the lock, write it now
+            with self.pending_lock:
+                if len(self.pending) == 0:
+                    return
+            if self.lock.acquire(blocking=False) is False:
+                return
+
+    def write_pending(self) -> None:
+        while True:
+            with self.pending_lock:
+                if len(self.pending) == 0:
+                    return
+                member = self.pending.pop(0)
+            with self.zipfile.open(member.name_in_archive, 'w') as raw:
+                shutil.copyfileobj(member.buffer, raw)
+            member.discard()
+
+    def close(self) -> None:
+        self.lock.acquire()
+        self.write_pending()
+        self.zipfile.close()
+        self.lock.release()
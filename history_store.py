@@ -0,0 +1,164 @@
+# Deduplicated export history for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import datetime
+import hashlib
+import json
+import os
+import zlib
+from zipfile import ZipFile
+
+import delta_export
+import json_stream
+
+class HistoryStore:
+    """Stores export snapshots object by object, so objects that did not change between exports are stored once
+
+    Every object of an exported list - and every value of an exported dictionary - is stored as a blob named after
+    the SHA-256 of its JSON, in objects/ab/abcdef... A snapshot is a manifest in snapshots/ that lists the blobs of
+    each file in order, so a snapshot in which nothing changed costs one manifest.
+
+        {"name": ..., "created": ..., "files": {"cgw.json": {"list": [[path, hash], ...]},
+                                                 "dfw_details.json": {"object": [[key, hash], ...]},
+                                                 "sddc_info.json": {"value": hash}}}
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_folder = os.path.join(root, 'objects')
+        self.snapshots_folder = os.path.join(root, 'snapshots')
+        os.makedirs(self.objects_folder, exist_ok=True)
+        os.makedirs(self.snapshots_folder, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_folder, digest[:2], digest)
+
+    def put(self, value) -> str:
+        """Stores a JSON value unless it is stored already, and returns its hash"""
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path) is False:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest: str):
+        with open(self.blob_path(digest), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def entry(self, value) -> dict:
+        """Stores the content of an export file and returns its manifest entry"""
+        if isinstance(value, list):
+            return {'list': [[obj.get('path') if isinstance(obj, dict) else None, self.put(obj)] for obj in value]}
+        if isinstance(value, dict):
+            return {'object': [[key, self.put(item)] for key, item in value.items()]}
+        return {'value': self.put(value)}
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_folder, name + '.json')
+
+    def load_manifest(self, name: str) -> dict:
+        """Returns the manifest of a snapshot, or None if there is no such snapshot"""
+        if os.path.exists(self.manifest_path(name)) is False:
+            return None
+        with open(self.manifest_path(name)) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: dict) -> None:
+        path = self.manifest_path(manifest['name'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        # Written after its blobs, a snapshot never refers to a blob that is not stored yet
+        os.replace(path + '.tmp', path)
+
+    def snapshots(self) -> list:
+        """Returns the names of the stored snapshots, oldest first
+
+        Ordered by the time stored in each manifest, then by name, so copying or touching the history folder does
+        not change which snapshot is the latest.
+        """
+        names = [f[:-len('.json')] for f in os.listdir(self.snapshots_folder) if f.endswith('.json')]
+        return sorted(names, key=lambda name: (datetime.datetime.fromisoformat(self.load_manifest(name)['created']), name))
+
+    def add_zip(self, zip_path: str) -> dict:
+        """Stores an export zipfile as a snapshot named after the zipfile and returns its manifest
+
+        A delta zipfile written by an incremental export is stored as the full snapshot it represents, it is merged
+        with the snapshot of the export it follows - which must have been stored before.
+        """
+        name = os.path.basename(zip_path)
+        files = {}
+        with ZipFile(zip_path) as archive:
+            members = [m for m in archive.namelist() if m != delta_export.MANIFEST_NAME]
+            delta = None
+            if delta_export.MANIFEST_NAME in archive.namelist():
+                delta = json.loads(archive.read(delta_export.MANIFEST_NAME))
+                previous = self.load_manifest(delta['previous_export'])
+                if previous is None:
+                    raise ValueError(f'{name} is a delta of {delta["previous_export"]}, which is not in the history store')
+                files.update(previous['files'])
+            for member in members:
+                filename = delta_export.logical_name(member)
+                entry = self.entry(delta_export.read_member(archive, member))
+                if delta is not None and filename in delta['files']:
+                    changed = {path: digest for path, digest in entry['list']}
+                    unchanged = {path: digest for path, digest in files.get(filename, {}).get('list', [])}
+                    entry = {'list': [[path, changed[path] if path in changed else unchanged[path]] for path in delta['files'][filename]['paths']]}
+                files[filename] = entry
+        manifest = {'name': name, 'created': datetime.datetime.now().isoformat(), 'files': files}
+        self.save_manifest(manifest)
+        return manifest
+
+    def restore(self, name: str, folder: str, indent: int = 4) -> list:
+        """Writes the files of a snapshot to folder and returns their names"""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            raise ValueError(f'No snapshot named {name}')
+        for filename, entry in manifest['files'].items():
+            with open(os.path.join(folder, filename), 'w') as outfile:
+                if 'list' in entry:
+                    with json_stream.JSONArrayWriter(outfile, indent) as writer:
+                        writer.extend(self.get(digest) for _, digest in entry['list'])
+                elif 'object' in entry:
+                    with json_stream.JSONObjectWriter(outfile, indent) as writer:
+                        writer.update((key, self.get(digest)) for key, digest in entry['object'])
+                else:
+                    json_stream.dump(self.get(entry['value']), outfile, indent)
+        return list(manifest['files'])
+
+    def prune(self, max_snapshots: int):
+        """Deletes the oldest snapshots beyond max_snapshots and the blobs no snapshot refers to any more
+
+        Returns (snapshots deleted, blobs deleted).
+        """
+        names = self.snapshots()
+        expired = names[:max(len(names) - max_snapshots, 0)]
+        for name in expired:
+            os.remove(self.manifest_path(name))
+        if len(expired) == 0:
+            return 0, 0
+
+        referenced = set()
+        for name in names[len(expired):]:
+            for entry in self.load_manifest(name)['files'].values():
+                if 'list' in entry:
+                    referenced.update(digest for _, digest in entry['list'])
+                elif 'object' in entry:
+                    referenced.update(digest for _, digest in entry['object'])
+                else:
+                    referenced.add(entry['value'])
+        removed = 0
+        for prefix in os.listdir(self.objects_folder):
+            for digest in os.listdir(os.path.join(self.objects_folder, prefix)):
+                if digest not in referenced:
+                    os.remove(os.path.join(self.objects_folder, prefix, digest))
+                    removed += 1
+        return len(expired), removed
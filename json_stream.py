@@ -0,0 +1,197 @@
+# Streaming JSON reading and writing for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import json
+
+def dumps(value, indent: int = 4) -> str:
+    """json.dumps with indent, or without any whitespace when indent is None"""
+    if indent is None:
+        return json.dumps(value, separators=(',', ':'))
+    return json.dumps(value, indent=indent)
+
+def dump(value, outfile, indent: int = 4) -> None:
+    """json.dump with indent, or without any whitespace when indent is None"""
+    if indent is None:
+        json.dump(value, outfile, separators=(',', ':'))
+    else:
+        json.dump(value, outfile, indent=indent)
+
+class JSONArrayWriter:
+    """Writes a JSON array one element at a time
+
+    The output is byte for byte what dump(elements, outfile, indent) writes for the whole list, so files written
+    this way import exactly like before, but only the element being written is held in memory.
+    The closing bracket is only written if the with block completes, an export that fails part way leaves a
+    file that does not parse instead of a silently truncated one.
+    """
+
+    opening = '['
+    closing = ']'
+
+    def __init__(self, outfile, indent: int = 4):
+        self.outfile = outfile
+        self.indent = indent
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        return False
+
+    def write_raw(self, text: str) -> None:
+        if self.indent is None:
+            self.outfile.write((self.opening if self.count == 0 else ',') + text)
+            self.count += 1
+            return
+        # Nested lines are indented one level deeper than in a standalone dump. Newlines inside strings are
+        # always escaped by json.dumps, so every newline in text is a line break.
+        text = text.replace('\n', '\n' + ' ' * self.indent)
+        if self.count == 0:
+            self.outfile.write(self.opening + '\n' + ' ' * self.indent + text)
+        else:
+            self.outfile.write(',\n' + ' ' * self.indent + text)
+        self.count += 1
+
+    def write(self, element) -> None:
+        self.write_raw(dumps(element, self.indent))
+
+    def extend(self, elements) -> None:
+        for element in elements:
+            self.write(element)
+
+    def close(self) -> None:
+        if self.count == 0:
+            self.outfile.write(self.opening + self.closing)
+        elif self.indent is None:
+            self.outfile.write(self.closing)
+        else:
+            self.outfile.write('\n' + self.closing)
+
+class JSONObjectWriter(JSONArrayWriter):
+    """Writes a JSON object one key at a time, matching dump(dictionary, outfile, indent)"""
+
+    opening = '{'
+    closing = '}'
+
+    def write(self, key: str, value) -> None:
+        self.write_raw(json.dumps(key) + (':' if self.indent is None else ': ') + dumps(value, self.indent))
+
+    def update(self, items) -> None:
+        for key, value in items:
+            self.write(key, value)
+
+class JSONStreamReader:
+    """Reads the top level array or object of a JSON file one element at a time
+
+    Each element is parsed with json.JSONDecoder.raw_decode as soon as it has been read from the file, so only one
+    element - for dfw_details.json the rules of one security policy - is held in memory at a time.
+    """
+
+    def __init__(self, infile, chunk_size: int = 65536):
+        self.infile = infile
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size: int) -> bool:
+        if self.eof:
+            return False
+        # Drop what has been parsed already so the buffer does not grow with the file
+        if self.pos > 0:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        data = self.infile.read(size)
+        if len(data) == 0:
+            self.eof = True
+            return False
+        self.buffer += data
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, or '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.read_more(self.chunk_size) is False:
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c == '' or c not in chars:
+            raise json.JSONDecodeError(f'Expecting one of {chars!r}', self.buffer, self.pos)
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off at the end of the buffer may continue in the next chunk, e.g. '-4.' of '-4.5'
+                if (end < len(self.buffer) and self.buffer[end] in ' \t\n\r,]}:') or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read larger chunks while the element is incomplete, so a large element is not parsed over and over
+            self.read_more(size)
+            size *= 2
+
+    def elements(self):
+        """Yields the elements of a top level array"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def items(self):
+        """Yields the (key, value) pairs of a top level object"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self.value()
+            if self.expect(',}') == '}':
+                return
+
+def load(filehandle, streaming: bool = False):
+    """Returns the array in an open JSON file, or an iterator over its elements when streaming
+
+    The caller opens the file, so a missing file is reported by the caller as before. The file is closed once it
+    has been read - when streaming, once the iterator has been consumed.
+    """
+    if streaming is False:
+        with filehandle:
+            return json.load(filehandle)
+    return _read_and_close(filehandle, lambda reader: reader.elements())
+
+def load_items(filehandle, streaming: bool = False):
+    """Returns the (key, value) pairs of the object in an open JSON file, streamed when streaming is True"""
+    if streaming is False:
+        with filehandle:
+            return json.load(filehandle).items()
+    return _read_and_close(filehandle, lambda reader: reader.items())
+
+def _read_and_close(filehandle, read):
+    with filehandle:
+        yield from read(JSONStreamReader(filehandle))
@@ -0,0 +1,191 @@
+# Streaming S3 upload and ranged reads for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import io
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# S3 rejects multipart uploads with parts smaller than 5 MiB, other than the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+def parse_s3_url(url: str):
+    """Splits s3://bucket/key into (bucket, key)"""
+    parts = urlsplit(url)
+    if parts.scheme != 's3' or parts.netloc == '' or parts.path.strip('/') == '':
+        raise ValueError(f'Expected s3://bucket/key, got {url}')
+    return parts.netloc, parts.path.lstrip('/')
+
+class S3MultipartWriter(io.RawIOBase):
+    """Write-only file that streams everything written to it into an S3 object with a multipart upload
+
+    Written bytes are buffered until part_size bytes are available, and each full part is uploaded on a pool of
+    `workers` threads while writing continues. No more than `workers` parts are in flight, so memory use is bounded
+    by (workers + 1) * part_size however large the object is. The object only appears in the bucket once close()
+    completes the upload - if writing or closing fails the upload is aborted. An object smaller than one part is
+    uploaded with a single PUT. The file is not seekable, ZipFile writes to it with data descriptors.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = 8 * 1024 * 1024, workers: int = 4):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.workers = max(workers, 1)
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.part_number = 0
+        self.in_flight = deque()
+        self.parts = []
+        self.executor = None
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('write to closed file')
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self.upload(part)
+        return len(data)
+
+    def upload(self, data: bytes) -> None:
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.upload_id = response['UploadId']
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.part_number += 1
+        self.in_flight.append(self.executor.submit(self.upload_part, self.part_number, data))
+        # Wait for the oldest part before buffering more, a failed part is raised here
+        while len(self.in_flight) >= self.workers:
+            self.parts.append(self.in_flight.popleft().result())
+
+    def upload_part(self, part_number: int, data: bytes) -> dict:
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=part_number, Body=data)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def close(self) -> None:
+        """Uploads the remaining bytes and completes the upload"""
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            else:
+                if len(self.buffer) > 0:
+                    self.upload(bytes(self.buffer))
+                while self.in_flight:
+                    self.parts.append(self.in_flight.popleft().result())
+                self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                      MultipartUpload={'Parts': self.parts})
+        except:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            if self.executor is not None:
+                self.executor.shutdown()
+            super().close()
+
+    def abort(self) -> None:
+        """Abandons the upload, nothing is written to the bucket"""
+        if self.upload_id is None:
+            return
+        upload_id = self.upload_id
+        self.upload_id = None
+        for future in self.in_flight:
+            future.cancel()
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+        except Exception as e:
+            print('Unable to abort S3 multipart upload', upload_id, ':', str(e))
+        super().close()
+
+    def __del__(self):
+        # IOBase.__del__ would close, and so complete, an upload that was abandoned part way
+        if not self.closed:
+            self.abort()
+
+class S3RangeReader(io.RawIOBase):
+    """Read-only, seekable file over an S3 object that fetches only the byte ranges that are read
+
+    The object is read in blocks of block_size bytes with ranged GETs, and the last cache_blocks blocks are kept,
+    so ZipFile can read the central directory and the members it needs without downloading the whole archive.
+    """
+
+    def __init__(self, client, bucket: str, key: str, block_size: int = 1024 * 1024, cache_blocks: int = 16):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.cache = OrderedDict()
+        self.position = 0
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.size = client.head_object(Bucket=bucket, Key=key)['ContentLength']
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence {whence}')
+        if position < 0:
+            raise OSError(f'Negative seek position {position}')
+        self.position = position
+        return position
+
+    def block(self, index: int) -> bytes:
+        data = self.cache.get(index)
+        if data is not None:
+            self.cache.move_to_end(index)
+            return data
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f'bytes={start}-{end}')
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        self.cache[index] = data
+        if len(self.cache) > self.cache_blocks:
+            self.cache.popitem(last=False)
+        return data
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        count = 0
+        while count < len(view) and self.position < self.size:
+            index, offset = divmod(self.position, self.block_size)
+            data = self.block(index)[offset:offset + len(view) - count]
+            view[count:count + len(data)] = data
+            count += len(data)
+            self.position += len(data)
+        return count
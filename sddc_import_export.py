@@ -36,7 +36,7 @@ pip3 install -r requirements.txt
 With git BASH on Windows, you might need to use 'python -m pip install' instead of pip3 install
 
 """
-import boto3
+from boto3.s3.transfer import TransferConfig
 import sys
 MIN_PYTHON = (3,10)
 assert sys.version_info >= MIN_PYTHON, f"Python {'.'.join([str(n) for n in MIN_PYTHON])} or newer is required."
@@ -52,6 +52,7 @@ import json
 import os
 #import vcenter
 from VMCImportExport import VMCImportExport
+from section_scheduler import Section, SectionScheduler
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -80,16 +81,20 @@ def main(args):
                                     "Import an SDDC:\n"
                                     "python sddc_import_export.py -o import\n\n"
                                     "Import an SDDC from a zipfile:\n"
-                                    "python sddc_import_export.py -o import -i json/2020-12-15_10-33-43_json-export.zip\n\n")
-    ap.add_argument("-o","--operation", required=True, choices=['import-nsx','export-nsx','import','export','export-import','check-vmc-ini','export-vcenter','import-vcenter','rolesync','testbed'], help="SDDC-to-SDDC operations: import, export, or export and then immediately import. check-vmc-ini displays the currently configured Org and SDDC for import and export operations. export-nsx to export an on-prem NSX config, then import-nsx to import it to VMC. export-vcenter and import-vcenter to export and import vCenter configs. testbed to create and destroy large numbers of objects to test API limits")
+                                    "python sddc_import_export.py -o import -i json/2020-12-15_10-33-43_json-export.zip\n\n"
+                                    "Import an SDDC from a zipfile in an S3 bucket:\n"
+                                    "python sddc_import_export.py -o import -i s3://mybucket/2020-12-15_10-33-43_json-export.zip\n\n")
+    ap.add_argument("-o","--operation", required=True, choices=['import-nsx','export-nsx','import','export','export-import','apply-delta','check-vmc-ini','export-vcenter','import-vcenter','rolesync','testbed'], help="SDDC-to-SDDC operations: import, export, or export and then immediately import. apply-delta to replay incremental exports on top of the full export given with -i. check-vmc-ini displays the currently configured Org and SDDC for import and export operations. export-nsx to export an on-prem NSX config, then import-nsx to import it to VMC. export-vcenter and import-vcenter to export and import vCenter configs. testbed to create and destroy large numbers of objects to test API limits")
     ap.add_argument("-t", "--test-name", required=False, nargs='+', choices=['create-cgw-groups','delete-cgw-groups','delete-all-cgw-groups'])
     ap.add_argument("-n", "--num-objects", required=False, type=int, default=1000)
     ap.add_argument("-sn", "--start-num", required=False, type=int, default=0)
     ap.add_argument("-et","--export-type", required=False, choices=['os','s3'],help="os for a regular export, s3 for export to S3 bucket")
     ap.add_argument("-ef","--export-folder",required=False,help="Export folder location")
     import_group = ap.add_mutually_exclusive_group()
-    import_group.add_argument("-i","--import-file-path", required=False,help="A full path to a previously exported zip")
+    import_group.add_argument("-i","--import-file-path", required=False,help="A full path to a previously exported zip, or an s3://bucket/key URL")
     import_group.add_argument("-iff","--import-first-file", required=False,help="Imports the first zipfile found in the specified path")
+    import_group.add_argument("-rs","--restore-snapshot", required=False,help="Imports a snapshot from the history store, by zipfile name or latest")
+    ap.add_argument("-dz","--delta-zips", required=False, nargs='+', help="Delta zipfiles to apply, oldest first, with -o apply-delta")
     ap.add_argument("-st", "--source-refresh-token", required=False, help="An API refresh token for the source SDDC")
     ap.add_argument("-dt", "--dest-refresh-token", required=False, help="An API refresh token for the destination SDDC")
     ap.add_argument("-so","--source-org-id", required=False,help="The source organization ID")
@@ -99,8 +104,12 @@ def main(args):
     ap.add_argument("-s3aid","--aws-s3-export-access-id", required=False,help="AWS Access ID for export to S3")
     ap.add_argument("-s3ase","--aws-s3-export-access-secret", required=False,help="AWS Secret for export to S3")
     ap.add_argument("-s3b","--aws-s3-export-bucket", required=False,help="AWS bucket name for export to S3")
+    ap.add_argument("-s3e","--aws-s3-endpoint-url", required=False,help="S3 endpoint URL, for S3 compatible storage")
     ap.add_argument("-rss","--role-sync-source-user-email", required=False, help="The source email address used as a template for syncing roles")
     ap.add_argument("-rsd","--role-sync-dest-user-emails", required=False, help="The dest email addresses used as a target for syncing roles, formatted as a set")
+    ap.add_argument("-ew","--export-workers", required=False, type=int, help="Number of export sections to run in parallel, overrides export_workers in config.ini")
+    ap.add_argument("-io","--io-engine", required=False, choices=['threads','async'], help="Engine used for fan-out API calls, overrides io_engine in config.ini. async requires aiohttp")
+    ap.add_argument("-iw","--import-workers", required=False, type=int, help="Number of import stages to run in parallel, overrides import_workers in config.ini")
 
     args = ap.parse_args(args)
 
@@ -167,10 +176,26 @@ def main(args):
         ioObj.aws_s3_export_bucket = args.aws_s3_export_bucket
         print('Loaded AWS S3 export bucket from command line')
 
+    if args.aws_s3_endpoint_url:
+        ioObj.aws_s3_endpoint_url = args.aws_s3_endpoint_url
+        print('Loaded AWS S3 endpoint URL from command line')
+
     if args.role_sync_source_user_email:
         ioObj.RoleSyncSourceUserEmail = args.role_sync_source_user_email
         print('Loaded role sync source user email from command line')
 
+    if args.export_workers:
+        ioObj.export_workers = args.export_workers
+        print('Loaded export workers from command line')
+
+    if args.io_engine:
+        ioObj.io_engine = args.io_engine
+        print('Loaded I/O engine from command line')
+
+    if args.import_workers:
+        ioObj.import_workers = args.import_workers
+        print('Loaded import workers from command line')
+
     if args.role_sync_dest_user_emails:
         ioObj.RoleSyncDestUserEmails = args.role_sync_dest_user_emails.split(',')
         print('Loaded role sync dest user emails from command line')
@@ -393,6 +418,16 @@ def main(args):
 
         print("Import has been concluded. Thank you for using SDDC Import/Export for VMware Cloud on AWS.")
 
+    if intent_name == "apply-delta":
+        no_intent_found = False
+        if import_file_path == "" or not args.delta_zips:
+            print('apply-delta requires the full export zipfile with -i and the delta zipfiles with --delta-zips')
+            sys.exit(1)
+        retval = ioObj.applyExportDeltas(import_file_path, args.delta_zips)
+        if retval is False:
+            sys.exit(1)
+        print('Applied', len(args.delta_zips), 'delta zipfiles to', import_file_path, 'and saved the full export as', ioObj.export_zip_name)
+
     if intent_name == "check-vmc-ini":
         no_intent_found = False
 
@@ -482,8 +517,15 @@ def main(args):
         print(f'Exporting data from org {ioObj.source_org_display_name} ({ioObj.source_org_id}), SDDC {ioObj.source_sddc_name} ({ioObj.source_sddc_id}), SDDC version {ioObj.source_sddc_version}')
         #print(getSDDCS(ioObj.strProdURL,ioObj.source_org_id, ioObj.access_token))
 
-        # Delete old JSON files
-        if ioObj.export_type == 'os' and ioObj.export_purge_before_run is True:
+        if ioObj.incremental_export is True:
+            if ioObj.export_history is True:
+                ioObj.beginIncrementalExport()
+            else:
+                print('incremental_export requires export_history, running a full export')
+                ioObj.incremental_export = False
+
+        # Delete old JSON files. A delta export must not zip files left over from a previous run.
+        if (ioObj.export_type == 'os' and ioObj.export_purge_before_run is True) or ioObj.incremental_export is True:
             print('Deleting old JSON export files...')
             retval = ioObj.purgeJSONfiles()
             if retval is False:
@@ -491,163 +533,78 @@ def main(args):
                 if stop_script is True:
                     sys.exit()
 
-        # Run all selected export functions
-
-        retval = ioObj.exportSourceSDDCData()
-        if retval is True:
-            print("Source SDDC Info exported.")
-        else:
-            print("Could not export Source SDDC Info")
+        # Run all selected export functions. Sections are independent of each other - each one reads from the
+        # source SDDC and writes its own JSON file - so they can run in parallel when export_workers > 1
+        export_sections = [Section("Source SDDC Info", ioObj.exportSourceSDDCData)]
 
         if (ioObj.cgw_export is True) or (ioObj.mgw_export is True) or (ioObj.dfw_export is True):
-            print("Beginning Services export...")
-            retval = ioObj.exportSDDCServices()
-            if retval is True:
-                print("SDDC services exported.")
-            else:
-                print("SDDC services export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("Services", ioObj.exportSDDCServices))
 
         if ioObj.mgw_export is True:
-            print("Beginning MGW export...")
-            retval = ioObj.exportSDDCMGWGroups()
-            if retval is True:
-                print("MGW groups exported.")
-            else:
-                print("MGW groups export error: {}".format(ioObj.lastJSONResponse))
-
-            retval = ioObj.exportSDDCMGWRule()
-            if retval is True:
-                print("MGW rules exported.")
-            else:
-                print("MGW export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("MGW groups", ioObj.exportSDDCMGWGroups))
+            export_sections.append(Section("MGW rules", ioObj.exportSDDCMGWRule))
         else:
             print("MGW export skipped.")
 
         if ioObj.cgw_export is True:
-            print("Beginning CGW export...")
-            retval = ioObj.exportSDDCCGWGroups()
-            if retval is True:
-                print("CGW groups exported.")
-            else:
-                print("CGW groups export error: {}".format(ioObj.lastJSONResponse))
-
-            retval = ioObj.exportSDDCCGWRule()
-            if retval is True:
-                print("CGW rules exported.")
-            else:
-                print("CGW export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("CGW groups", ioObj.exportSDDCCGWGroups))
+            export_sections.append(Section("CGW rules", ioObj.exportSDDCCGWRule))
         else:
             print("CGW export skipped.")
-        
+
         if ioObj.mcgw_export is True:
-            print("Beginning Multi-T1 CGW export...")
-            retval = ioObj.export_mcgw_config()
-            if retval is True:
-                print("Multi-T1 CGW Config exported")
-            else:
-                print(f'Multi-T1 CGW export error: {ioObj.lastJSONResponse}')
+            export_sections.append(Section("Multi-T1 CGW config", ioObj.export_mcgw_config))
         else:
             print("Multi-T1 CGW export skipped")
 
         if ioObj.mcgw_static_routes_export is True:
-            print("Beginning Multi-T1 Static Routes Export")
-            retval = ioObj.export_mcgw_static_routes()
-            if retval is True:
-                print("Multi-T1 Static Routes exported")
-            else:
-                print(f"Multi-T1 static routes export error: {ioObj.lastJSONResponse}")
+            export_sections.append(Section("Multi-T1 static routes", ioObj.export_mcgw_static_routes))
         else:
             print("Multi-T1 static routes export skipped")
 
         if ioObj.mcgw_fw_export is True:
-            print("Beginning Multi-T1 North/South Firewall Policy and Rule Export")
-            retval = ioObj.export_mcgw_fw()
-
-            if retval is True:
-                print("Multi-T1 FW Policy and Rules exported")
-            else:
-                print(f"Multi-T1 FW Policy and Rules export error: {ioObj.lastJSONResponse}")
+            export_sections.append(Section("Multi-T1 FW policy and rules", ioObj.export_mcgw_fw))
         else:
             print("Multi-T1 Firewall Policy and Rules export skipped")
 
         if ioObj.mpl_export is True:
-            print("Beginning Connected VPC Managed Prefix List export")
-            retval = ioObj.export_mpl()
-            if retval is True:
-                print("Connected VPC Managed Prefix List settings exported")
-            else:
-                print(f'Connected VPC Managed Prefix List export error: {ioObj.lastJSONResponse}')
+            export_sections.append(Section("Connected VPC Managed Prefix List", ioObj.export_mpl))
         else:
             print("Connected VPC Managed Prefix List export skipped")
 
         if ioObj.ral_export is True:
-            print('Beginning Route Aggegration list export')
-            retval = ioObj.export_ral()
-            if retval is True:
-                print("SDDC Route Aggregation list exported")
-            else:
-                print(f"SDDC Route Aggregation list export error: {ioObj.lastJSONResponse}")
+            export_sections.append(Section("SDDC Route Aggregation list", ioObj.export_ral))
         else:
             print("SDDC Route Aggregation list export skipped")
 
         if ioObj.route_config_export is True:
-            print('Beginning SDDC route configuration export')
-            retval = ioObj.export_route_config()
-            if retval is True:
-                print("SDDC Route Configuration exported")
-            else:
-                print(f"SDDC Route Configuration export error: {ioObj.lastJSONResponse}")
+            export_sections.append(Section("SDDC Route Configuration", ioObj.export_route_config))
         else:
             print("SDDC Route Configuration export skipped")
 
         if ioObj.network_export is True:
-            print("Beginning network segments export...")
-            retval = ioObj.exportSDDCCGWnetworks()
-            if retval is True:
-                print("CGW networks exported.")
-            else:
-                print("CGW export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("CGW networks", ioObj.exportSDDCCGWnetworks))
         else:
             print("CGW network segment export skipped.")
-        
+
         if ioObj.flex_segment_export is True:
-            print("Beginning flexible segment export...")
-            retval = ioObj.export_flexible_segments()
-            retval2 = ioObj.export_flexible_segment_disc_bindings()
-            if retval is True and retval2 is True:
-                print("Flexible segment and segment discovery bindings exported.")
-            else:
-                print(f"Flexible segment export error: {ioObj.lastJSONResponse}")
+            export_sections.append(Section("Flexible segments", ioObj.export_flexible_segments))
+            export_sections.append(Section("Flexible segment discovery bindings", ioObj.export_flexible_segment_disc_bindings))
         else:
             print("Flexible segment and segment discovery profile bindings export skipped.")
 
         if ioObj.dfw_export is True:
-            print("Beginning DFW export...")
-            retval = ioObj.exportSDDCDFWRule()
-            if retval is True:
-                print("DFW rules exported.")
-            else:
-                print("DFW rules error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("DFW rules", ioObj.exportSDDCDFWRule))
         else:
             print("DFW rules export skipped.")
 
         if ioObj.public_export is True:
-            print("Beginning Public IP export...")
-            retval = ioObj.exportSDDCListPublicIP()
-            if retval is True:
-                print("Public IP exported.")
-            else:
-                print("Public IP export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("Public IP", ioObj.exportSDDCListPublicIP))
         else:
             print("Public IP export skipped.")
 
         if ioObj.nat_export is True:
-            print("Beginning NAT export...")
-            retval = ioObj.exportSDDCNat()
-            if retval is True:
-                print("NAT rules exported.")
-            else:
-                print("NAT rules export error: {}".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("NAT rules", ioObj.exportSDDCNat))
         else:
             print("NAT rules export skipped.")
 
@@ -655,89 +612,101 @@ def main(args):
             if (ioObj.cgw_export is False or ioObj.network_export is False):
                 print("NSX Advanced Firewall export is enabled, but CGW export is not.")
                 print("Please enable export of Compute Gateway settings to capture all CGW Groups AND Segments, else import of NSX AF settings and rules may fail.")
-            print("Beginning NSX Advanced Firewall export...")
-            retval = ioObj.export_advanced_firewall()
-            if retval is True:
-                print("NSX Advanced Firewall exported.")
-            else:
-                print("NSX Advanced Firewall export error: {}.".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("NSX Advanced Firewall", ioObj.export_advanced_firewall))
         else:
             print("NSX Advanced Firewall export skipped.")
 
-
         if ioObj.service_access_export is True:
-            print("Beginning Service Access export...")
-            retval = ioObj.exportServiceAccess()
-            if retval is True:
-                print("Service access exported.")
-            else:
-                print("Service access export error: {}.".format(ioObj.lastJSONResponse))
+            export_sections.append(Section("Service access", ioObj.exportServiceAccess))
         else:
             print("Service access export skipped.")
 
         if ioObj.vpn_export is True:
-            print("Beginning VPN export...")
-            retval = ioObj.exportVPN()
-            if retval is True:
-                print("VPN exported.")
-            else:
-                print("VPN export error.")
+            export_sections.append(Section("VPN", ioObj.exportVPN))
         else:
             print("VPN export skipped.")
 
         if ioObj.tier1_vpn_export is True:
-            print("Beginning export of Tier-1 VPNs")
-            retval = ioObj.export_tier1_vpn()
-            if retval is True:
-                print("Tier-1 VPNs exported")
-            else:
-                print("Tier-1 VPN export error")
+            export_sections.append(Section("Tier-1 VPN", ioObj.export_tier1_vpn))
         else:
             print("Tier-1 VPN export skipped.")
-        
+
         if ioObj.nsx_l7_fqdn_export is True:
-            print('Beginning NSX Layer 7 FQDN profile export')
-            retval = ioObj.export_fqdn_attribute()
-            if retval is True:
-                print('FQDN profiles exported')
-            else:
-                print('FQDN profile export failed')
+            export_sections.append(Section("FQDN profiles", ioObj.export_fqdn_attribute))
         else:
             print('FQDN profile export skipped')
-        
+
         if ioObj.nsx_l7_context_profile_export is True:
-            print('Beginning NSX Layer 7 context profile export')
-            retval - ioObj.export_l7_cp()
-            if retval is True:
-                print('NSX L7 Context Profile export successful')
-            else:
-                print('NSX L7 Context Profile export error')
+            export_sections.append(Section("NSX L7 Context Profiles", ioObj.export_l7_cp))
         else:
             print('NSX L7 Context Profile export skipped')
 
+        if ioObj.bulk_export_mode == 'hierarchical':
+            # A few hierarchical GETs of /infra write these files instead of one crawl per collection
+            snapshot_sections = ["Services", "MGW groups", "CGW groups", "Multi-T1 CGW config", "Multi-T1 FW policy and rules",
+                                 "CGW networks", "Flexible segments", "Flexible segment discovery bindings", "DFW rules"]
+            if any(s.name in snapshot_sections for s in export_sections):
+                export_sections = [s for s in export_sections if s.name not in snapshot_sections]
+                export_sections.append(Section("Hierarchical snapshot", ioObj.exportHierarchicalSnapshot))
+
+        # Write the export files straight into the zipfile instead of zipping them from export_folder afterwards
+        archive_export = ioObj.export_history is True and ioObj.export_direct_to_archive is True
+        # With export_type s3 the zipfile is streamed to the bucket while it is written
+        s3_stream_export = archive_export is True and ioObj.export_type == 's3'
+        if s3_stream_export is True:
+            print('Streaming zipfile to s3 bucket',ioObj.aws_s3_export_bucket)
+        if archive_export is True:
+            retval = ioObj.openExportArchive()
+            if retval is False:
+                sys.exit(1)
+
+        scheduler = SectionScheduler(workers=ioObj.export_workers, verb='export', error_source=lambda: ioObj.lastJSONResponse)
+        export_results = scheduler.run(export_sections)
+        print('Export summary:')
+        print(scheduler.summary_table(export_results))
+        print(ioObj.http.retry_summary())
+        print(ioObj.http.rate_summary())
+        print(ioObj.discovery_cache.summary())
+
         if ioObj.export_history is True:
-            retval = ioObj.zipJSONfiles()
+            if ioObj.incremental_export is True:
+                ioObj.finishIncrementalExport()
+            if archive_export is True:
+                retval = ioObj.closeExportArchive()
+            else:
+                retval = ioObj.zipJSONfiles()
             if retval is False:
                 print('JSON files were not successfully zipped.')
             else:
                 print('JSON files successfully zipped into', ioObj.export_zip_name)
-                if ioObj.export_type == 's3':
-                    print('Uploading to s3 bucket',ioObj.aws_s3_export_bucket)
-                    if len(ioObj.aws_s3_export_access_id) == 0:
-                        #Blank access ID - running in Lambda mode, do not pass the key and secret, the Lambda role will grant access to the bucket
-                        s3 = boto3.client('s3')
+                if ioObj.incremental_export is True:
+                    # The next delta is relative to the last export that completed without errors
+                    if all(result.success for result in export_results):
+                        ioObj.saveExportIndex()
+                    else:
+                        print('Some sections failed, the export index was not updated')
+                if ioObj.history_store is True:
+                    if s3_stream_export is True:
+                        print('The zipfile was streamed to S3, it was not added to the history store')
                     else:
-                        s3 = boto3.client('s3',aws_access_key_id=ioObj.aws_s3_export_access_id,aws_secret_access_key=ioObj.aws_s3_export_access_secret)
+                        ioObj.storeExportSnapshot()
+                if s3_stream_export is True:
+                    print('S3 upload successful')
+                elif ioObj.export_type == 's3':
+                    print('Uploading to s3 bucket',ioObj.aws_s3_export_bucket)
+                    s3 = ioObj.s3Client()
+                    transfer_config = TransferConfig(multipart_threshold=ioObj.s3_multipart_part_size, multipart_chunksize=ioObj.s3_multipart_part_size,
+                                                     max_concurrency=ioObj.s3_multipart_workers)
                     try:
                         fname = ioObj.export_folder + '/' + ioObj.export_zip_name
                         with open(fname, "rb") as f:
-                            response = s3.upload_fileobj(f,ioObj.aws_s3_export_bucket,ioObj.export_zip_name)
+                            response = s3.upload_fileobj(f,ioObj.aws_s3_export_bucket,ioObj.export_zip_name,Config=transfer_config)
                         print('S3 upload successful')
                     except Exception as e:
                         print('Failed to upload file.')
                         print(e)
 
-                if ioObj.export_purge_after_zip == True:
+                if ioObj.export_purge_after_zip == True and archive_export is False:
                     print('export_purge_after_zip flag is true, deleting JSON files')
                     retval = ioObj.purgeJSONfiles()
                     if retval is False:
@@ -771,6 +740,12 @@ def main(args):
                     else:
                         sys.exit()
 
+        # Rebuild the files of a stored snapshot in import_folder, then import them like any other exported files
+        if args.restore_snapshot:
+            retval = ioObj.restoreExportSnapshot(args.restore_snapshot)
+            if retval is False:
+                sys.exit(1)
+
         if import_first_file != "":
             files = glob.glob(import_first_file + '/*.zip')
             if len(files) > 0:
@@ -780,23 +755,39 @@ def main(args):
                 print('Found no zipfiles in',import_first_file)
 
         # User passed a zipfile path to use as the import source
-        if import_file_path != "":
+        if import_file_path.startswith('s3://'):
+            # Files written during the import, such as public_ip_old_new.json, stay in the configured folders
+            retval = ioObj.purgeJSONfiles()
+            if retval is False:
+                stop_script = yes_or_no("Errors purging old files. Stop running script?")
+                if stop_script is True:
+                    sys.exit()
+            retval = ioObj.openImportArchive(import_file_path)
+            if retval is False:
+                stop_script = yes_or_no("Could not open archive. Stop running script?")
+                if stop_script is True:
+                    sys.exit()
+            else:
+                print('Importing JSON from S3 archive',import_file_path,"- continuing with import.")
+        elif import_file_path != "":
             ioObj.import_folder = os.path.dirname(import_file_path)
             ioObj.import_path = Path(ioObj.import_folder)
             ioObj.export_folder = os.path.dirname(import_file_path) 
             ioObj.export_path = Path(ioObj.export_folder)
+            # Loose JSON files left next to the archive must not be mistaken for files written during this import
             retval = ioObj.purgeJSONfiles()
             if retval is False:
                 stop_script = yes_or_no("Errors purging old files. Stop running script?")
                 if stop_script is True:
                     sys.exit()
-            retval = ioObj.unzipJSONfiles(import_file_path)
+            # The JSON files are read straight from the archive members, nothing is extracted to disk
+            retval = ioObj.openImportArchive(import_file_path)
             if retval is False:
-                stop_script = yes_or_no("Could not unzip archive. Stop running script?")
+                stop_script = yes_or_no("Could not open archive. Stop running script?")
                 if stop_script is True:
                     sys.exit()
             else:
-                print('Extracted JSON from zip archive',import_file_path,"- continuing with import.")
+                print('Importing JSON from zip archive',import_file_path,"- continuing with import.")
                 print('Loaded import and export folder from command line:', ioObj.import_path )
 
         print('Import mode:',ioObj.import_mode)
@@ -852,151 +843,156 @@ def main(args):
         else:
             print('Cluster rename skipped')
 
-        if ioObj.network_import is True:
-            print("Beginning CGW network import...")
+        # Import stages and the stages they depend on. Stages without a dependency between them - VPN and CGW groups,
+        # for example - run in parallel when import_workers > 1. If a stage fails, only the stages that depend on it
+        # are skipped. A dependency that is disabled in config.ini is treated as satisfied.
+        def import_networks():
             import_table = ioObj.importCGWNetworks()
+            if import_table is False:
+                return False
             print('Import results:\n')
             print(import_table)
+            return len(ioObj.cgw_networks_import_error_dict) == 0
+
+        def import_compute_groups():
+            retval = ioObj.importSDDCCGWGroup()
+            if len(ioObj.cgw_groups_import_error_dict) > 0:
+                print("Error summary:")
+                for key in ioObj.cgw_groups_import_error_dict:
+                    print(f'{ioObj.cgw_groups_import_error_dict[key]["display_name"]} ({key}) - {ioObj.cgw_groups_import_error_dict[key]["error_message"]}')
+            return retval
+
+        def import_flex_segments():
+            import_table = ioObj.import_flex_segments()
+            if import_table is False:
+                return False
+            print("Import results:\n")
+            print(import_table)
+            return len(ioObj.flex_segments_import_error_dict) == 0
+
+        import_sections = []
+
+        if ioObj.network_import is True:
+            import_sections.append(Section("CGW networks", import_networks))
             if ioObj.network_dhcp_static_binding_import is True:
-                ioObj.importCGWDHCPStaticBindings()
+                import_sections.append(Section("DHCP static bindings", ioObj.importCGWDHCPStaticBindings, depends_on=["CGW networks"]))
 
         if ioObj.services_import is True:
-            print("Beginning Services import...")
-            ioObj.importSDDCServices()
+            import_sections.append(Section("Services", ioObj.importSDDCServices))
         else:
             print("Warning - Service import set to False, skipping...")
 
         if ioObj.compute_groups_import is True:
-            print("Beginning Compute Groups import...")
-            retval = ioObj.importSDDCCGWGroup()
-            if len(ioObj.cgw_groups_import_error_dict) > 0:
-                print("Error summary:")
-                for key in ioObj.cgw_groups_import_error_dict:
-                    print(f'{ioObj.cgw_groups_import_error_dict[key]["display_name"]} ({key}) - {ioObj.cgw_groups_import_error_dict[key]["error_message"]}')
+            import_sections.append(Section("Compute groups", import_compute_groups, depends_on=["Services", "CGW networks"]))
         else:
             print("Warning - Compute Groups import set to False, skipping...")
 
         if ioObj.management_groups_import is True:
-            retval = ioObj.importSDDCMGWGroup()
+            import_sections.append(Section("Management groups", ioObj.importSDDCMGWGroup))
         else:
             print("Warning - Management Groups import set to False, skipping...")
 
         if ioObj.cgw_import is True:
-            print("Beginning CGW import...")
             if ioObj.services_import is False:
                 print('Service import is set to false, this can cause import errors if service objects are missing.')
             if ioObj.compute_groups_import is False:
                 print('Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
-            ioObj.importSDDCCGWRule()
+            import_sections.append(Section("CGW rules", ioObj.importSDDCCGWRule, depends_on=["Services", "Compute groups"]))
 
         if ioObj.mgw_import is True:
-            print("Beginning MGW import...")
             if ioObj.services_import is False:
                 print('Service import is set to false, this can cause import errors if service objects are missing.')
             if ioObj.management_groups_import is False:
                 print('Management groups import is set to false, this can cause import errors if compute group objects are missing.')
-            ioObj.importSDDCMGWRule()
+            import_sections.append(Section("MGW rules", ioObj.importSDDCMGWRule, depends_on=["Services", "Management groups"]))
 
         if ioObj.mcgw_import is True:
-            print("Beginning Tier-1 Gateway import...")
-            if ioObj.services_import is False:
-                print('Service import is set to false, this can cause import errors if service objects are missing.')
-            if ioObj.compute_groups_import is False:
-                print('Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
-            ioObj.import_mcgw()
+            import_sections.append(Section("Tier-1 Gateways", ioObj.import_mcgw))
 
         if ioObj.mcgw_static_routes_import is True:
-            print("Beginning Tier-1 Gateway Static Route import...")
-            if ioObj.services_import is False:
-                print('Service import is set to false, this can cause import errors if service objects are missing.')
-            if ioObj.compute_groups_import is False:
-                print(
-                    'Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
             if ioObj.mcgw_import is False:
                 print('Tier-1 Gateway import is set to false, this can cause import error is Tier-1 Gateway objects are missing.')
-            ioObj.import_mcgw_static_routes()
+            import_sections.append(Section("Tier-1 Gateway static routes", ioObj.import_mcgw_static_routes, depends_on=["Tier-1 Gateways"]))
 
         if ioObj.mcgw_fw_import is True:
-            print('Beginning Tier-1 Gateway Firewall policy and rules import...')
             if ioObj.services_import is False:
                 print('Service import is set to false, this can cause import errors if service objects are missing.')
             if ioObj.compute_groups_import is False:
-                print(
-                    'Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
+                print('Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
             if ioObj.mcgw_import is False:
                 print('Tier-1 Gateway import is set to false, this can cause import error is Tier-1 Gateway objects are missing.')
-            ioObj.import_mcgw_fw()
+            import_sections.append(Section("Tier-1 Gateway firewall", ioObj.import_mcgw_fw, depends_on=["Tier-1 Gateways", "Services", "Compute groups"]))
 
         if ioObj.mpl_import is True:
-            print("Beginning import of Connected VPC Managed Prefix List configuration")
-            ioObj.import_mpl()
+            import_sections.append(Section("Connected VPC Managed Prefix List", ioObj.import_mpl))
         else:
             print("Connected VPC Managed Prefix List import skipped...")
 
         if ioObj.ral_import is True:
-            print('Beginning import of SDDC Route Aggregation Lists...')
             if ioObj.mpl_import is False:
                 print("Managed Prefix List import is set to false.  If MPL is not enabled, Route Aggregation lists will not be imported successfully")
-            ioObj.import_ral()
+            import_sections.append(Section("SDDC Route Aggregation lists", ioObj.import_ral, depends_on=["Connected VPC Managed Prefix List"]))
 
         if ioObj.route_config_import is True:
-            print('Beginning import of SDDC Route Configurations...')
             if ioObj.mpl_import is False:
                 print("Managed Prefix List import is set to false.  If MPL is not enabled, Route Configuration will not be imported successfully")
             if ioObj.ral_import is False:
                 print('Import of Route Configurations may be impacted by missing Route Aggregations lists')
-            ioObj.import_route_config()
-        
+            import_sections.append(Section("SDDC Route Configuration", ioObj.import_route_config, depends_on=["SDDC Route Aggregation lists", "Connected VPC Managed Prefix List"]))
+
         if ioObj.flex_segment_import is True:
-            print("Beginning import of flexible segments...")
-            import_table = ioObj.import_flex_segments()
-            print("Import results:\n")
-            print(import_table)
-            ioObj.import_flex_seg_disc_binding_map()
+            import_sections.append(Section("Flexible segments", import_flex_segments, depends_on=["Tier-1 Gateways"]))
+            import_sections.append(Section("Flexible segment discovery bindings", ioObj.import_flex_seg_disc_binding_map, depends_on=["Flexible segments"]))
 
         if ioObj.public_import is True:
-            print("Beginning Public IP import...")
-            ioObj.importSDDCPublicIPs()
+            import_sections.append(Section("Public IP", ioObj.importSDDCPublicIPs))
 
         if ioObj.nat_import is True:
             if ioObj.public_import is False:
                 print("Public IP import set to false, skipping and disabling NAT import")
                 ioObj.nat_import = False
             else:
-                print("Beginning NAT import...")
-                ioObj.importSDDCNats()
+                import_sections.append(Section("NAT rules", ioObj.importSDDCNats, depends_on=["Public IP"]))
 
         if ioObj.service_access_import is True:
-            print("Beginning Service Access import...")
-            ioObj.importServiceAccess()
+            import_sections.append(Section("Service Access", ioObj.importServiceAccess))
 
         if ioObj.vpn_import is True:
-            print("Beginning VPN import...")
-            ioObj.importVPN()
+            import_sections.append(Section("VPN", ioObj.importVPN))
 
         if ioObj.nsx_l7_fqdn_import is True:
-            print('Beginning import of custom FQDN attributes')
-            ioObj.import_fqdn_attributes()
-        
+            import_sections.append(Section("Custom FQDN attributes", ioObj.import_fqdn_attributes))
+
         if ioObj.nsx_l7_context_profile_import is True:
-            print('Beginning NSX Layer7 Context Profile import')
-            ioObj.import_l7_cp()
+            import_sections.append(Section("NSX L7 Context Profiles", ioObj.import_l7_cp, depends_on=["Custom FQDN attributes"]))
 
         if ioObj.nsx_adv_fw_import is True:
             if (ioObj.cgw_import is False):
                 print("NSX Advanced Firewall export is enabled, but CGW export is not.")
                 print("Please enable export of Compute Gateway settings to capture all CGW Groups and segments, else import of NSX AF settings and rules may fail.")
+            import_sections.append(Section("NSX Advanced Firewall", ioObj.import_advanced_firewall, depends_on=["Compute groups", "Services", "CGW networks"]))
 
-            print("Beginning NSX advanced firewall import...")
-            ioObj.import_advanced_firewall()
-        
         if ioObj.dfw_import is True:
-            print("Beginning DFW import...")
             if ioObj.services_import is False:
                 print('Service import is set to false, this can cause import errors if service objects are missing.')
             if ioObj.compute_groups_import is False:
                 print('Compute groups import is set to false, this can cause import errors if compute group objects are missing.')
-            ioObj.importSDDCDFWRule()
+            import_sections.append(Section("DFW rules", ioObj.importSDDCDFWRule, depends_on=["Services", "Compute groups", "NSX L7 Context Profiles"]))
+
+        scheduler = SectionScheduler(workers=ioObj.import_workers, verb='import', error_source=lambda: ioObj.lastJSONResponse)
+        import_results = scheduler.run(import_sections)
+        ioObj.closeImportArchive()
+        if ioObj.sync_delete is True:
+            # Deleting is only safe once everything in the import files is in place
+            if all(result.success for result in import_results):
+                ioObj.syncDeleteStale()
+            else:
+                print('Some sections failed, sync_delete skipped.')
+        print('Import summary:')
+        print(scheduler.summary_table(import_results))
+        print(ioObj.http.retry_summary())
+        print(ioObj.http.rate_summary())
+        print(ioObj.discovery_cache.summary())
 
         print("Import has been concluded. Thank you for using SDDC Import/Export for VMware Cloud on AWS.")
 
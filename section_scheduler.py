@@ -0,0 +1,110 @@
+# Section scheduler for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from prettytable import PrettyTable
+
+class Section:
+    """A named unit of export or import work, such as 'CGW groups' or 'DFW rules'
+
+    depends_on lists the names of sections that must complete successfully before this one starts. A dependency
+    that is not part of the run - because it is disabled in config.ini - is treated as satisfied.
+    """
+    def __init__(self, name: str, func, success=None, depends_on: list = None):
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on if depends_on is not None else []
+        # Decides if the return value of func means success. Section functions return True on success and
+        # False on failure, so by default anything other than an explicit True is a failure.
+        self.success = success if success is not None else (lambda retval: retval is True)
+
+class SectionResult:
+    """Outcome of running a single section"""
+    def __init__(self, name: str, success: bool, elapsed: float, note: str = ""):
+        self.name = name
+        self.success = success
+        self.elapsed = elapsed
+        self.note = note
+
+class SectionScheduler:
+    """Runs sections on a thread pool, starting each one as soon as its dependencies have completed
+
+    If a section fails, every section that depends on it - directly or indirectly - is skipped and reported as failed.
+    Sections that do not depend on the failed one keep running.
+    """
+    def __init__(self, workers: int = 1, verb: str = 'export', error_source=None):
+        self.workers = workers
+        self.verb = verb
+        # Called from the worker thread after a failure to retrieve the last API error message
+        self.error_source = error_source
+
+    def run_section(self, section: Section) -> SectionResult:
+        """Runs one section, converting exceptions and sys.exit() calls into a failed result"""
+        print(f'Beginning {section.name} {self.verb}...')
+        start = time.monotonic()
+        note = ""
+        try:
+            retval = section.func()
+            success = section.success(retval)
+        except (Exception, SystemExit) as e:
+            success = False
+            note = f'{type(e).__name__}: {e}'
+        if success is False and note == "" and self.error_source is not None:
+            note = str(self.error_source() or "")
+        result = SectionResult(section.name, success, time.monotonic() - start, note)
+        if success:
+            print(f'{section.name} {self.verb} complete.')
+        else:
+            print(f'{section.name} {self.verb} error: {note}')
+        return result
+
+    def run(self, sections: list) -> list:
+        """Runs all sections and returns their results in the order the sections were given"""
+        names = [s.name for s in sections]
+        results = {}
+        pending = list(sections)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            while pending or running:
+                changed = True
+                while changed:
+                    changed = False
+                    for section in list(pending):
+                        deps = [d for d in section.depends_on if d in names]
+                        failed = [d for d in deps if d in results and results[d].success is False]
+                        if len(failed) > 0:
+                            note = f'Skipped - depends on {", ".join(failed)}'
+                            print(f'{section.name} {self.verb} skipped, dependency failed: {", ".join(failed)}')
+                            results[section.name] = SectionResult(section.name, False, 0.0, note)
+                            pending.remove(section)
+                            changed = True
+                        elif all(d in results for d in deps) and len(running) < max(self.workers, 1):
+                            running[executor.submit(self.run_section, section)] = section
+                            pending.remove(section)
+                            changed = True
+
+                if len(running) == 0:
+                    if len(pending) == 0:
+                        break
+                    # Nothing is running and nothing could be started, the remaining sections depend on each other
+                    raise ValueError(f'Circular dependency between sections: {", ".join(s.name for s in pending)}')
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    section = running.pop(future)
+                    results[section.name] = future.result()
+        return [results[s.name] for s in sections]
+
+    def summary_table(self, results: list) -> PrettyTable:
+        """Builds a per-section success/failure summary"""
+        table = PrettyTable(['Section', 'Result', 'Time (s)', 'Note'])
+        table.align['Note'] = 'l'
+        for r in results:
+            table.add_row([r.name, 'SUCCESS' if r.success else 'FAIL', f'{r.elapsed:.1f}', r.note])
+        return table
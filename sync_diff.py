@@ -0,0 +1,135 @@
+# Diff-based sync for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import threading
+
+# Set by NSX, not part of the configuration of an object
+SYSTEM_FIELDS = {'path', 'relative_path', 'parent_path', 'remote_path', 'overridden', 'unique_id', 'realization_id',
+                 'marked_for_delete', 'owner_id', 'origin_site_id', '_create_time', '_create_user',
+                 '_last_modified_time', '_last_modified_user', '_system_owned', '_protection', '_revision', '_links',
+                 '_self', '_schema'}
+
+# Objects created by these users come with the SDDC, they are never imported and never deleted
+SYSTEM_USERS = ('system', 'admin', 'admin;admin')
+
+def strip_system_fields(obj: dict) -> dict:
+    """Returns obj without the fields set by NSX"""
+    return {k: v for k, v in obj.items() if k not in SYSTEM_FIELDS}
+
+# Fields NSX fills in when the payload of an import leaves them out, with the value it fills in. A destination field
+# that is not in the payload is only a difference when it no longer has this value.
+NSX_DEFAULTS = {
+    'SecurityPolicy': {'locked': False, 'scope': ['ANY'], 'is_default': False},
+    'Rule': {'direction': 'IN_OUT', 'ip_protocol': 'IPV4_IPV6', 'logged': False, 'disabled': False,
+             'scope': ['ANY'], 'profiles': ['ANY'], 'is_default': False},
+    'Segment': {'admin_state': 'UP', 'replication_mode': 'MTEP', 'address_bindings': []},
+    'Service': {'is_default': False},
+    'Group': {'reference': False},
+}
+
+# Fields NSX computes for each object, which an import cannot set
+NSX_COMPUTED_FIELDS = {
+    'SecurityPolicy': {'internal_sequence_number', 'rule_count', 'tcp_strict'},
+    'Rule': {'rule_id', 'sequence_number'},
+    'Segment': {'connectivity_path', 'overlay_id'},
+}
+
+def matches(expected, current) -> bool:
+    """True if a PUT of expected would leave current unchanged, ignoring system fields
+
+    Both objects are compared in full: a field of current that is not in expected - a description or tags removed
+    in the source SDDC - is a difference, unless it is empty or NSX fills it in by itself (NSX_DEFAULTS and
+    NSX_COMPUTED_FIELDS, by resource_type).
+    """
+    if isinstance(expected, dict):
+        if not isinstance(current, dict):
+            return False
+        expected = strip_system_fields(expected)
+        current = strip_system_fields(current)
+        resource_type = expected.get('resource_type', current.get('resource_type'))
+        defaults = NSX_DEFAULTS.get(resource_type, {})
+        computed = NSX_COMPUTED_FIELDS.get(resource_type, set())
+        for key, value in expected.items():
+            if key not in current and value in (None, '', [], {}):
+                continue
+            if not matches(value, current.get(key)):
+                return False
+        for key, value in current.items():
+            if key in expected or key in computed or value in (None, '', [], {}):
+                continue
+            if key not in defaults or value != defaults[key]:
+                return False
+        return True
+    if isinstance(expected, list):
+        if not isinstance(current, list) or len(expected) != len(current):
+            return False
+        return all(matches(e, c) for e, c in zip(expected, current))
+    return expected == current
+
+class SyncStage:
+    """Compares the objects of one import stage with the objects already in the destination SDDC
+
+    destination is {path: object} of the destination objects, or None to send every object. With diff, objects
+    whose payload matches the destination object are skipped. Every path passed through the stage is recorded, so
+    once the whole import file has been seen, stale() returns the destination objects under prefix that are not in
+    the import file.
+    """
+
+    def __init__(self, label: str, destination: dict, prefix: str, resource_type: str, diff: bool):
+        self.label = label
+        self.destination = destination
+        self.prefix = prefix
+        self.resource_type = resource_type
+        self.diff = diff
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.skipped = 0
+        self.sent = 0
+        self.complete = False
+
+    def keep(self, path: str) -> None:
+        """Records a path that is in the import file"""
+        with self.lock:
+            self.seen.add(path)
+
+    def changed(self, path: str, payload_of, obj) -> bool:
+        """Records path and returns True unless the destination already has the object as payload_of(obj)"""
+        self.keep(path)
+        unchanged = False
+        if self.diff is True and self.destination is not None and path in self.destination:
+            try:
+                unchanged = matches(payload_of(obj), self.destination[path])
+            except (KeyError, TypeError):
+                # An incomplete object is sent as before and reported by the import
+                unchanged = False
+        with self.lock:
+            if unchanged:
+                self.skipped += 1
+            else:
+                self.sent += 1
+        return unchanged is False
+
+    def filter(self, objects, path_of, payload_of):
+        """Yields the objects that are new or differ from the destination"""
+        for obj in objects:
+            if self.changed(path_of(obj), payload_of, obj):
+                yield obj
+        self.finish()
+
+    def finish(self) -> None:
+        """Marks the whole import file as seen, call once every object has been passed to changed()"""
+        self.complete = True
+        if self.destination is not None and self.diff is True:
+            print(f'{self.label}: {self.skipped} unchanged objects skipped, {self.sent} to create or update.')
+
+    def stale(self) -> list:
+        """Returns the paths of the user-created destination objects that are not in the import file"""
+        if self.complete is False or self.destination is None:
+            return []
+        return [path for path, obj in self.destination.items()
+                if path.startswith(self.prefix) and obj.get('resource_type') == self.resource_type and path not in self.seen
+                and obj.get('_system_owned') is not True and obj.get('_create_user') not in SYSTEM_USERS]
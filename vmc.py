@@ -8,6 +8,8 @@ import json
 
 import datetime
 
+import vmc_http
+
 class JSONResponse():
     """A REST API response object """
     def __init__(self, success: bool, json_body: str, last_response: str = None) -> None:
@@ -29,7 +31,9 @@ class EdgeInterfaceStats():
 
 class VMCConnection():
     """Connection to VMware Cloud on AWS"""
-    def __init__(self, org_id: str, sddc_id: str, refresh_token: str = None,oauth_id: str = None, oauth_secret: str = None, ProdURL: str = 'https://vmc.vmware.com', CSPProdURL: str = 'https://console.cloud.vmware.com') -> None:
+    def __init__(self, org_id: str, sddc_id: str, refresh_token: str = None,oauth_id: str = None, oauth_secret: str = None, ProdURL: str = 'https://vmc.vmware.com', CSPProdURL: str = 'https://console.cloud.vmware.com', http: vmc_http.VMCHttpClient = None) -> None:
+        # Pooled sessions shared by every call made through this connection
+        self.http = http if http is not None else vmc_http.VMCHttpClient()
         # If refresh token gets passed, we use it for authentication
         print(f'refresh:{refresh_token}')
         print(f'oi:{oauth_id}, os: {oauth_secret}' )
@@ -80,7 +84,7 @@ class VMCConnection():
 
             params = {'api_token': myRefreshToken}
             headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-            response = requests.post(f'{self.CSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
+            response = self.http.post(f'{self.CSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
             if response.status_code != 200:
                 print (f'Token Auth API Call Status {response.status_code}, text:{response.text}')
                 return None
@@ -89,7 +93,7 @@ class VMCConnection():
         elif self.auth_mode == "oauth":
             params = {'grant_type': 'client_credentials'}
             headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-            response = requests.post(f'{self.CSPProdURL}/csp/gateway/am/api/auth/authorize', params=params,auth=(self.oauth_id, self.oauth_secret), headers=headers)
+            response = self.http.post(f'{self.CSPProdURL}/csp/gateway/am/api/auth/authorize', params=params,auth=(self.oauth_id, self.oauth_secret), headers=headers)
             if response.status_code != 200:
                 print (f'OAUth API Call Status {response.status_code}, text:{response.text}')
                 return None
@@ -119,7 +123,7 @@ class VMCConnection():
 
             myHeader = {'csp-auth-token': self.access_token}
             myURL = f'{self.ProdURL}/vmc/api/orgs/{self.org_id}/sddcs/{self.sddc_id}'
-            response = requests.get(myURL, headers=myHeader)
+            response = self.http.get(myURL, headers=myHeader)
             if response.status_code != 200:
                 print (f'API Call Status {response.status_code}, text:{response.text}')
                 return None
@@ -145,7 +149,7 @@ class VMCConnection():
             self.check_access_token_expiration()
             myHeader = {'csp-auth-token': self.access_token}
             try:
-                response = requests.get(url,headers=myHeader)
+                response = self.http.get(url,headers=myHeader)
                 if response.status_code != 200:
                     self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
                 return response
@@ -160,9 +164,9 @@ class VMCConnection():
 
         try:
             if patchMode is False:
-                response = requests.patch(url, headers=headers, data=payload)
+                response = self.http.patch(url, headers=headers, data=payload)
             else:
-                response = requests.post(url, headers=headers, data=payload )
+                response = self.http.post(url, headers=headers, data=payload )
 
             if response.status_code != 200:
                 self.lastJSONResponse = f'API Call Status {response.status_code}, text:{response.text}'
@@ -172,10 +176,10 @@ class VMCConnection():
             return None
 
 class VMCSDDC():
-    def __init__(self, org_id: str, sddc_id: str, refresh_token: str = None, oauth_id: str = None, oauth_secret: str = None) -> None:
+    def __init__(self, org_id: str, sddc_id: str, refresh_token: str = None, oauth_id: str = None, oauth_secret: str = None, http: vmc_http.VMCHttpClient = None) -> None:
         self.org_id = org_id
         self.sddc_id = sddc_id
-        self.vmcconn = VMCConnection(org_id, sddc_id, refresh_token=refresh_token, oauth_id=oauth_id, oauth_secret=oauth_secret)
+        self.vmcconn = VMCConnection(org_id, sddc_id, refresh_token=refresh_token, oauth_id=oauth_id, oauth_secret=oauth_secret, http=http)
         self.edge_interface_stats = {}
         self.debug_mode = False
 
@@ -0,0 +1,118 @@
+# asyncio HTTP engine for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import asyncio
+import json
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import vmc_http
+
+class AsyncResponse:
+    """The parts of a requests.Response used by the export and import code"""
+    def __init__(self, status_code: int, text: str, headers: dict):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+class AsyncVMCClient:
+    """Runs many API calls concurrently on one event loop instead of one thread per call
+
+    Uses the retry policy and rate limiters of the blocking VMCHttpClient it is created from, so both engines share
+    the same limits and retry statistics.
+    """
+
+    def __init__(self, http: vmc_http.VMCHttpClient, concurrency: int = 50):
+        if aiohttp is None:
+            raise ImportError('The async I/O engine requires aiohttp - pip3 install aiohttp')
+        self.http = http
+        self.concurrency = concurrency
+
+    async def request(self, session, method: str, url: str, **kwargs) -> AsyncResponse:
+        """Async equivalent of VMCHttpClient.request - rate limited, with retries for idempotent methods"""
+        if kwargs.pop('verify', True) is False:
+            kwargs['ssl'] = False
+        limiter = self.http.rate_limiters.get(self.http.endpoint_class(url))
+        policy = self.http.retry_policy
+        retry = method.upper() in vmc_http.IDEMPOTENT_METHODS
+        attempts = {}
+        while True:
+            try:
+                response = await self.send(session, limiter, method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if retry is False or attempts.get('connection', 0) >= policy.connection_budget:
+                    raise
+                reason = 'connection'
+                delay = None
+            else:
+                reason = response.status_code
+                if retry is False or attempts.get(reason, 0) >= policy.status_budgets.get(reason, 0):
+                    return response
+                delay = policy.retry_after(response)
+
+            attempts[reason] = attempts.get(reason, 0) + 1
+            self.http.record_retry(reason)
+            if delay is None:
+                delay = policy.backoff(attempts[reason])
+            await asyncio.sleep(delay)
+
+    async def send(self, session, limiter, method: str, url: str, **kwargs) -> AsyncResponse:
+        if limiter is not None:
+            wait = limiter.reserve()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = limiter.reserve()
+        async with session.request(method, url, **kwargs) as resp:
+            response = AsyncResponse(resp.status, await resp.text(), resp.headers)
+        if limiter is not None:
+            if response.status_code in vmc_http.THROTTLE_STATUS_CODES:
+                limiter.on_throttle()
+            else:
+                limiter.on_success()
+        return response
+
+    async def get(self, session, url: str, **kwargs) -> AsyncResponse:
+        return await self.request(session, 'GET', url, **kwargs)
+
+    async def put(self, session, url: str, **kwargs) -> AsyncResponse:
+        return await self.request(session, 'PUT', url, **kwargs)
+
+    async def patch(self, session, url: str, **kwargs) -> AsyncResponse:
+        return await self.request(session, 'PATCH', url, **kwargs)
+
+    def run_many(self, calls: list, elapsed: list = None) -> list:
+        """Runs (method, url, kwargs) calls with up to concurrency in flight
+
+        Returns the responses in the order of calls, with the exception in place of the response for calls that failed.
+        If elapsed is a list, it is filled with the seconds each call took once it was in flight, in the order of calls.
+        """
+        call_times = [0.0] * len(calls)
+        results = asyncio.run(self.gather(calls, call_times))
+        if elapsed is not None:
+            elapsed.extend(call_times)
+        return results
+
+    async def gather(self, calls: list, call_times: list) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def bounded(index, method, url, kwargs):
+                async with semaphore:
+                    start = time.monotonic()
+                    try:
+                        return await self.request(session, method, url, **kwargs)
+                    finally:
+                        call_times[index] = time.monotonic() - start
+            return await asyncio.gather(*(bounded(index, method, url, kwargs) for index, (method, url, kwargs) in enumerate(calls)), return_exceptions=True)
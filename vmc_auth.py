@@ -6,15 +6,20 @@
 ################################################################################
 
 import json
-import requests
 import datetime
+import threading
+
+import vmc_http
 
 class VMCAuth:
-    def __init__(self, strCSPProdURL: str):
+    def __init__(self, strCSPProdURL: str, http: vmc_http.VMCHttpClient = None):
+        self.http = http if http is not None else vmc_http.VMCHttpClient()
         self.access_token = None
         self.access_token_expiration = None
         self.activeRefreshToken = None
         self.strCSPProdURL = strCSPProdURL
+        # Serializes token refresh when export or import sections run in parallel
+        self._refresh_lock = threading.Lock()
 
     def getAccessToken(self,myRefreshToken):
         """ Gets the Access Token using the Refresh Token """
@@ -23,7 +28,7 @@ class VMCAuth:
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
 
         try:
-            response = requests.post(f'{self.strCSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
+            response = self.http.post(f'{self.strCSPProdURL}/csp/gateway/am/api/auth/api-tokens/authorize', params=params, headers=headers)
             jsonResponse = response.json()
             self.access_token = jsonResponse['access_token']
             expires_in = jsonResponse['expires_in']
@@ -39,7 +44,11 @@ class VMCAuth:
     def check_access_token_expiration(self) -> None:
         """Retrieve a new access token if it is near expiration"""
         if self.access_token_expiration is not None:
-            time_to_expire = self.access_token_expiration - datetime.datetime.now()
-            if time_to_expire.total_seconds() <= 100:
-                print('Access token expired, attempting to refresh...')
-                self.getAccessToken(self.activeRefreshToken)
\ No newline at end of file
+            with self._refresh_lock:
+                # Re-check under the lock, another thread may have already refreshed the token
+                if self.access_token_expiration is None:
+                    return
+                time_to_expire = self.access_token_expiration - datetime.datetime.now()
+                if time_to_expire.total_seconds() <= 100:
+                    print('Access token expired, attempting to refresh...')
+                    self.getAccessToken(self.activeRefreshToken)
\ No newline at end of file
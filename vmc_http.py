@@ -0,0 +1,244 @@
+# HTTP session layer for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import datetime
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Methods that are safe to send again. PATCH is included because the NSX Policy API treats it as a
+# create-or-update of the full object; POST is never retried.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'PATCH')
+
+class VMCAPIError(Exception):
+    """An API call failed in a place where a False/None return value cannot be passed back, such as a generator"""
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter for throttled or failed API calls
+
+    status_budgets maps an HTTP status code to the number of retries allowed for it, connection_budget is the
+    number of retries allowed for connection errors and timeouts. A Retry-After header on the response is honored
+    when present, capped at max_delay.
+    """
+
+    def __init__(self, status_budgets: dict = None, connection_budget: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.status_budgets = status_budgets if status_budgets is not None else {429: 5, 503: 5}
+        self.connection_budget = connection_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Returns the delay before retry number attempt (starting at 1)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def retry_after(self, response: requests.Response) -> float:
+        """Returns the delay requested by a Retry-After header, in seconds, or None"""
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        return min(max(delay, 0.0), self.max_delay)
+
+# Status codes that mean the API is throttling us
+THROTTLE_STATUS_CODES = (429, 503)
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate adapts to the API - additive increase on success, multiplicative decrease when throttled
+
+    The rate starts at rate requests per second and moves between min_rate and max_rate. Every successful call
+    adds increase / rate to the rate, so at full throughput it grows by roughly increase requests per second every
+    second; every throttled call multiplies it by decrease. All threads share the bucket, so the total request rate
+    stays under the limit however many workers are running.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 1.0, max_rate: float = None, increase: float = 1.0, decrease: float = 0.5):
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.rate)
+        self.max_rate = float(max_rate) if max_rate is not None else self.rate
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns 0 if one is available, otherwise returns the number of seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            # Allow bursts of up to one second worth of requests
+            self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent"""
+        wait = self.reserve()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.reserve()
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+
+class VMCHttpClient:
+    """Pooled, keep-alive HTTP sessions shared by all API calls - one requests.Session per endpoint
+
+    An endpoint is the scheme and host of a URL, so the source NSX reverse proxy, the destination
+    NSX reverse proxy, CSP, the VMC API and an on-prem NSX manager each get their own connection pool.
+    """
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True, retry_policy: RetryPolicy = None, rate_limiters: dict = None, endpoint_classes: dict = None):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        # Rate limiter per endpoint class ('csp', 'vmc' or 'nsx'), a class without a limiter is not rate limited
+        self.rate_limiters = rate_limiters if rate_limiters is not None else {}
+        # Hostname to endpoint class, for hosts that endpoint_class() cannot recognize by name (e.g. GovCloud URLs)
+        self.endpoint_classes = endpoint_classes if endpoint_classes is not None else {}
+        self.sessions = {}
+        # Number of retries per reason - an HTTP status code, or 'connection'
+        self.retry_stats = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, url: str) -> str:
+        """Returns the endpoint key for a URL"""
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'.lower()
+
+    def endpoint_class(self, url: str) -> str:
+        """Returns the endpoint class of a URL - 'csp' for the CSP console, 'vmc' for the VMC API, otherwise 'nsx'"""
+        host = urlsplit(url).hostname or ''
+        host = host.lower()
+        if host in self.endpoint_classes:
+            return self.endpoint_classes[host]
+        if host.startswith('console.cloud') or host.startswith('console-stg.cloud'):
+            return 'csp'
+        if host.startswith('vmc.') or host.startswith('vmc-stg.'):
+            return 'vmc'
+        return 'nsx'
+
+    def get_session(self, url: str) -> requests.Session:
+        """Returns the shared session for the endpoint of url, creating it on first use"""
+        endpoint = self.endpoint(url)
+        with self._lock:
+            session = self.sessions.get(endpoint)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                if self.keep_alive is False:
+                    session.headers['Connection'] = 'close'
+                self.sessions[endpoint] = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends a request through the pooled session for the URL's endpoint
+
+        Idempotent requests that are throttled or hit a connection error are retried according to retry_policy.
+        The last response is returned, or the last connection error raised, once the retry budget is spent.
+        """
+        session = self.get_session(url)
+        limiter = self.rate_limiters.get(self.endpoint_class(url))
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return self.send(session, limiter, method, url, **kwargs)
+
+        policy = self.retry_policy
+        attempts = {}
+        while True:
+            try:
+                response = self.send(session, limiter, method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempts.get('connection', 0) >= policy.connection_budget:
+                    raise
+                reason = 'connection'
+                delay = None
+            else:
+                reason = response.status_code
+                if attempts.get(reason, 0) >= policy.status_budgets.get(reason, 0):
+                    return response
+                delay = policy.retry_after(response)
+
+            attempts[reason] = attempts.get(reason, 0) + 1
+            self.record_retry(reason)
+            if delay is None:
+                delay = policy.backoff(attempts[reason])
+            time.sleep(delay)
+
+    def send(self, session: requests.Session, limiter: AdaptiveRateLimiter, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends a single request, waiting for the endpoint's rate limiter and feeding the result back to it"""
+        if limiter is None:
+            return session.request(method, url, **kwargs)
+        limiter.acquire()
+        response = session.request(method, url, **kwargs)
+        if response.status_code in THROTTLE_STATUS_CODES:
+            limiter.on_throttle()
+        else:
+            limiter.on_success()
+        return response
+
+    def rate_summary(self) -> str:
+        """Returns the current request rate of each rate limited endpoint class"""
+        if len(self.rate_limiters) == 0:
+            return 'API rate limits: none'
+        rates = ', '.join(f'{name}: {limiter.rate:.1f}/s' for name, limiter in sorted(self.rate_limiters.items()))
+        return f'API rate limits: {rates}'
+
+    def record_retry(self, reason) -> None:
+        with self._lock:
+            self.retry_stats[reason] = self.retry_stats.get(reason, 0) + 1
+
+    def retry_summary(self) -> str:
+        """Returns a one-line summary of the retries made so far"""
+        with self._lock:
+            if len(self.retry_stats) == 0:
+                return 'API retries: none'
+            counts = ', '.join(f'{reason}: {count}' for reason, count in sorted(self.retry_stats.items(), key=lambda item: str(item[0])))
+            return f'API retries: {sum(self.retry_stats.values())} ({counts})'
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self) -> None:
+        """Closes all pooled connections"""
+        with self._lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
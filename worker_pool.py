@@ -0,0 +1,100 @@
+# Bounded worker pool for SDDC Import/Export for VMware Cloud on AWS
+
+################################################################################
+### Copyright 2020-2023 VMware, Inc.
+### SPDX-License-Identifier: BSD-2-Clause
+################################################################################
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def bounded_map(func, items, workers: int = 1):
+    """Applies func to every item on up to `workers` threads, yielding the results in the order of items
+
+    Items are submitted lazily - no more than twice the number of workers are in flight at any time - so a
+    large import file does not queue thousands of pending requests up front. With workers <= 1 the items are
+    processed one after the other on the calling thread.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+        for item in items:
+            window.append(executor.submit(func, item))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def dependency_waves(items: list, item_path, references) -> list:
+    """Splits items into waves where every item comes after the items it references
+
+    item_path(item) returns the policy path of an item, references(item) returns the paths it refers to. Only
+    references to other items in the list are considered, everything in a wave can be imported in parallel.
+    """
+    paths = {item_path(item) for item in items}
+    remaining = list(items)
+    done = set()
+    waves = []
+    while remaining:
+        wave = [item for item in remaining if all(r in done for r in references(item) if r in paths and r != item_path(item))]
+        if len(wave) == 0:
+            # Unresolvable references - let the API report the errors
+            wave = remaining
+        waves.append(wave)
+        done.update(item_path(item) for item in wave)
+        remaining = [item for item in remaining if item_path(item) not in done]
+    return waves
+
+def prefetch(items, depth: int = 1):
+    """Iterates items on a background thread, staying up to `depth` items ahead of the caller
+
+    Used to fetch the next page of a list API call while the current page is being processed. An exception raised
+    while producing an item is raised to the caller in its place. With depth <= 0 items is iterated directly.
+    """
+    if depth <= 0:
+        yield from items
+        return
+
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        # Give up if the caller stopped iterating, otherwise a full queue would block this thread forever
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if put((item, None)) is False:
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()